@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['phone', 'country_code', '-created_at'], name='otp_phone_cc_created_idx'),
+        ),
+    ]
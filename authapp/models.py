@@ -11,6 +11,12 @@ class OTP(models.Model):
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Latest code for a number: filter(phone, country_code).order_by("-created_at")
+            models.Index(fields=["phone", "country_code", "-created_at"], name="otp_phone_cc_created_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.code:
             self.code = str(random.randint(100000, 999999))
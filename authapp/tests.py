@@ -0,0 +1,104 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
+from members.models import Member, MemberGender
+
+User = get_user_model()
+
+
+class VerifyOTPLoginTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def login(self, phone="9500000001", data=None):
+        from authapp.views import VerifyOTPView
+
+        payload = {"phone": phone, "country_code": "+91", "otp": "123456"}
+        if data:
+            payload["data"] = data
+        request = self.factory.post("/api/auth/verify-otp/", payload, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = VerifyOTPView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def end_invalidation_hold(self, user_id):
+        from django.core.cache import cache
+        from profiles.utils import PROFILE_SNAPSHOT_CACHE_KEY
+
+        cache.delete(PROFILE_SNAPSHOT_CACHE_KEY.format(user_id=user_id))
+
+    def test_first_login_links_member_and_copies_its_details(self):
+        from profiles.models import PersonalDetail
+
+        member = Member.objects.create(
+            name="Meena", gender=MemberGender.FEMALE, mobile="09500000001", native_place="Pali"
+        )
+
+        response = self.login()
+
+        self.assertTrue(response.data["firstTime"])
+        member.refresh_from_db()
+        self.assertEqual(member.user_id, response.data["userId"])
+        self.assertEqual(response.data["data"]["personal"]["fullName"], "Meena")
+        self.assertEqual(PersonalDetail.objects.get(profile__user_id=member.user_id).native_place, "Pali")
+
+    def test_new_user_without_data_creates_no_profile_records(self):
+        from profiles.models import UserProfile
+
+        response = self.login()
+
+        self.assertFalse(response.data["profileCompleted"])
+        self.assertFalse(UserProfile.objects.filter(user_id=response.data["userId"]).exists())
+
+    def test_returning_user_logs_in_from_the_snapshot(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Member.objects.create(name="Meena", gender=MemberGender.FEMALE, mobile="9500000001")
+        first = self.login()
+        self.end_invalidation_hold(first.data["userId"])
+        self.login()  # fills the snapshot cache
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.login()
+        self.assertEqual(response.data["data"], first.data["data"])
+        writes = [q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))]
+        self.assertEqual(writes, [])
+        self.assertLessEqual(len(ctx.captured_queries), 5)
+
+    def test_profile_change_invalidates_the_snapshot(self):
+        from profiles.models import PersonalDetail
+
+        self.login(data={"personal": {"fullName": "First"}})
+        user = User.objects.get(phone="9500000001")
+        self.login()
+
+        personal = PersonalDetail.objects.get(profile__user=user)
+        personal.full_name = "Second"
+        personal.save()
+
+        response = self.login()
+        self.assertEqual(response.data["data"]["personal"]["fullName"], "Second")
+
+    def test_member_relation_change_invalidates_the_snapshot(self):
+        from profiles.utils import cached_profile_snapshot
+
+        member = Member.objects.create(
+            name="Meena", gender=MemberGender.FEMALE, mobile="9500000001", relation="daughter"
+        )
+        user_id = self.login().data["userId"]
+        self.end_invalidation_hold(user_id)
+        self.login()
+        self.assertIsNotNone(cached_profile_snapshot(user_id))
+
+        member.refresh_from_db()
+        member.name = "Meena S"
+        member.save(update_fields=["name"])
+        self.assertIsNotNone(cached_profile_snapshot(user_id))
+
+        member.relation = "wife"
+        member.save()
+        self.assertIsNone(cached_profile_snapshot(user_id))
@@ -7,11 +7,12 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from members.models import Member
+from members.phone import normalize_phone
 from profiles.serializers import FullUserDetailsSerializer
 from users.models import User
 from .models import OTP
 from profiles.models import UserProfile, PersonalDetail, JobDetail, EducationDetail
-from profiles.utils import build_profile_response
+from profiles.utils import apply_changes, cache_profile_snapshot, cached_profile_snapshot, save_record
 
 
 # ----------------------------
@@ -74,10 +75,43 @@ class VerifyOTPView(APIView):
 
     ⚠️ Profile image is NOT handled here.
     Image upload is ONLY via UploadProfileImageView.
+
+    Returning users with nothing to write are answered from the cached
+    profile snapshot; profile records are only created once they get data.
     """
 
     permission_classes = [AllowAny]
 
+    PERSONAL_MAP = {
+        "fullName": "full_name",
+        "nickname": "nickname",
+        "gender": "gender",
+        "dob": "dob",
+        "email": "email",
+        "phone": "phone",
+        "countryCode": "country_code",
+        "address": "address",
+        "nativePlace": "native_place",
+        "currentCity": "current_city",
+        "community": "community",
+        # ❌ profileImage REMOVED
+    }
+    EDUCATION_MAP = {
+        "qualification": "qualification",
+        "institution": "institution",
+        "field": "field",
+        "startYear": "start_year",
+        "endYear": "end_year",
+    }
+    JOB_MAP = {
+        "occupationType": "occupation_type",
+        "companyName": "company_name",
+        "role": "role",
+        "industry": "industry",
+        "startDate": "start_date",
+        "incomeRange": "income_range",
+    }
+
     @transaction.atomic
     def post(self, request):
         phone = request.data.get("phone")
@@ -125,24 +159,13 @@ class VerifyOTPView(APIView):
             user.fcm_token = fcm_token
             user.save(update_fields=["fcm_token"])
 
-        # ---------- PROFILE OBJECTS ----------
-        profile, _ = UserProfile.objects.get_or_create(user=user)
-        personal, _ = PersonalDetail.objects.get_or_create(profile=profile)
-        education, _ = EducationDetail.objects.get_or_create(profile=profile)
-        job, _ = JobDetail.objects.get_or_create(profile=profile)
-
-        if not personal.country_code:
-            personal.country_code = country_code
-            personal.save(update_fields=["country_code"])
-
-        # ---------- MEMBER LOOKUP ----------
+        # ---------- MEMBER LOOKUP (one indexed query) ----------
         member = Member.objects.filter(
-            mobile=phone,
-            country_code=country_code,
+            phone_e164=normalize_phone(phone, country_code),
         ).first()
 
         # 🚨 Block if already linked to another user
-        if member and member.user and member.user != user:
+        if member and member.user_id and member.user_id != user.id:
             return Response(
                 {
                     "success": False,
@@ -152,45 +175,79 @@ class VerifyOTPView(APIView):
             )
 
         # ---------- AUTO LINK MEMBER ----------
-        if member and not member.user:
+        newly_linked = bool(member and not member.user_id)
+        if newly_linked:
             member.user = user
             member.save(update_fields=["user"])
 
-        # ---------- MEMBER → PROFILE SYNC (NO IMAGE) ----------
-        if member:
-            if member.name:
-                personal.full_name = member.name
-            if member.mobile:
-                personal.phone = member.mobile
-            if member.country_code:
-                personal.country_code = member.country_code
-            if member.native_place:
-                personal.native_place = member.native_place
-            if member.city:
-                personal.current_city = member.city
-            if member.gender:
-                personal.gender = member.gender
-            if member.date_of_birth:
-                personal.dob = member.date_of_birth
-            if member.community:
-                personal.community = member.community
-            if member.status:
-                personal.status = member.status
+        # ---------- PROFILE ----------
+        snapshot = None
+        if not (created or newly_linked or profile_data_from_app):
+            snapshot = cached_profile_snapshot(user.id)
+        if snapshot is None:
+            snapshot = self.save_profile(user, country_code, member, newly_linked, profile_data_from_app)
+
+        # ---------- RESPONSE ----------
+        refresh = RefreshToken.for_user(user)
+
+        return Response(
+            {
+                "success": True,
+                "message": "OTP verified successfully",
+                "token": str(refresh.access_token),
+                "userId": user.id,
+                "firstTime": created,
+                "profileCompleted": snapshot["completed"],
+                "data": snapshot["data"],
+            },
+            status=200,
+        )
+
+    def save_profile(self, user, country_code, member, newly_linked, profile_data_from_app):
+        """
+        Loads the profile records in one query, applies member and app data,
+        writes only what changed and returns the fresh snapshot.
+        """
+        profile = (
+            UserProfile.objects
+            .select_related("personal", "education_detail", "job")
+            .filter(user=user)
+            .first()
+        ) or UserProfile(user=user)
+
+        personal = getattr(profile, "personal", None) or PersonalDetail(profile=profile)
+        education = getattr(profile, "education_detail", None) or EducationDetail(profile=profile)
+        job = getattr(profile, "job", None) or JobDetail(profile=profile)
+
+        profile_changes, personal_changes, education_changes, job_changes = [], [], [], []
+        app_changed = set()
+
+        if not personal.country_code:
+            personal_changes += apply_changes(personal, {"country_code": country_code})
 
+        # ---------- MEMBER → PROFILE SYNC (NO IMAGE) ----------
+        # Once linked, the Member ⇄ profile sync keeps both sides aligned
+        if member and (newly_linked or personal._state.adding):
+            member_values = {
+                "full_name": member.name,
+                "phone": member.mobile,
+                "country_code": member.country_code,
+                "native_place": member.native_place,
+                "current_city": member.city,
+                "gender": member.gender,
+                "dob": member.date_of_birth,
+                "community": member.community,
+                "status": member.status,
+            }
             # 🚫 DO NOT TOUCH profile_image
-            personal.save()
+            personal_changes += apply_changes(personal, {k: v for k, v in member_values.items() if v})
 
             if member.highest_qualification:
-                education.qualification = member.highest_qualification
-                education.save(update_fields=["qualification"])
-
+                education_changes += apply_changes(education, {"qualification": member.highest_qualification})
             if member.occupation:
-                job.occupation_type = member.occupation
-                job.save(update_fields=["occupation_type"])
-
+                job_changes += apply_changes(job, {"occupation_type": member.occupation})
             if member.role:
-                profile.registration_role = member.role
-                profile.save(update_fields=["registration_role"])
+                profile_changes += apply_changes(profile, {"registration_role": member.role})
 
         # ---------- FLUTTER DATA OVERRIDE (NO IMAGE) ----------
         if profile_data_from_app:
@@ -201,69 +258,31 @@ class VerifyOTPView(APIView):
             def is_valid(val):
                 return val is not None and str(val).strip() != ""
 
+            # validated_data is keyed by model field (the serializers' source)
+            def app_values(section, field_map):
+                return {attr: section[attr] for attr in field_map.values() if is_valid(section.get(attr))}
+
             # Role
             if is_valid(validated.get("selectedRole")):
-                profile.registration_role = validated["selectedRole"]
-                profile.save(update_fields=["registration_role"])
-
-            # PERSONAL
-            p = validated.get("personal", {})
-            personal_map = {
-                "fullName": "full_name",
-                "nickname": "nickname",
-                "gender": "gender",
-                "dob": "dob",
-                "email": "email",
-                "phone": "phone",
-                "countryCode": "country_code",
-                "address": "address",
-                "nativePlace": "native_place",
-                "currentCity": "current_city",
-                "community": "community",
-                # ❌ profileImage REMOVED
-            }
-
-            for key, attr in personal_map.items():
-                if is_valid(p.get(key)):
-                    setattr(personal, attr, p[key])
+                profile_changes += apply_changes(profile, {"registration_role": validated["selectedRole"]})
 
-            personal.save()
+            changed = apply_changes(personal, app_values(validated.get("personal", {}), self.PERSONAL_MAP))
 
-            # EDUCATION
             e = validated.get("education", {})
-            edu_map = {
-                "qualification": "qualification",
-                "institution": "institution",
-                "field": "field",
-                "startYear": "start_year",
-                "endYear": "end_year",
-            }
-
-            for key, attr in edu_map.items():
-                if is_valid(e.get(key)):
-                    setattr(education, attr, e[key])
-
-            if "currentlyStudying" in e:
-                education.currently_studying = e["currentlyStudying"]
-
-            education.save()
-
-            # JOB
-            j = validated.get("job", {})
-            job_map = {
-                "occupationType": "occupation_type",
-                "companyName": "company_name",
-                "role": "role",
-                "industry": "industry",
-                "startDate": "start_date",
-                "incomeRange": "income_range",
-            }
+            education_values = app_values(e, self.EDUCATION_MAP)
+            if "currently_studying" in e:
+                education_values["currently_studying"] = e["currently_studying"]
+            changed_education = apply_changes(education, education_values)
 
-            for key, attr in job_map.items():
-                if is_valid(j.get(key)):
-                    setattr(job, attr, j[key])
+            changed_job = apply_changes(job, app_values(validated.get("job", {}), self.JOB_MAP))
 
-            job.save()
+            # App edits reach the Member through the regular sync
+            for record, record_changes in (("personal", changed), ("education", changed_education), ("job", changed_job)):
+                if record_changes:
+                    app_changed.add(record)
+            personal_changes += changed
+            education_changes += changed_education
+            job_changes += changed_job
 
         # ---------- PROFILE COMPLETION ----------
         mandatory = [
@@ -277,21 +296,15 @@ class VerifyOTPView(APIView):
         if not (member and member.relation in ["son", "daughter"]):
             mandatory.append(personal.phone)
 
-        profile.is_profile_completed = all(mandatory)
-        profile.save(update_fields=["is_profile_completed"])
+        profile_changes += apply_changes(profile, {"is_profile_completed": all(mandatory)})
 
-        # ---------- RESPONSE ----------
-        refresh = RefreshToken.for_user(user)
-
-        return Response(
-            {
-                "success": True,
-                "message": "OTP verified successfully",
-                "token": str(refresh.access_token),
-                "userId": user.id,
-                "firstTime": created,
-                "profileCompleted": profile.is_profile_completed,
-                "data": build_profile_response(profile),
-            },
-            status=200,
+        # ---------- SAVE (changed fields only) ----------
+        save_record(
+            profile, profile_changes,
+            always=profile._state.adding and bool(personal_changes or education_changes or job_changes),
         )
+        save_record(personal, personal_changes, sync="personal" in app_changed)
+        save_record(education, education_changes, sync="education" in app_changed)
+        save_record(job, job_changes, sync="job" in app_changed)
+
+        return cache_profile_snapshot(profile)
@@ -1,6 +1,6 @@
 from rest_framework.permissions import IsAuthenticated
 
-from notifications.models import Notification
+from notifications.dispatch import enqueue_notification
 from .models import Event, Notice, Advertisement
 from .serializers import EventSerializer, NoticeSerializer, AdvertisementSerializer
 from .base_viewset import BaseModelViewSet
@@ -15,8 +15,8 @@ class EventViewSet(BaseModelViewSet):
         # 1️⃣ Save event
         event = serializer.save(created_by=self.request.user)
 
-        # 2️⃣ Create notification (PUBLIC)
-        Notification.objects.create(
+        # 2️⃣ Queue notification (PUBLIC)
+        enqueue_notification(
             title=event.title,
             message=f"New event created",
             type="event",
@@ -34,7 +34,7 @@ class NoticeViewSet(BaseModelViewSet):
     def perform_create(self, serializer):
         notice = serializer.save(created_by=self.request.user)
 
-        Notification.objects.create(
+        enqueue_notification(
             title=notice.title,
             message="New notice announced",
             type="notice",
@@ -52,7 +52,7 @@ class AdvertisementViewSet(BaseModelViewSet):
     def perform_create(self, serializer):
         ad = serializer.save(created_by=self.request.user)
 
-        Notification.objects.create(
+        enqueue_notification(
             title=ad.title,
             message="New advertisement announced",
             type="advertise",
@@ -8,7 +8,7 @@ from drf_yasg import openapi
 
 from community.models import Advertisement, Event, Notice
 from users.models import User
-from notifications.models import Notification
+from notifications.services import cached_unread_count
 
 
 from rest_framework.views import APIView
@@ -90,9 +90,7 @@ class DashboardAPI(APIView):
         upcoming_events = Event.objects.filter(event_date__gte=today).count()
         latest_notices = Notice.objects.count()
         total_ads = Advertisement.objects.count()
-        notification_count = Notification.objects.filter(
-            user=user, is_read=False
-        ).count()
+        notification_count = cached_unread_count(user)
 
         return Response({
             "notificationCount": notification_count,
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from members.models import Member
+from members.phone import backfill_phone_e164
+
+
+class Command(BaseCommand):
+    help = "Recompute the normalized E.164 phone column for all members"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows loaded and written per batch (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Normalizing member phone numbers...")
+        updated = backfill_phone_e164(Member, batch_size=max(options["batch_size"], 1))
+        self.stdout.write(self.style.SUCCESS(f"Updated phone_e164 on {updated} members."))
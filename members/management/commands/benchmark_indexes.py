@@ -0,0 +1,205 @@
+import random
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from authapp.models import OTP
+from members.models import Family, Member, MemberRole, RelationshipRequest, RelationshipRequestStatus
+from members.phone import normalize_phone
+from notifications.models import Notification
+from users.models import User
+
+# (app_label, model_name, index name) toggled for the before/after runs
+INDEX_PLAN = [
+    ("members", "member", "member_user_role_idx"),
+    ("members", "member", "member_phone_e164_idx"),
+    ("members", "member", "member_family_phone_idx"),
+    ("members", "relationshiprequest", "relreq_receiver_status_idx"),
+    ("notifications", "notification", "notif_user_unread_idx"),
+    ("notifications", "notification", "notif_broadcast_created_idx"),
+    ("authapp", "otp", "otp_phone_cc_created_idx"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and print query plans and timings "
+        "for the hot endpoint queries with and without the index plan"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--families", type=int, default=2000, help="Families to seed (default: 2000)")
+        parser.add_argument("--members-per-family", type=int, default=6, help="Members per family (default: 6)")
+        parser.add_argument("--notifications", type=int, default=50000, help="Notifications to seed (default: 50000)")
+        parser.add_argument("--otps", type=int, default=50000, help="OTP rows to seed (default: 50000)")
+        parser.add_argument("--repeat", type=int, default=200, help="Executions per query and phase (default: 200)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        old_name = connection.settings_dict["NAME"]
+        # Never touch the configured database: seed a fresh test database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            sample = self.seed(options)
+            queries = self.queries(sample)
+
+            self.stdout.write(self.style.MIGRATE_HEADING("\n=== Without index plan ==="))
+            self.toggle_indexes(enabled=False)
+            before = self.run(queries, options["repeat"])
+
+            self.stdout.write(self.style.MIGRATE_HEADING("\n=== With index plan ==="))
+            self.toggle_indexes(enabled=True)
+            after = self.run(queries, options["repeat"])
+
+            self.stdout.write(self.style.MIGRATE_HEADING("\n=== Summary (mean ms per query) ==="))
+            for label in queries:
+                speedup = before[label] / after[label] if after[label] else float("inf")
+                self.stdout.write(f"{label:<38} {before[label]:>9.3f} → {after[label]:>9.3f}  ({speedup:.1f}x)")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    # -------------------------------------------------
+    # DATASET
+    # -------------------------------------------------
+    def seed(self, options):
+        started = time.monotonic()
+        families = options["families"]
+        per_family = max(options["members_per_family"], 1)
+        now = timezone.now()
+
+        users = User.objects.bulk_create(
+            [User(phone=f"7{i:09d}", country_code="+91", role="member") for i in range(families)],
+            batch_size=1000,
+        )
+        family_rows = Family.objects.bulk_create([Family(head=user) for user in users], batch_size=1000)
+
+        members = []
+        for family, user in zip(family_rows, users):
+            for j in range(per_family):
+                mobile = user.phone if j == 0 else f"8{family.id:07d}{j:02d}"
+                members.append(Member(
+                    name=f"Member {family.id}-{j}",
+                    mobile=mobile,
+                    phone_e164=normalize_phone(mobile, "+91"),
+                    family=family,
+                    user=user if j == 0 else None,
+                    role=MemberRole.FAMILY_HEAD if j == 0 else MemberRole.MEMBER,
+                ))
+        Member.objects.bulk_create(members, batch_size=1000)
+        member_ids = list(Member.objects.values_list("id", flat=True))
+
+        RelationshipRequest.objects.bulk_create(
+            [
+                RelationshipRequest(
+                    sender_id=random.choice(member_ids),
+                    receiver_id=random.choice(member_ids),
+                    proposed_relation="father",
+                    status=random.choice(RelationshipRequestStatus.values),
+                )
+                for _ in range(families * 2)
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+        notifications = []
+        for i in range(options["notifications"]):
+            broadcast = i % 10 == 0
+            notifications.append(Notification(
+                user=None if broadcast else random.choice(users),
+                title=f"Notification {i}",
+                message="",
+                type="notice" if broadcast else "approve",
+                is_read=random.random() < 0.7,
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+
+        OTP.objects.bulk_create(
+            [
+                OTP(phone=random.choice(users).phone, country_code="+91", code="123456")
+                for _ in range(options["otps"])
+            ],
+            batch_size=1000,
+        )
+        # auto_now_add gives every row the same timestamp; spread them out
+        for model in (Notification, OTP):
+            for pk in model.objects.values_list("id", flat=True)[::97]:
+                model.objects.filter(id=pk).update(created_at=now - timedelta(minutes=random.randint(0, 60 * 24 * 90)))
+
+        self.stdout.write(
+            f"Seeded {len(users)} families, {len(members)} members, {len(notifications)} notifications "
+            f"and {options['otps']} OTPs in {time.monotonic() - started:.1f}s"
+        )
+
+        head = Member.objects.filter(role=MemberRole.FAMILY_HEAD).order_by("?").first()
+        return {
+            "user_id": head.user_id,
+            "family_id": head.family_id,
+            "phone": head.mobile,
+            "phone_e164": head.phone_e164,
+            "receiver_id": random.choice(member_ids),
+        }
+
+    # -------------------------------------------------
+    # QUERIES
+    # -------------------------------------------------
+    def queries(self, s):
+        """Main query of each endpoint the index plan targets."""
+        return {
+            "family head (add/update/delete member)": lambda: Member.objects.filter(
+                user_id=s["user_id"], role=MemberRole.FAMILY_HEAD
+            ),
+            "duplicate mobile in family": lambda: Member.objects.filter(
+                family_id=s["family_id"], phone_e164=s["phone_e164"]
+            ),
+            "OTP member linking": lambda: Member.objects.filter(phone_e164=s["phone_e164"])[:1],
+            "latest OTP": lambda: OTP.objects.filter(
+                phone=s["phone"], country_code="+91"
+            ).order_by("-created_at")[:1],
+            "notification feed": lambda: Notification.objects.filter(
+                Q(user_id=s["user_id"]) | Q(user__isnull=True)
+            ).order_by("-created_at")[:50],
+            "dashboard unread count": lambda: Notification.objects.filter(
+                user_id=s["user_id"], is_read=False
+            ),
+            "pending relationship requests": lambda: RelationshipRequest.objects.filter(
+                receiver_id=s["receiver_id"], status=RelationshipRequestStatus.PENDING
+            ),
+        }
+
+    def run(self, queries, repeat):
+        timings = {}
+        for label, build in queries.items():
+            qs = build()
+            self.stdout.write(self.style.SQL_KEYWORD(f"\n-- {label}"))
+            self.stdout.write(qs.explain())
+
+            # Time the SQL itself; model instantiation would drown the difference
+            sql, params = qs.query.sql_with_params()
+            with connection.cursor() as cursor:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                timings[label] = (time.perf_counter() - started) * 1000 / max(repeat, 1)
+            self.stdout.write(f"   {timings[label]:.3f} ms/query")
+        return timings
+
+    def toggle_indexes(self, enabled):
+        with connection.schema_editor() as editor:
+            for app_label, model_name, index_name in INDEX_PLAN:
+                model = apps.get_model(app_label, model_name)
+                index = next(i for i in model._meta.indexes if i.name == index_name)
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+        # Refresh planner statistics, as a maintained production database would have
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
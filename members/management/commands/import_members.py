@@ -0,0 +1,362 @@
+import csv
+import time
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework import serializers
+
+from members.management.commands.sync_family_tree import heal_family_chunk
+from members.models import Family, Member, MemberStatus
+from members.phone import DEFAULT_COUNTRY_CODE, normalize_phone
+from members.serializers import MemberImportRowSerializer
+from members.services.importer import LINK_FIELDS, REF_PREFIX, find_parent_cycle, parse_link
+from members.services.kinship import relink_lineage
+
+# Grouping columns: a free-text key for families created by the import, or
+# the id of a family that already exists
+FAMILY_KEY_COLUMN = "family_key"
+FAMILY_ID_COLUMN = "family_id"
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportState:
+    """Everything the import keeps between chunks: ids and pending links only."""
+
+    def __init__(self):
+        self.member_ids = {}      # file row -> new member id
+        self.member_family = {}   # new member id -> family id
+        self.family_keys = {}     # family_key -> new family id
+        self.phones = {}          # normalized phone -> file row
+        self.links = []           # (file row, field, ("ref", row) | ("id", member_id))
+        self.affected_families = set()
+        self.invalid_rows = set()
+        self.errors = []
+
+    def error(self, row, field, message):
+        self.invalid_rows.add(row)
+        self.errors.append((row, field, message))
+
+
+class Command(BaseCommand):
+    help = (
+        "Import families and members from a CSV or XLSX file. Rows sharing a "
+        f"'{FAMILY_KEY_COLUMN}' become one new family ('{FAMILY_ID_COLUMN}' adds to an "
+        f"existing one); father_id / mother_id / spouse_id take a member id or "
+        f"'{REF_PREFIX}<row>' (0-based data row in the file)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with a header row")
+        parser.add_argument("--sheet", help="XLSX worksheet name (default: the active sheet)")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows validated and inserted per chunk (default: 1000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and resolve the whole file, then roll everything back",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        chunk_size = max(options["chunk_size"], 1)
+        state = ImportState()
+        started = time.monotonic()
+        total_rows = 0
+
+        with transaction.atomic():
+            rows = enumerate(self.read_rows(path, options["sheet"]))
+            chunk_no = 0
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                chunk_no += 1
+
+                chunk_started = time.monotonic()
+                created = self.import_chunk(chunk, state)
+                elapsed = time.monotonic() - chunk_started
+                total_rows += len(chunk)
+
+                rate = len(chunk) / elapsed if elapsed else float(len(chunk))
+                overall = time.monotonic() - started
+                self.stdout.write(
+                    f"Chunk {chunk_no}: {len(chunk)} rows, {created} members created in {elapsed:.2f}s "
+                    f"({rate:.0f} rows/s, {total_rows / overall if overall else total_rows:.0f} rows/s overall)"
+                )
+
+            linked = self.link_rows(state)
+            if state.errors:
+                self.report_errors(state.errors)
+                raise CommandError(f"{len(state.errors)} invalid row(s); nothing was imported.")
+
+            # Bulk writes skip signals: maintain the closure and heal explicitly
+            with_parents = sorted({
+                state.member_ids[row] for row, field, _ in state.links if field != "spouse_id"
+            })
+            for start in range(0, len(with_parents), chunk_size):
+                relink_lineage(with_parents[start:start + chunk_size])
+            healed = self.heal_families(state.affected_families, chunk_size)
+
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        elapsed = time.monotonic() - started
+        rate = total_rows / elapsed if elapsed else float(total_rows)
+        summary = (
+            f"{len(state.member_ids)} members in {len(state.affected_families)} families "
+            f"({len(state.family_keys)} new), {linked} links, {healed} rows healed "
+            f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        )
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Dry run, rolled back: {summary}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {summary}."))
+
+    # -------------------------------------------------
+    # READING
+    # -------------------------------------------------
+    def read_rows(self, path, sheet=None):
+        """Yields one dict per data row, streaming from disk."""
+        if path.suffix.lower() in (".xlsx", ".xlsm"):
+            yield from self.read_xlsx(path, sheet)
+        else:
+            with path.open(newline="", encoding="utf-8-sig") as handle:
+                reader = csv.reader(handle)
+                header = [column.strip().lower() for column in next(reader, [])]
+                for values in reader:
+                    if any(value.strip() for value in values):
+                        yield dict(zip(header, values))
+
+    def read_xlsx(self, path, sheet):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError("Reading .xlsx files requires openpyxl (pip install openpyxl).")
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.active
+            rows = worksheet.iter_rows(values_only=True)
+            header = [str(column or "").strip().lower() for column in next(rows, ())]
+            for values in rows:
+                cells = [self.cell_text(value) for value in values]
+                if any(cells):
+                    yield dict(zip(header, cells))
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def cell_text(value):
+        if value is None:
+            return ""
+        if isinstance(value, datetime):
+            return value.date().isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))  # mobiles and ids typed as numbers
+        return str(value).strip()
+
+    # -------------------------------------------------
+    # PHASE 1: validate and insert a chunk
+    # -------------------------------------------------
+    def import_chunk(self, chunk, state):
+        """Validates one chunk and bulk-inserts its valid rows. Returns members created."""
+        # One serializer instance validates every row, as ListSerializer does
+        validator = MemberImportRowSerializer()
+        fields = set(validator.fields)
+
+        valid = []
+        cleaned = {}
+        for row, raw in chunk:
+            data = {key: value.strip() for key, value in raw.items() if key in fields and value and value.strip()}
+            try:
+                cleaned[row] = validator.run_validation(data)
+            except serializers.ValidationError as exc:
+                for field, messages in exc.detail.items():
+                    state.error(row, field, " ".join(str(m) for m in messages))
+            else:
+                valid.append((row, raw))
+
+        families = self.resolve_families(valid, state)
+        phones = self.check_phones(cleaned, state)
+
+        members = []
+        rows = []
+        for row, _ in valid:
+            if row in state.invalid_rows:
+                continue
+            values = {k: v for k, v in cleaned[row].items() if k not in LINK_FIELDS}
+            values.setdefault("status", MemberStatus.ACTIVE)
+            member = Member(family_id=families[row], **values)
+            member.phone_e164 = phones[row]
+            members.append(member)
+            rows.append(row)
+
+            for field in LINK_FIELDS:
+                link = parse_link(cleaned[row].get(field))
+                if link:
+                    state.links.append((row, field, link))
+
+        Member.objects.bulk_create(members, batch_size=500)
+        for row, member in zip(rows, members):
+            state.member_ids[row] = member.id
+            state.member_family[member.id] = member.family_id
+            state.affected_families.add(member.family_id)
+        return len(members)
+
+    def resolve_families(self, valid, state):
+        """Maps each row to its family id, creating new families once per key."""
+        existing_ids = {}
+        for row, raw in valid:
+            value = (raw.get(FAMILY_ID_COLUMN) or "").strip()
+            if value:
+                try:
+                    existing_ids[row] = int(value)
+                except ValueError:
+                    state.error(row, FAMILY_ID_COLUMN, "Invalid family id")
+        found = set(Family.objects.filter(id__in=set(existing_ids.values())).values_list("id", flat=True))
+
+        new_keys = []
+        for row, raw in valid:
+            key = (raw.get(FAMILY_KEY_COLUMN) or "").strip()
+            if row in existing_ids or not key or key in state.family_keys or key in new_keys:
+                continue
+            new_keys.append(key)
+        created = Family.objects.bulk_create([Family() for _ in new_keys])
+        state.family_keys.update(zip(new_keys, (family.id for family in created)))
+
+        families = {}
+        for row, raw in valid:
+            key = (raw.get(FAMILY_KEY_COLUMN) or "").strip()
+            if row in existing_ids:
+                if existing_ids[row] not in found:
+                    state.error(row, FAMILY_ID_COLUMN, f"Family {existing_ids[row]} does not exist")
+                families[row] = existing_ids[row]
+            elif key:
+                families[row] = state.family_keys[key]
+            elif row not in state.invalid_rows:
+                state.error(row, FAMILY_KEY_COLUMN, f"Either {FAMILY_KEY_COLUMN} or {FAMILY_ID_COLUMN} is required")
+        return families
+
+    def check_phones(self, cleaned, state):
+        """Mobiles are required and must be new: unique in the file and in the database."""
+        phones = {}
+        for row, attrs in cleaned.items():
+            phone = normalize_phone(attrs.get("mobile"), attrs.get("country_code") or DEFAULT_COUNTRY_CODE)
+            if not phone:
+                state.error(row, "mobile", "Mobile number is required")
+            elif phone in state.phones:
+                state.error(row, "mobile", f"Duplicate of row {state.phones[phone]} in this file")
+            else:
+                state.phones[phone] = row
+                phones[row] = phone
+
+        taken = Member.objects.filter(phone_e164__in=list(phones.values())).values_list("phone_e164", flat=True)
+        for phone in taken:
+            state.error(state.phones[phone], "mobile", "This mobile is already registered.")
+        return phones
+
+    # -------------------------------------------------
+    # PHASE 2: resolve links across the whole file
+    # -------------------------------------------------
+    def link_rows(self, state):
+        """Resolves the pending links and writes them with bulk_update. Returns links set."""
+        existing_ids = {link[1] for _, _, link in state.links if link[0] == "id"}
+        existing = {}
+        id_list = sorted(existing_ids)
+        for start in range(0, len(id_list), 1000):
+            for member in Member.objects.filter(id__in=id_list[start:start + 1000]).only("id", "family_id", "spouse_id"):
+                existing[member.id] = member
+
+        def resolve(row, field, link):
+            if link[0] == "id":
+                if link[1] not in existing:
+                    state.error(row, field, f"Member {link[1]} does not exist")
+                return link[1]
+            if link[1] == row:
+                state.error(row, field, "A member cannot be linked to itself")
+            elif link[1] not in state.member_ids:
+                state.error(row, field, f"Row {link[1]} is missing or invalid")
+            return state.member_ids.get(link[1])
+
+        updates = {}   # member id -> {field: value}
+        spouse_of = {}  # member id -> spouse member id
+        parent_rows = {}
+        for row, field, link in state.links:
+            if row not in state.member_ids:
+                continue
+            member_id = state.member_ids[row]
+            target = resolve(row, field, link)
+            if target is None:
+                continue
+            updates.setdefault(member_id, {})[field] = target
+            if field == "spouse_id":
+                spouse_of[member_id] = (row, target)
+            elif link[0] == "ref":
+                parent_rows.setdefault(row, []).append(link[1])
+
+        cycle = find_parent_cycle(parent_rows)
+        if cycle:
+            state.error(cycle[0], "father_id", "Circular dependency between rows " + " → ".join(map(str, cycle)))
+
+        # Spouse links are symmetric: write the partner side too
+        for member_id, (row, partner_id) in spouse_of.items():
+            partner = existing.get(partner_id)
+            partner_family = partner.family_id if partner is not None else state.member_family[partner_id]
+            if partner_family != state.member_family[member_id]:
+                state.error(row, "spouse_id", "Spouse must belong to same family")
+                continue
+            if partner is not None:
+                if partner.spouse_id and partner.spouse_id != member_id:
+                    state.error(row, "spouse_id", f"Member {partner_id} is already linked to a spouse")
+                    continue
+            elif spouse_of.get(partner_id, (None, member_id))[1] != member_id:
+                state.error(row, "spouse_id", f"Row {spouse_of[partner_id][0]} is linked to a different spouse")
+                continue
+            claimed = updates.setdefault(partner_id, {}).setdefault("spouse_id", member_id)
+            if claimed != member_id:
+                state.error(row, "spouse_id", "Spouse is already claimed by another row")
+
+        if state.errors:
+            return 0
+
+        ids = sorted(updates)
+        for start in range(0, len(ids), 1000):
+            members = list(Member.objects.filter(id__in=ids[start:start + 1000]).only("id", *LINK_FIELDS))
+            for member in members:
+                for field, value in updates[member.id].items():
+                    setattr(member, field, value)
+            Member.objects.bulk_update(members, ["father", "mother", "spouse"], batch_size=500)
+        return sum(len(fields) for fields in updates.values())
+
+    # -------------------------------------------------
+    # PHASE 3: heal only the families the file touched
+    # -------------------------------------------------
+    def heal_families(self, family_ids, chunk_size):
+        family_ids = sorted(family_ids)
+        changed = 0
+        for start in range(0, len(family_ids), chunk_size):
+            chunk = list(
+                Family.objects.filter(id__in=family_ids[start:start + chunk_size])
+                .order_by("id")
+                .values_list("id", "head_id", "relations_version")
+            )
+            changed += heal_family_chunk(chunk)[1]
+        return changed
+
+    def report_errors(self, errors):
+        for row, field, message in sorted(errors)[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f"Row {row} [{field}]: {message}")
+        if len(errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {len(errors) - MAX_REPORTED_ERRORS} more")
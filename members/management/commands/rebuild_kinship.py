@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from members.services.kinship import rebuild_lineage
+
+
+class Command(BaseCommand):
+    help = "Rebuild the kinship closure table from father/mother links"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding kinship closure...")
+        rows = rebuild_lineage()
+        self.stdout.write(self.style.SUCCESS(f"Kinship closure rebuilt with {rows} ancestor rows."))
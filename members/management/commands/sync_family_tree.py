@@ -1,18 +1,162 @@
-from django.core.management.base import BaseCommand
-from members.models import Family
-from members.utils import heal_family_relations
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as dt_time
+from types import SimpleNamespace
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from members.models import Family, Member
+from members.utils import heal_members, mark_families_healed, save_healed_members
+
+# Columns the healer reads; everything else stays deferred
+HEAL_COLUMNS = ("id", "family_id", "user_id", "role", "relation", "gender", "father_id", "mother_id", "spouse_id")
+
+
+def heal_family_rows(payload):
+    """
+    Process-pool worker: heals one family given as plain row tuples and
+    returns [(member_id, father_id, mother_id, spouse_id)] for changed rows.
+    Never touches the database.
+    """
+    family_id, head_user_id, rows = payload
+    members = [SimpleNamespace(**dict(zip(HEAL_COLUMNS, row))) for row in rows]
+    dirty = heal_members(members, head_user_id)
+    return family_id, [(m.id, m.father_id, m.mother_id, m.spouse_id) for m in dirty]
+
+
+def heal_family_chunk(chunk, pool=None):
+    """Heals one chunk of (family_id, head_id, version) rows. Returns (members, changed)."""
+    family_ids = [family_id for family_id, _, _ in chunk]
+    members = list(Member.objects.filter(family_id__in=family_ids).only(*HEAL_COLUMNS))
+
+    rows_by_family = defaultdict(list)
+    for m in members:
+        rows_by_family[m.family_id].append(tuple(getattr(m, column) for column in HEAL_COLUMNS))
+    payloads = [
+        (family_id, head_id, rows_by_family[family_id])
+        for family_id, head_id, _ in chunk
+        if rows_by_family[family_id]
+    ]
+
+    results = pool.map(heal_family_rows, payloads, chunksize=16) if pool else map(heal_family_rows, payloads)
+
+    member_map = {m.id: m for m in members}
+    parents_before = {m.id: (m.father_id, m.mother_id) for m in members}
+    dirty_members = []
+    for _, changes in results:
+        for member_id, father_id, mother_id, spouse_id in changes:
+            member = member_map[member_id]
+            member.father_id, member.mother_id, member.spouse_id = father_id, mother_id, spouse_id
+            dirty_members.append(member)
+
+    with transaction.atomic():
+        save_healed_members(dirty_members, parents_before)
+        mark_families_healed({family_id: version for family_id, _, version in chunk})
+
+    return len(members), len(dirty_members)
 
 
 class Command(BaseCommand):
     help = "Heal and synchronize family tree relationships for all families in the database"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dirty-only",
+            action="store_true",
+            help="Only heal families whose relations changed since their last heal (for scheduled runs)",
+        )
+        parser.add_argument(
+            "--since",
+            help="Only heal families whose relations changed at or after this date/datetime (ISO format), "
+                 "plus unhealed families with no recorded change",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Families loaded, healed and written per chunk (default: 500)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Heal chunks in a process pool of this size (default: 1, in-process)",
+        )
+
     def handle(self, *args, **options):
         families = Family.objects.all()
+        if options["dirty_only"]:
+            families = families.exclude(healed_version=F("relations_version"))
+        if options["since"]:
+            # Families never stamped (changed before the column existed) count
+            # until they have been healed once
+            families = families.filter(
+                Q(relations_changed_at__gte=self.parse_since(options["since"]))
+                | Q(relations_changed_at__isnull=True, healed_version__lt=F("relations_version"))
+            )
+
+        chunk_size = max(options["chunk_size"], 1)
+        workers = max(options["workers"], 1)
         self.stdout.write(f"Starting family tree healing for {families.count()} families...")
-        
-        count = 0
-        for family in families:
-            heal_family_relations(family)
-            count += 1
-            
-        self.stdout.write(self.style.SUCCESS(f"Successfully healed and synchronized {count} families."))
+
+        pool = None
+        if workers > 1:
+            # Children must not inherit open database connections
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+
+        total_families = total_members = total_changed = 0
+        started = time.monotonic()
+        last_id = 0
+        chunk_no = 0
+
+        try:
+            while True:
+                chunk = list(
+                    families.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", "head_id", "relations_version")[:chunk_size]
+                )
+                if not chunk:
+                    break
+                last_id = chunk[-1][0]
+                chunk_no += 1
+
+                chunk_started = time.monotonic()
+                members, changed = heal_family_chunk(chunk, pool)
+                elapsed = time.monotonic() - chunk_started
+
+                total_families += len(chunk)
+                total_members += members
+                total_changed += changed
+                rate = members / elapsed if elapsed else float(members)
+                self.stdout.write(
+                    f"Chunk {chunk_no}: {len(chunk)} families, {members} members, "
+                    f"{changed} rows changed in {elapsed:.2f}s ({rate:.0f} members/s)"
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully healed and synchronized {total_families} families "
+            f"({total_members} members, {total_changed} rows changed) in {elapsed:.2f}s."
+        ))
+
+    def parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f"Invalid --since value: {value!r}")
+            since = datetime.combine(day, dt_time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
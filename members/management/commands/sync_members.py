@@ -1,21 +1,37 @@
+import time
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.contrib.auth import get_user_model
 from members.models import Member, MemberStatus, MemberRole, Family
+from members.phone import normalize_phone
+from members.utils import HEAL_INPUT_FIELDS, mark_families_dirty
 from profiles.models import UserProfile
 from members.constants import Community
 
 User = get_user_model()
 
+HEAD_MOBILE = "9510981420"
+
+ROLE_MAPPING = {
+    "familyHead": MemberRole.FAMILY_HEAD,
+    "member": MemberRole.MEMBER,
+}
+
+
 class Command(BaseCommand):
-    help = "Sync UserProfiles and link all members to Family Head 9510981420"
+    help = f"Sync UserProfiles and link all members to Family Head {HEAD_MOBILE}"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Profiles loaded, diffed and written per chunk (default: 1000)",
+        )
 
     def handle(self, *args, **options):
-        count_created = 0
-        count_updated = 0
-        
         # 1. Setup the Primary Family Head
-        HEAD_MOBILE = "9510981420"
         try:
             head_user = User.objects.get(phone=HEAD_MOBILE)
             # Ensure a Family anchor exists for this specific head
@@ -25,75 +41,158 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"Critical Error: User with mobile {HEAD_MOBILE} not found!"))
             return
 
-        role_mapping = {
-            "familyHead": MemberRole.FAMILY_HEAD,
-            "member": MemberRole.MEMBER,
+        chunk_size = max(options["chunk_size"], 1)
+        profiles = UserProfile.objects.select_related("user", "personal", "job", "education_detail").order_by("id")
+
+        totals = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        started = time.monotonic()
+        last_id = 0
+        chunk_no = 0
+
+        while True:
+            chunk = list(profiles.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            chunk_no += 1
+
+            chunk_started = time.monotonic()
+            counts = self.sync_chunk(chunk, primary_family)
+            elapsed = time.monotonic() - chunk_started
+
+            for key, value in counts.items():
+                totals[key] += value
+            rate = len(chunk) / elapsed if elapsed else float(len(chunk))
+            self.stdout.write(
+                f"Chunk {chunk_no}: {len(chunk)} profiles, {counts['created']} created, "
+                f"{counts['updated']} updated in {elapsed:.2f}s ({rate:.0f} profiles/s)"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Sync Finished. Members linked to {HEAD_MOBILE}: {totals['created']} created, "
+            f"{totals['updated']} updated, {totals['unchanged']} unchanged, "
+            f"{totals['skipped']} profiles without personal details ({elapsed:.2f}s)."
+        ))
+
+    def sync_chunk(self, chunk, primary_family):
+        """
+        Diffs one chunk of profiles against their Members in memory and
+        writes the result with one bulk_create and one bulk_update. Bulk
+        writes send no post_save, so nothing is synced back to the profiles.
+        """
+        counts = {"created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        user_ids = [profile.user_id for profile in chunk]
+
+        # First member per user, the same row filter(user=...).first() picks
+        members = {}
+        for member in Member.objects.filter(user_id__in=user_ids).order_by("-id"):
+            members[member.user_id] = member
+
+        # Other family heads get their own family anchor
+        own_family_heads = [
+            profile.user_id for profile in chunk
+            if ROLE_MAPPING.get(profile.registration_role, MemberRole.MEMBER) == MemberRole.FAMILY_HEAD
+            and profile.user.phone != HEAD_MOBILE
+        ]
+        families = dict(Family.objects.filter(head_id__in=own_family_heads).values_list("head_id", "id"))
+
+        to_create = []
+        to_update = []
+        update_fields = set()
+        dirty_families = set()
+
+        with transaction.atomic():
+            missing = [Family(head_id=user_id) for user_id in own_family_heads if user_id not in families]
+            for family in Family.objects.bulk_create(missing):
+                families[family.head_id] = family.id
+
+            for profile in chunk:
+                personal = getattr(profile, "personal", None)
+                if not personal:
+                    counts["skipped"] += 1
+                    continue
+
+                values = self.member_values(profile, personal, primary_family, families)
+                member = members.get(profile.user_id)
+                if member is None:
+                    member = Member(user_id=profile.user_id, **values)
+                    member.phone_e164 = normalize_phone(member.mobile, member.country_code)
+                    to_create.append(member)
+                    dirty_families.add(member.family_id)
+                    continue
+
+                changed = self.apply_values(member, values)
+                if not changed:
+                    counts["unchanged"] += 1
+                    continue
+                if "mobile" in changed:
+                    member.phone_e164 = normalize_phone(member.mobile, member.country_code)
+                    changed.add("phone_e164")
+                if changed & HEAL_INPUT_FIELDS:
+                    dirty_families.update({member.family_id, member._tracked_values.get("family")})
+                update_fields |= changed
+                to_update.append(member)
+
+            Member.objects.bulk_create(to_create, batch_size=500)
+            if to_update:
+                Member.objects.bulk_update(to_update, sorted(update_fields), batch_size=500)
+            # bulk writes skip the healing dirty markers
+            mark_families_dirty(dirty_families)
+
+        counts["created"] = len(to_create)
+        counts["updated"] = len(to_update)
+        return counts
+
+    def member_values(self, profile, personal, primary_family, families):
+        mandatory_fields = [
+            personal.full_name, personal.native_place, personal.gender,
+            personal.dob, personal.phone, profile.registration_role
+        ]
+        profile_completed = all(mandatory_fields)
+
+        job = getattr(profile, "job", None)
+        education = getattr(profile, "education_detail", None)
+        mapped_role = ROLE_MAPPING.get(profile.registration_role, MemberRole.MEMBER)
+
+        # --- TARGET LOGIC ---
+        if profile.user.phone == HEAD_MOBILE or mapped_role == MemberRole.MEMBER:
+            # The actual head, and every other 'member', go to the primary family and community
+            family_id = primary_family.id
+            community = Community.SUTHAR
+        else:
+            # Other 'familyHead' roles keep their own unique family anchor
+            family_id = families[profile.user_id]
+            community = personal.community
+
+        return {
+            "name": personal.full_name,
+            "mobile": personal.phone,
+            "gender": personal.gender,
+            "date_of_birth": personal.dob,
+            "email": personal.email,
+            "address": personal.address,
+            "city": personal.current_city,
+            "native_place": personal.native_place,
+            "profile_image": personal.profile_image.name or None,
+            "occupation": job.occupation_type if job else None,
+            "highest_qualification": education.qualification if education else None,
+            "profile_completed": profile_completed,
+            "status": MemberStatus.ACTIVE if profile_completed else MemberStatus.PENDING,
+            "role": mapped_role,
+            "family_id": family_id,
+            "community": community,
         }
 
-        # Get all profiles
-        profiles = UserProfile.objects.select_related('user', 'personal', 'job').prefetch_related('educations')
-
-        for profile in profiles:
-            personal = getattr(profile, "personal", None)
-            if not personal:
-                continue
-
-            job = getattr(profile, "job", None)
-            educations = profile.educations.all()
-
-            # Profile completion check
-            mandatory_fields = [
-                personal.full_name, personal.native_place, personal.gender, 
-                personal.dob, personal.phone, profile.registration_role
-            ]
-            profile_completed = all(mandatory_fields)
-
-            highest_qualification = None
-            if educations.exists():
-                highest_qualification = educations.order_by('-end_year').first().qualification
-
-            with transaction.atomic():
-                mapped_role = role_mapping.get(profile.registration_role, MemberRole.MEMBER)
-
-                # --- TARGET LOGIC ---
-                if profile.user.phone == HEAD_MOBILE:
-                    # This is the actual head
-                    current_family = primary_family
-                    current_community = Community.SUTHAR
-                elif mapped_role == MemberRole.MEMBER:
-                    # Force all other 'members' to the primary family and community
-                    current_family = primary_family
-                    current_community = Community.SUTHAR
-                else:
-                    # For other 'familyHead' roles not matching the target phone, 
-                    # create their own unique family anchor
-                    current_family, _ = Family.objects.get_or_create(head=profile.user)
-                    current_community = profile.community
-
-                # --- SYNC MEMBER ---
-                member, created = Member.objects.update_or_create(
-                    user=profile.user,
-                    defaults={
-                        "name": personal.full_name,
-                        "mobile": personal.phone,
-                        "gender": personal.gender,
-                        "date_of_birth": personal.dob,
-                        "email": personal.email,
-                        "address": personal.address,
-                        "city": personal.current_city,
-                        "native_place": personal.native_place,
-                        "profile_image": personal.profile_image,
-                        "occupation": job.occupation_type if job else None,
-                        "highest_qualification": highest_qualification,
-                        "profile_completed": profile_completed,
-                        "status": MemberStatus.ACTIVE if profile_completed else MemberStatus.PENDING,
-                        "role": mapped_role,
-                        "family": current_family,
-                        "community": current_community,
-                    }
-                )
-
-                if created: count_created += 1
-                else: count_updated += 1
-
-        self.stdout.write(self.style.SUCCESS(f"✅ Sync Finished. Members linked to {HEAD_MOBILE}."))
\ No newline at end of file
+    @staticmethod
+    def apply_values(member, values) -> set:
+        """Sets the values that differ and returns the changed field names."""
+        changed = set()
+        for attname, value in values.items():
+            current = getattr(member, attname)
+            if attname == "profile_image":
+                current = current.name or None
+            if current != value:
+                setattr(member, attname, value)
+                changed.add(attname.removesuffix("_id"))
+        return changed
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_kinship_closure(apps, schema_editor):
+    from members.services.kinship import compute_ancestry
+
+    Member = apps.get_model("members", "Member")
+    KinshipClosure = apps.get_model("members", "KinshipClosure")
+
+    parents = {
+        member_id: (father_id, mother_id)
+        for member_id, father_id, mother_id in Member.objects.values_list("id", "father_id", "mother_id")
+    }
+    rows = [
+        KinshipClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth, line=line)
+        for descendant_id, ancestors in compute_ancestry(parents).items()
+        for ancestor_id, (depth, line) in ancestors.items()
+    ]
+    KinshipClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0007_remove_member_parent_member_father_member_mother_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KinshipClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('line', models.CharField(choices=[('paternal', 'Paternal'), ('maternal', 'Maternal')], max_length=10)),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='members.member')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='members.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'descendant'], name='kinship_ancestor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('descendant', 'ancestor'), name='unique_kinship_descendant_ancestor')],
+            },
+        ),
+        migrations.RunPython(build_kinship_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0008_kinshipclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='family',
+            name='healed_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='family',
+            name='relations_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
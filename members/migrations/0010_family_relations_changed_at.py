@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0009_family_healing_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='family',
+            name='relations_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0010_family_relations_changed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['-created_at', '-id'], name='member_created_id_idx'),
+        ),
+    ]
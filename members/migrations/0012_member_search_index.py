@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-18 01:30
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from members.search import install_search_index
+
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from members.search import uninstall_search_index
+
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0011_member_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 01:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from members.phone import backfill_phone_e164
+
+    backfill_phone_e164(apps.get_model("members", "Member"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0012_member_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='phone_e164',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['phone_e164'], name='member_phone_e164_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['family', 'phone_e164'], name='member_family_phone_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
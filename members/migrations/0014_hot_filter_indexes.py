@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 01:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0013_member_phone_e164'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['user', 'role'], name='member_user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='relationshiprequest',
+            index=models.Index(fields=['receiver', 'status'], name='relreq_receiver_status_idx'),
+        ),
+    ]
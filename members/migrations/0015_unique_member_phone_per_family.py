@@ -0,0 +1,98 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def merge_duplicate_phones(apps, schema_editor):
+    """
+    Folds members sharing one canonical mobile inside a family into a
+    single row before the unique constraint moves onto phone_e164.
+
+    The user-linked row (else the oldest) is kept; children, spouse and
+    user links move onto it. A duplicate linked to a different user is
+    detached from the family instead of deleted.
+    """
+    from members.phone import backfill_phone_e164
+    from members.services.kinship import compute_ancestry
+
+    Member = apps.get_model("members", "Member")
+    Family = apps.get_model("members", "Family")
+    KinshipClosure = apps.get_model("members", "KinshipClosure")
+
+    # Rows written since 0013 by code paths that skip save()
+    backfill_phone_e164(Member)
+
+    groups = (
+        Member.objects.filter(family__isnull=False)
+        .exclude(phone_e164="")
+        .values("family_id", "phone_e164")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    touched_families = set()
+    for group in groups:
+        members = sorted(
+            Member.objects.filter(family_id=group["family_id"], phone_e164=group["phone_e164"]),
+            key=lambda m: (m.user_id is None, m.id),
+        )
+        kept, duplicates = members[0], members[1:]
+        for duplicate in duplicates:
+            Member.objects.filter(father_id=duplicate.id).update(father_id=kept.id)
+            Member.objects.filter(mother_id=duplicate.id).update(mother_id=kept.id)
+
+            partner_id = duplicate.spouse_id
+            if partner_id and partner_id != kept.id:
+                Member.objects.filter(id=duplicate.id).update(spouse_id=None)
+                if kept.spouse_id is None:
+                    Member.objects.filter(id=kept.id).update(spouse_id=partner_id)
+                    kept.spouse_id = partner_id
+            if not Member.objects.filter(spouse_id=kept.id).exists():
+                Member.objects.filter(spouse_id=duplicate.id).exclude(id=kept.id).update(spouse_id=kept.id)
+
+            if duplicate.user_id and duplicate.user_id != kept.user_id:
+                if kept.user_id is not None:
+                    Member.objects.filter(id=duplicate.id).update(family_id=None)
+                    continue
+                Member.objects.filter(id=kept.id).update(user_id=duplicate.user_id)
+                kept.user_id = duplicate.user_id
+            duplicate.delete()
+        touched_families.add(group["family_id"])
+
+    if not touched_families:
+        return
+
+    Family.objects.filter(id__in=touched_families).update(relations_version=F("relations_version") + 1)
+
+    parents = {
+        member_id: (father_id, mother_id)
+        for member_id, father_id, mother_id in Member.objects.values_list("id", "father_id", "mother_id")
+    }
+    KinshipClosure.objects.all().delete()
+    KinshipClosure.objects.bulk_create(
+        [
+            KinshipClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth, line=line)
+            for descendant_id, ancestors in compute_ancestry(parents).items()
+            for ancestor_id, (depth, line) in ancestors.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0014_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='member',
+            name='unique_member_country_mobile_per_family',
+        ),
+        migrations.RunPython(merge_duplicate_phones, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='member',
+            constraint=models.UniqueConstraint(condition=models.Q(('phone_e164', ''), _negated=True), fields=('family', 'phone_e164'), name='unique_member_phone_per_family'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from .models import Family, Member, MemberRole
+
+
+class RequestingMemberMixin:
+    """
+    Resolves the caller's Member rows once per request.
+
+    All members linked to the user are loaded with their family in a
+    single query and cached on the request, so views, permission checks
+    and serializers (via context) share them instead of re-querying.
+    """
+
+    def _caller_members(self):
+        request = self.request
+        if not hasattr(request, "_caller_members"):
+            request._caller_members = list(
+                Member.objects.select_related("family").filter(user=request.user).order_by("id")
+            )
+        return request._caller_members
+
+    def get_requesting_member(self):
+        """The caller's Member (same pick as filter(user=...).first()), or None."""
+        members = self._caller_members()
+        return members[0] if members else None
+
+    def get_family_head_context(self):
+        """
+        Returns (head_member, family) when the caller is a Family Head,
+        else (None, None). The family is only created or re-linked when
+        the head's row does not already point at the family they head.
+        """
+        request = self.request
+        if hasattr(request, "_family_head_context"):
+            return request._family_head_context
+
+        head_member = next((m for m in self._caller_members() if m.role == MemberRole.FAMILY_HEAD), None)
+        family = None
+        if head_member:
+            family = head_member.family
+            if family is None or family.head_id != request.user.id:
+                family, _ = Family.objects.get_or_create(head=request.user)
+                head_member.family = family
+                head_member.save(update_fields=["family"])
+
+        request._family_head_context = (head_member, family)
+        return request._family_head_context
+
+    def get_member_serializer_context(self, **extra):
+        return {
+            "request": self.request,
+            "requesting_member": self.get_requesting_member(),
+            **extra,
+        }
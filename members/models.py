@@ -1,6 +1,7 @@
 from django.db import models, transaction
 from django.conf import settings
 from .constants import Community
+from .phone import DEFAULT_COUNTRY_CODE, normalize_phone
 
 User = settings.AUTH_USER_MODEL
 
@@ -49,6 +50,10 @@ class MemberGender(models.TextChoices):
     FEMALE = "female", "Female"
     OTHER = "other", "Other"
 
+class KinshipLine(models.TextChoices):
+    PATERNAL = "paternal", "Paternal"
+    MATERNAL = "maternal", "Maternal"
+
 # -------------------------------------------------
 # FAMILY
 # -------------------------------------------------
@@ -62,12 +67,23 @@ class Family(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # ---- Healing state ----
+    # Bumped by writes to relation fields; the family needs healing while
+    # healed_version lags behind relations_version.
+    relations_version = models.PositiveIntegerField(default=1)
+    healed_version = models.PositiveIntegerField(default=0)
+    relations_changed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
     class Meta:
         verbose_name_plural = "Families"
 
     def __str__(self):
         return str(self.id)
 
+    @staticmethod
+    def display_id_for(head_id):
+        return f"F_{head_id}" if head_id else "Unassigned"
+
 # -------------------------------------------------
 # MEMBER
 # -------------------------------------------------
@@ -123,8 +139,10 @@ class Member(models.Model):
     )
 
     # ---- Identity ----
-    country_code = models.CharField(max_length=5, default="+91")
+    country_code = models.CharField(max_length=5, default=DEFAULT_COUNTRY_CODE)
     mobile = models.CharField(max_length=20)
+    # Canonical form of country_code + mobile, maintained by save()
+    phone_e164 = models.CharField(max_length=20, blank=True, default="", editable=False)
     name = models.CharField(max_length=100)
 
     # ---- Role & Status ----
@@ -176,20 +194,81 @@ class Member(models.Model):
     
     class Meta:
         constraints = [
+            # Compared on the canonical number, so "98111 00001" and
+            # "+919811100001" count as the same mobile
             models.UniqueConstraint(
-                fields=["country_code", "mobile", "family"],
-                name="unique_member_country_mobile_per_family",
+                fields=["family", "phone_e164"],
+                condition=~models.Q(phone_e164=""),
+                name="unique_member_phone_per_family",
             )
         ]
+        indexes = [
+            # Keyset pagination of the admin listing
+            models.Index(fields=["-created_at", "-id"], name="member_created_id_idx"),
+            # Phone lookups (OTP linking) and per-family duplicate checks
+            models.Index(fields=["phone_e164"], name="member_phone_e164_idx"),
+            models.Index(fields=["family", "phone_e164"], name="member_family_phone_idx"),
+            # Family-head resolution: filter(user=..., role=FAMILY_HEAD)
+            models.Index(fields=["user", "role"], name="member_user_role_idx"),
+        ]
+
 
+    # Fields whose changes are reported by tracked_changes()
+    TRACKED_FIELDS = ("father", "mother", "spouse", "family", "relation", "role", "gender", "user")
 
     def __str__(self):
         return f"{self.name} - {self.role}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.phone_e164 = normalize_phone(self.mobile, self.country_code)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"mobile", "country_code"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "phone_e164"}
+
+        super().save(*args, **kwargs)
+        # post_save receivers have already seen the changes
+        self._snapshot_tracked_fields(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot_tracked_fields(fields)
+
+    def _snapshot_tracked_fields(self, update_fields=None):
+        snapshot = getattr(self, "_tracked_values", {})
+        for name in self.TRACKED_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if attname not in self.__dict__:
+                continue  # deferred
+            if update_fields is not None and name not in update_fields and attname not in update_fields:
+                continue
+            snapshot[name] = self.__dict__[attname]
+        self._tracked_values = snapshot
+
+    def tracked_changes(self, update_fields=None) -> set:
+        """
+        Names of TRACKED_FIELDS whose value differs from the last loaded or
+        saved state. New instances compare against empty values.
+        """
+        snapshot = getattr(self, "_tracked_values", {})
+        changed = set()
+        for name in self.TRACKED_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if update_fields is not None and name not in update_fields and attname not in update_fields:
+                continue
+            if attname in self.__dict__ and self.__dict__[attname] != snapshot.get(name):
+                changed.add(name)
+        return changed
+
     @property
     def family_display_id(self):
-        if self.family and self.family.head:
-            return f"F_{self.family.head.id}"
+        if self.family_id:
+            return Family.display_id_for(self.family.head_id)
         return "Unassigned"
 
     # -------------------------------------------------
@@ -250,6 +329,40 @@ class RelationshipRequest(models.Model):
                 name="unique_pending_request_between_members",
             )
         ]
+        indexes = [
+            # Incoming requests: filter(receiver=..., status=PENDING)
+            models.Index(fields=["receiver", "status"], name="relreq_receiver_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.sender.name} -> {self.receiver.name} ({self.proposed_relation}) [{self.status}]"
+
+
+# -------------------------------------------------
+# KINSHIP CLOSURE
+# -------------------------------------------------
+class KinshipClosure(models.Model):
+    """
+    Materialized ancestor → descendant pairs over father/mother links.
+    `line` tells whether the descendant reaches the ancestor through its
+    father (paternal) or its mother (maternal). Maintained by
+    members.services.kinship.
+    """
+    ancestor = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveSmallIntegerField()
+    line = models.CharField(max_length=10, choices=KinshipLine.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["descendant", "ancestor"],
+                name="unique_kinship_descendant_ancestor",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["ancestor", "descendant"], name="kinship_ancestor_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.line}, {self.depth})"
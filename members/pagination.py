@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CreatedAtCursorPagination(BasePagination):
+    """
+    Keyset pagination over (-created_at, -id).
+
+    Each page is fetched with a `WHERE (created_at, id) < cursor` seek, so
+    deep pages cost the same as the first one and no OFFSET scan happens.
+    The optional total is cached per filter set instead of being counted
+    on every request.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "include_count"
+    page_size = 50
+    max_page_size = 200
+    count_cache_timeout = 5 * 60
+    results_key = "results"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = self.get_total(queryset, request)
+
+        position = self.decode_cursor(request)
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # One extra row tells us whether there is a next page
+        rows = list(queryset.order_by("-created_at", "-id")[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "success": True,
+            "count": self.total,
+            "next": self.get_next_link(),
+            self.results_key: data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last.created_at, last.id))
+
+    # -------------------------------------------------
+    # HELPERS
+    # -------------------------------------------------
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_total(self, queryset, request):
+        """Cached total for the current filters; None when the client opts out."""
+        if request.query_params.get(self.count_query_param, "true").lower() in ("0", "false", "no"):
+            return None
+
+        url = request.build_absolute_uri()
+        for param in (self.cursor_query_param, self.page_size_query_param):
+            url = remove_query_param(url, param)
+        key = "members:count:" + hashlib.md5(url.encode()).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = queryset.count()
+            cache.set(key, total, self.count_cache_timeout)
+        return total
+
+    @staticmethod
+    def encode_cursor(created_at, pk):
+        raw = json.dumps([created_at.isoformat(), pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            created_at = None
+        if created_at is None:
+            raise ValidationError({"cursor": "Invalid cursor"})
+        return created_at, pk
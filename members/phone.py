@@ -0,0 +1,63 @@
+"""
+Phone number normalization.
+
+Members store `mobile` as typed by users ("98111 00001", "+919811100001",
+"09811100001"...). `phone_e164` keeps one canonical form next to it so
+lookups and duplicate checks can use a plain index seek.
+"""
+import re
+
+DEFAULT_COUNTRY_CODE = "+91"
+NATIONAL_NUMBER_LENGTH = 10
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(mobile, country_code=DEFAULT_COUNTRY_CODE) -> str:
+    """
+    Returns `mobile` in E.164 form ("+919811100001"), or "" when blank.
+    Numbers already carrying a "+"/"00" or country prefix keep it.
+    """
+    raw = (mobile or "").strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return ""
+
+    if raw.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+
+    country_digits = _NON_DIGITS.sub("", country_code or "") or _NON_DIGITS.sub("", DEFAULT_COUNTRY_CODE)
+    if len(digits) > NATIONAL_NUMBER_LENGTH and digits.startswith(country_digits):
+        return f"+{digits}"
+
+    return f"+{country_digits}{digits.lstrip('0')}"
+
+
+def backfill_phone_e164(member_model, batch_size=1000) -> int:
+    """
+    Recomputes phone_e164 for every member row whose stored value is stale,
+    in id-ordered batches. Takes the model so migrations can pass their
+    historical Member. Returns the number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            member_model.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "mobile", "country_code", "phone_e164")[:batch_size]
+        )
+        if not batch:
+            return updated
+        last_id = batch[-1].id
+
+        stale = []
+        for member in batch:
+            value = normalize_phone(member.mobile, member.country_code)
+            if member.phone_e164 != value:
+                member.phone_e164 = value
+                stale.append(member)
+        member_model.objects.bulk_update(stale, ["phone_e164"])
+        updated += len(stale)
@@ -0,0 +1,149 @@
+"""
+Member search backed by a database text index.
+
+SQLite gets an FTS5 trigram table kept in sync by triggers, PostgreSQL
+gets pg_trgm GIN indexes that serve the icontains lookups directly.
+Anything else falls back to plain icontains filters.
+"""
+from django.db import DatabaseError, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from members.models import Member
+
+SEARCH_TABLE = "members_member_search"
+MIN_INDEXED_LENGTH = 3  # trigram indexes cannot serve shorter terms
+
+# query param → Member lookup
+SEARCH_FILTERS = {
+    "family": "family_id",
+    "city": "city__iexact",
+    "gotra": "gotra__iexact",
+    "native_place": "native_place__iexact",
+}
+
+SQLITE_TRIGGERS = {
+    f"{SEARCH_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON members_member BEGIN
+            INSERT INTO {SEARCH_TABLE}(rowid, name, mobile) VALUES (new.id, new.name, new.mobile);
+        END
+    """,
+    f"{SEARCH_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON members_member BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, mobile) VALUES ('delete', old.id, old.name, old.mobile);
+        END
+    """,
+    f"{SEARCH_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF name, mobile ON members_member BEGIN
+            INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, mobile) VALUES ('delete', old.id, old.name, old.mobile);
+            INSERT INTO {SEARCH_TABLE}(rowid, name, mobile) VALUES (new.id, new.name, new.mobile);
+        END
+    """,
+}
+
+POSTGRES_INDEXES = {
+    "members_member_name_trgm": "UPPER(name::text) gin_trgm_ops",
+    "members_member_mobile_trgm": "UPPER(mobile::text) gin_trgm_ops",
+}
+
+_available = {}
+
+
+# -------------------------------------------------
+# INDEX MAINTENANCE
+# -------------------------------------------------
+def install_search_index(connection):
+    """
+    Creates the search index for the connection's backend. Idempotent:
+    SQLite table rebuilds during migrations drop triggers, so this also
+    runs after every migrate and restores (and reindexes) when needed.
+    """
+    _available.pop(connection.alias, None)
+
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    f"name, mobile, content='members_member', content_rowid='id', tokenize='trigram')"
+                )
+            except DatabaseError:
+                return  # FTS5/trigram not compiled in: icontains fallback
+
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+                % ", ".join("%s" for _ in SQLITE_TRIGGERS),
+                list(SQLITE_TRIGGERS),
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            if existing == set(SQLITE_TRIGGERS):
+                return
+
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+    elif connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, expression in POSTGRES_INDEXES.items():
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON members_member USING gin ({expression})")
+
+
+def uninstall_search_index(connection):
+    _available.pop(connection.alias, None)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        elif connection.vendor == "postgresql":
+            for name in POSTGRES_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def fts_available(using="default"):
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == "sqlite"
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available[using]
+
+
+# -------------------------------------------------
+# SEARCH
+# -------------------------------------------------
+def search_members(query, filters=None, queryset=None, limit=20):
+    """
+    Returns up to `limit` members matching `query` on name or mobile.
+
+    Ranking: exact/suffix mobile match first, then names starting with
+    the query, then any other substring match; ties by name.
+    """
+    query = (query or "").strip()
+    qs = queryset if queryset is not None else Member.objects.all()
+    if not query:
+        return qs.none()
+
+    for param, value in (filters or {}).items():
+        if param in SEARCH_FILTERS and value not in (None, ""):
+            qs = qs.filter(**{SEARCH_FILTERS[param]: value})
+
+    if len(query) < MIN_INDEXED_LENGTH:
+        qs = qs.filter(Q(name__istartswith=query) | Q(mobile__endswith=query))
+    elif fts_available(qs.db):
+        phrase = '"%s"' % query.replace('"', '""')
+        qs = qs.filter(id__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [phrase]))
+    else:
+        qs = qs.filter(Q(mobile__icontains=query) | Q(name__icontains=query))
+
+    rank = Case(
+        When(mobile__endswith=query, then=Value(0)),
+        When(name__istartswith=query, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return qs.annotate(search_rank=rank).order_by("search_rank", "name", "id")[:limit]
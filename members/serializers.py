@@ -1,38 +1,42 @@
 from rest_framework import serializers
 from django.db import transaction
 
-from profiles.models import PersonalDetail
-from .models import Member, MemberRole
-from collections import deque
+from profiles.utils import profile_image_names, profile_image_url
+from .models import Family, Member, MemberRole
+from .services.importer import parse_link
+from .services.kinship import find_ancestry_path
 
 def check_circular_dependency(member_id, new_parent_id):
+    """
+    Checks whether making `new_parent_id` a parent of `member_id` would
+    close a loop in the ancestry. Returns the offending lineage (from the
+    new parent up to the member) as [{"id", "name"}], or [] when safe.
+    Answered from the kinship closure in a single query.
+    """
     if not member_id or not new_parent_id:
-        return False
+        return []
     if member_id == new_parent_id:
-        return True
-        
-    queue = deque([new_parent_id])
-    visited = set()
-    
-    while queue:
-        current = queue.popleft()
-        if current in visited:
-            continue
-        visited.add(current)
-        
-        if current == member_id:
-            return True
-            
-        try:
-            m = Member.objects.get(id=current)
-            if m.father_id:
-                queue.append(m.father_id)
-            if m.mother_id:
-                queue.append(m.mother_id)
-        except Member.DoesNotExist:
-            continue
-            
-    return False
+        member = Member.objects.filter(id=member_id).values("id", "name").first()
+        return [member] if member else []
+
+    return find_ancestry_path(member_id, new_parent_id)
+
+
+def format_cycle_path(path):
+    return " → ".join(node["name"] for node in path)
+
+
+def requesting_member_from_context(context):
+    """
+    The caller's Member: reused from context when the view already
+    resolved it (RequestingMemberMixin), else looked up.
+    """
+    if "requesting_member" in context:
+        return context["requesting_member"]
+    request = context.get("request")
+    if request and hasattr(request, "user") and request.user.is_authenticated:
+        return Member.objects.filter(user=request.user).first()
+    return None
 
 
 # =====================================================
@@ -85,7 +89,44 @@ def handle_spouse_link(member: Member, spouse_id: int | None):
 # =====================================================
 
 
-class MemberSerializer(serializers.ModelSerializer):
+class MemberListSerializer(serializers.ListSerializer):
+    """
+    Resolves profile images and family heads for the whole page before
+    serializing rows, so a list costs a fixed number of lookups instead
+    of a few per member.
+    """
+
+    def to_representation(self, data):
+        members = list(data.all() if hasattr(data, "all") else data)
+        self.child.profile_image_names = profile_image_names(m.user_id for m in members)
+        self.child.family_heads = family_heads_for(members)
+        return super().to_representation(members)
+
+
+def family_heads_for(members):
+    """{family_id: head_id} for the given members, reusing already loaded families."""
+    heads = {}
+    missing = set()
+    for m in members:
+        if not m.family_id:
+            continue
+        if Member.family.is_cached(m):
+            heads[m.family_id] = m.family.head_id
+        else:
+            missing.add(m.family_id)
+    if missing:
+        heads.update(Family.objects.filter(id__in=missing).values_list("id", "head_id"))
+    return heads
+
+
+# =====================================================
+# MEMBER READ SERIALIZER
+# =====================================================
+class MemberReadSerializer(serializers.ModelSerializer):
+    """
+    Read-only member representation. Relation ids come straight from the
+    row, so no related Member is loaded per object.
+    """
     # -----------------------------
     # READ ONLY RELATIONS
     # -----------------------------
@@ -95,7 +136,7 @@ class MemberSerializer(serializers.ModelSerializer):
     # -----------------------------
     # DISPLAY FIELDS
     # -----------------------------
-    family_id_display = serializers.ReadOnlyField(source="family_display_id")
+    family_id_display = serializers.SerializerMethodField()
     community_display = serializers.CharField(
         source="get_community_display",
         read_only=True
@@ -122,46 +163,56 @@ class MemberSerializer(serializers.ModelSerializer):
             "user",
             "created_at",
         )
+        list_serializer_class = MemberListSerializer
 
     # -------------------------------------------------
     # IMAGE URL BUILDER
     # -------------------------------------------------
     def get_profileImageUrl(self, obj):
-        request = self.context.get("request")
-
-        if not obj.user:
-             return None
+        if not obj.user_id:
+            return None
 
-        personal = PersonalDetail.objects.filter(
-            profile__user=obj.user
-        ).first()
+        # Preloaded by MemberListSerializer; single objects hit the cache
+        names = getattr(self, "profile_image_names", None)
+        if names is None or obj.user_id not in names:
+            names = profile_image_names([obj.user_id])
 
-        if personal and personal.profile_image:
-            if request:
-                return request.build_absolute_uri(personal.profile_image.url)
-            return personal.profile_image.url
-
-        return None
+        return profile_image_url(names.get(obj.user_id), self.context.get("request"))
 
     # -------------------------------------------------
     # RELATION IDS
     # -------------------------------------------------
     def get_spouse_id(self, obj):
-        return obj.spouse.id if obj.spouse else None
+        return obj.spouse_id
 
     def get_father_id(self, obj):
-        return obj.father.id if obj.father else None
+        return obj.father_id
 
     def get_mother_id(self, obj):
-        return obj.mother.id if obj.mother else None
+        return obj.mother_id
+
+    def get_family_id_display(self, obj):
+        heads = getattr(self, "family_heads", None)
+        if heads is None or obj.family_id not in heads:
+            return obj.family_display_id
+        return Family.display_id_for(heads[obj.family_id])
 
     def get_calculated_relation(self, obj):
+        relationships = self.context.get("relationships")
+        if relationships is not None and obj.id in relationships:
+            return relationships[obj.id]
+
         from .utils import get_relationship
         root_member = self.context.get("root_member")
         if root_member:
             return get_relationship(root_member, obj)
         return (obj.relation or "").capitalize() if obj.relation else "Relative"
 
+
+# =====================================================
+# MEMBER SERIALIZER (READ + UPDATE)
+# =====================================================
+class MemberSerializer(MemberReadSerializer):
     # -------------------------------------------------
     # UPDATE LOGIC
     # -------------------------------------------------
@@ -181,8 +232,9 @@ class MemberSerializer(serializers.ModelSerializer):
                 f_id = int(father_id)
                 if f_id == instance.id:
                     raise serializers.ValidationError({"father_id": "Cannot assign self as father"})
-                if check_circular_dependency(instance.id, f_id):
-                    raise serializers.ValidationError({"father_id": "Circular dependency detected. Cannot assign this member as father."})
+                cycle = check_circular_dependency(instance.id, f_id)
+                if cycle:
+                    raise serializers.ValidationError({"father_id": f"Circular dependency detected ({format_cycle_path(cycle)}). Cannot assign this member as father."})
                 try:
                     father_member = Member.objects.get(id=f_id)
                     instance.father = father_member
@@ -195,8 +247,9 @@ class MemberSerializer(serializers.ModelSerializer):
                 m_id = int(mother_id)
                 if m_id == instance.id:
                     raise serializers.ValidationError({"mother_id": "Cannot assign self as mother"})
-                if check_circular_dependency(instance.id, m_id):
-                    raise serializers.ValidationError({"mother_id": "Circular dependency detected. Cannot assign this member as mother."})
+                cycle = check_circular_dependency(instance.id, m_id)
+                if cycle:
+                    raise serializers.ValidationError({"mother_id": f"Circular dependency detected ({format_cycle_path(cycle)}). Cannot assign this member as mother."})
                 try:
                     mother_member = Member.objects.get(id=m_id)
                     instance.mother = mother_member
@@ -204,10 +257,10 @@ class MemberSerializer(serializers.ModelSerializer):
                 except Member.DoesNotExist:
                     raise serializers.ValidationError({"mother_id": "Invalid mother id"})
 
-            if instance.family:
-                from .utils import heal_family_relations
-                heal_family_relations(instance.family)
-                instance.refresh_from_db()
+            if instance.family_id:
+                from .utils import heal_family_if_dirty
+                if heal_family_if_dirty(instance.family_id):
+                    instance.refresh_from_db()
 
         return instance
 
@@ -318,51 +371,110 @@ class MemberCreateSerializer(serializers.ModelSerializer):
                     pass
 
             # Handle backward linking based on relation
-            request = self.context.get("request")
-            if request and hasattr(request, "user") and request.user.is_authenticated:
-                creator = Member.objects.filter(user=request.user).first()
-                if creator:
-                    if relation == "father":
-                        if check_circular_dependency(creator.id, member.id):
-                            raise serializers.ValidationError({"father_id": "Circular dependency"})
-                        creator.father = member
-                        creator.save(update_fields=["father"])
-                    elif relation == "mother":
-                        if check_circular_dependency(creator.id, member.id):
-                            raise serializers.ValidationError({"mother_id": "Circular dependency"})
-                        creator.mother = member
-                        creator.save(update_fields=["mother"])
-                    elif relation == "spouse":
-                        handle_spouse_link(creator, member.id)
-                    elif relation in ["son", "daughter"]:
-                        if creator.gender == "female":
-                            member.mother = creator
-                            member.save(update_fields=["mother"])
-                        else:
-                            member.father = creator
-                            member.save(update_fields=["father"])
-                    elif relation in ["brother", "sister"]:
-                        updated = False
-                        if creator.father:
-                            member.father = creator.father
-                            updated = True
-                        if creator.mother:
-                            member.mother = creator.mother
-                            updated = True
-                        if updated:
-                            member.save(update_fields=["father", "mother"])
+            creator = requesting_member_from_context(self.context)
+            if creator:
+                if relation == "father":
+                    cycle = check_circular_dependency(creator.id, member.id)
+                    if cycle:
+                        raise serializers.ValidationError({"father_id": f"Circular dependency ({format_cycle_path(cycle)})"})
+                    creator.father = member
+                    creator.save(update_fields=["father"])
+                elif relation == "mother":
+                    cycle = check_circular_dependency(creator.id, member.id)
+                    if cycle:
+                        raise serializers.ValidationError({"mother_id": f"Circular dependency ({format_cycle_path(cycle)})"})
+                    creator.mother = member
+                    creator.save(update_fields=["mother"])
+                elif relation == "spouse":
+                    handle_spouse_link(creator, member.id)
+                elif relation in ["son", "daughter"]:
+                    if creator.gender == "female":
+                        member.mother = creator
+                        member.save(update_fields=["mother"])
+                    else:
+                        member.father = creator
+                        member.save(update_fields=["father"])
+                elif relation in ["brother", "sister"]:
+                    updated = False
+                    if creator.father:
+                        member.father = creator.father
+                        updated = True
+                    if creator.mother:
+                        member.mother = creator.mother
+                        updated = True
+                    if updated:
+                        member.save(update_fields=["father", "mother"])
 
             # Link spouse if provided
             handle_spouse_link(member, spouse_id)
 
-            if member.family:
-                from .utils import heal_family_relations
-                heal_family_relations(member.family)
-                member.refresh_from_db()
+            if member.family_id:
+                from .utils import heal_family_if_dirty
+                if heal_family_if_dirty(member.family_id):
+                    member.refresh_from_db()
 
         return member
 
 
+# =====================================================
+# MEMBER BULK IMPORT ROW
+# =====================================================
+class MemberLinkField(serializers.Field):
+    """A member id, or "$ref:<n>" pointing at row n of the same batch."""
+
+    default_error_messages = {"invalid": 'Expected a member id or "$ref:<row>".'}
+
+    def to_internal_value(self, data):
+        try:
+            parse_link(data)
+        except (TypeError, ValueError):
+            self.fail("invalid")
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class MemberImportRowSerializer(serializers.ModelSerializer):
+    date_of_birth = serializers.DateField(required=True)
+    mobile = serializers.CharField(required=False, allow_blank=True)
+
+    father_id = MemberLinkField(required=False, allow_null=True)
+    mother_id = MemberLinkField(required=False, allow_null=True)
+    spouse_id = MemberLinkField(required=False, allow_null=True)
+
+    class Meta:
+        model = Member
+        fields = (
+            "mobile",
+            "country_code",
+            "name",
+            "role",
+            "relation",
+            "gender",
+            "date_of_birth",
+            "email",
+            "address",
+            "city",
+            "native_place",
+            "gotra",
+            "occupation",
+            "highest_qualification",
+            "father_id",
+            "mother_id",
+            "spouse_id",
+        )
+
+    def validate_role(self, value):
+        if value == MemberRole.FAMILY_HEAD:
+            raise serializers.ValidationError("A Family Head cannot be added in bulk.")
+        return value
+
+    def validate(self, attrs):
+        attrs["mobile"] = (attrs.get("mobile") or "").strip()
+        return attrs
+
+
 # =====================================================
 # MEMBER UPDATE SERIALIZER
 # =====================================================
@@ -446,8 +558,9 @@ class MemberProfileUpdateSerializer(serializers.ModelSerializer):
             if father_id is not None:
                 if father_id == instance.id:
                     raise serializers.ValidationError({"father_id": "Cannot assign self as father"})
-                if check_circular_dependency(instance.id, father_id):
-                    raise serializers.ValidationError({"father_id": "Circular dependency detected. Cannot assign this member as father."})
+                cycle = check_circular_dependency(instance.id, father_id)
+                if cycle:
+                    raise serializers.ValidationError({"father_id": f"Circular dependency detected ({format_cycle_path(cycle)}). Cannot assign this member as father."})
                 try:
                     father_member = Member.objects.get(id=father_id)
                     instance.father = father_member
@@ -459,8 +572,9 @@ class MemberProfileUpdateSerializer(serializers.ModelSerializer):
             if mother_id is not None:
                 if mother_id == instance.id:
                     raise serializers.ValidationError({"mother_id": "Cannot assign self as mother"})
-                if check_circular_dependency(instance.id, mother_id):
-                    raise serializers.ValidationError({"mother_id": "Circular dependency detected. Cannot assign this member as mother."})
+                cycle = check_circular_dependency(instance.id, mother_id)
+                if cycle:
+                    raise serializers.ValidationError({"mother_id": f"Circular dependency detected ({format_cycle_path(cycle)}). Cannot assign this member as mother."})
                 try:
                     mother_member = Member.objects.get(id=mother_id)
                     instance.mother = mother_member
@@ -469,42 +583,40 @@ class MemberProfileUpdateSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError({"mother_id": "Invalid mother id"})
 
             # Handle backward linking based on relation
-            request = self.context.get("request")
             relation = (instance.relation or "").lower()
-            if request and hasattr(request, "user") and request.user.is_authenticated:
-                creator = Member.objects.filter(user=request.user).first()
-                if creator and creator.id != instance.id:
-                    if relation == "father":
-                        if not check_circular_dependency(creator.id, instance.id):
-                            creator.father = instance
-                            creator.save(update_fields=["father"])
-                    elif relation == "mother":
-                        if not check_circular_dependency(creator.id, instance.id):
-                            creator.mother = instance
-                            creator.save(update_fields=["mother"])
-                    elif relation == "spouse":
-                        handle_spouse_link(creator, instance.id)
-                    elif relation in ["son", "daughter"]:
-                        if creator.gender == "female":
-                            instance.mother = creator
-                            instance.save(update_fields=["mother"])
-                        else:
-                            instance.father = creator
-                            instance.save(update_fields=["father"])
-                    elif relation in ["brother", "sister"]:
-                        updated_parents = False
-                        if creator.father:
-                            instance.father = creator.father
-                            updated_parents = True
-                        if creator.mother:
-                            instance.mother = creator.mother
-                            updated_parents = True
-                        if updated_parents:
-                            instance.save(update_fields=["father", "mother"])
-
-            if instance.family:
-                from .utils import heal_family_relations
-                heal_family_relations(instance.family)
-                instance.refresh_from_db()
+            creator = requesting_member_from_context(self.context)
+            if creator and creator.id != instance.id:
+                if relation == "father":
+                    if not check_circular_dependency(creator.id, instance.id):
+                        creator.father = instance
+                        creator.save(update_fields=["father"])
+                elif relation == "mother":
+                    if not check_circular_dependency(creator.id, instance.id):
+                        creator.mother = instance
+                        creator.save(update_fields=["mother"])
+                elif relation == "spouse":
+                    handle_spouse_link(creator, instance.id)
+                elif relation in ["son", "daughter"]:
+                    if creator.gender == "female":
+                        instance.mother = creator
+                        instance.save(update_fields=["mother"])
+                    else:
+                        instance.father = creator
+                        instance.save(update_fields=["father"])
+                elif relation in ["brother", "sister"]:
+                    updated_parents = False
+                    if creator.father:
+                        instance.father = creator.father
+                        updated_parents = True
+                    if creator.mother:
+                        instance.mother = creator.mother
+                        updated_parents = True
+                    if updated_parents:
+                        instance.save(update_fields=["father", "mother"])
+
+            if instance.family_id:
+                from .utils import heal_family_if_dirty
+                if heal_family_if_dirty(instance.family_id):
+                    instance.refresh_from_db()
 
         return instance
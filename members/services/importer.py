@@ -0,0 +1,280 @@
+"""
+Bulk member import.
+
+Rows may point at each other with "$ref:<n>" (0-based position in the
+batch) in father_id / mother_id / spouse_id, or at existing members by
+id. The whole batch is validated up front with set-based queries, then
+written with bulk operations; links are resolved in memory and each
+affected family is healed once at the end.
+"""
+from django.db import transaction
+
+from members.models import Member, MemberGender, MemberStatus
+from members.phone import DEFAULT_COUNTRY_CODE, normalize_phone
+from members.services.kinship import find_ancestry_path, relink_lineage
+
+REF_PREFIX = "$ref:"
+LINK_FIELDS = ("father_id", "mother_id", "spouse_id")
+
+
+class MemberImportError(Exception):
+    """Raised with per-row errors ([{"row", "field", "message"}]); nothing is written."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} import error(s)")
+        self.errors = errors
+
+
+def parse_link(value):
+    """
+    Parses a link value into None, ("ref", index) or ("id", member_id).
+    Raises ValueError for anything else.
+    """
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith(REF_PREFIX):
+            return ("ref", int(value[len(REF_PREFIX):]))
+    return ("id", int(value))
+
+
+def find_parent_cycle(parents: dict):
+    """
+    `parents` maps a row index to the row indexes of its parents.
+    Returns one cycle as a list of row indexes, or None.
+    """
+    state = {}  # index -> 1 visiting, 2 done
+    stack = []
+
+    def visit(index):
+        state[index] = 1
+        stack.append(index)
+        for parent in parents.get(index, ()):
+            if state.get(parent) == 1:
+                return stack[stack.index(parent):]
+            if parent not in state:
+                cycle = visit(parent)
+                if cycle:
+                    return cycle
+        stack.pop()
+        state[index] = 2
+        return None
+
+    for index in parents:
+        if index not in state:
+            cycle = visit(index)
+            if cycle:
+                return cycle
+    return None
+
+
+def import_family_members(family, rows, creator=None, defaults=None) -> list[Member]:
+    """
+    Creates `rows` (dicts of Member field values plus father_id /
+    mother_id / spouse_id links) in `family`.
+
+    `creator` is the family head adding the batch; relations are
+    back-linked to them exactly as the single add-member flow does
+    (son/daughter get them as parent, brother/sister share their
+    parents, father/mother/spouse become theirs). Raises
+    MemberImportError without writing anything if any row is invalid.
+    """
+    defaults = defaults or {}
+    errors = []
+
+    def error(row, field, message):
+        errors.append({"row": row, "field": field, "message": message})
+
+    # -------------------------------------------------
+    # 1. Parse links
+    # -------------------------------------------------
+    links = []
+    existing_ids = set()
+    for i, row in enumerate(rows):
+        parsed = {}
+        for field in LINK_FIELDS:
+            try:
+                link = parse_link(row.get(field))
+            except (TypeError, ValueError):
+                error(i, field, f'Expected a member id or "{REF_PREFIX}<row>"')
+                continue
+            if link and link[0] == "ref" and not (0 <= link[1] < len(rows)):
+                error(i, field, f"Reference {link[1]} is outside the batch")
+            elif link and link[0] == "ref" and link[1] == i:
+                error(i, field, "A member cannot be linked to itself")
+            elif link:
+                parsed[field] = link
+                if link[0] == "id":
+                    existing_ids.add(link[1])
+        links.append(parsed)
+
+    existing = {
+        m.id: m
+        for m in Member.objects.select_for_update().filter(id__in=existing_ids).only("id", "family_id", "spouse_id")
+    } if existing_ids else {}
+
+    # -------------------------------------------------
+    # 2. Mobiles: one set query for the whole batch
+    # -------------------------------------------------
+    phones = {}
+    for i, row in enumerate(rows):
+        phone = normalize_phone(row.get("mobile"), row.get("country_code") or DEFAULT_COUNTRY_CODE)
+        if not phone:
+            error(i, "mobile", "Mobile number is required (numbers are unique within a family)")
+        elif phone in phones:
+            error(i, "mobile", f"Duplicate of row {phones[phone]} in this batch")
+        else:
+            phones[phone] = i
+
+    taken = Member.objects.filter(phone_e164__in=list(phones)).values_list("phone_e164", "family_id") if phones else []
+    for phone, family_id in taken:
+        if family_id == family.id:
+            error(phones[phone], "mobile", "This mobile is already used in your family.")
+        else:
+            error(phones[phone], "mobile", "This mobile is already registered under another family.")
+
+    # -------------------------------------------------
+    # 3. Link rules (mirrors the single add-member flow)
+    # -------------------------------------------------
+    spouse_of = {}  # row index -> ("ref", j) | ("id", member_id)
+    parent_rows = {}
+    for i, parsed in enumerate(links):
+        for field in ("father_id", "mother_id"):
+            link = parsed.get(field)
+            if link and link[0] == "id" and link[1] not in existing:
+                error(i, field, f"Invalid {field.split('_')[0]} id")
+            elif link and link[0] == "ref":
+                parent_rows.setdefault(i, []).append(link[1])
+
+        link = parsed.get("spouse_id")
+        if not link:
+            continue
+        if link[0] == "id":
+            spouse = existing.get(link[1])
+            if not spouse:
+                error(i, "spouse_id", "Invalid spouse id")
+            elif spouse.family_id != family.id:
+                error(i, "spouse_id", "Spouse must belong to same family")
+            elif spouse.spouse_id:
+                error(i, "spouse_id", "Selected spouse already linked")
+        spouse_of[i] = link
+
+    claimed = {}
+    for i, link in spouse_of.items():
+        if link[0] == "ref":
+            partner_link = spouse_of.get(link[1])
+            if partner_link and partner_link != ("ref", i):
+                error(i, "spouse_id", f"Row {link[1]} is linked to a different spouse")
+        if link in claimed and claimed[link] != i and spouse_of.get(claimed[link]) != ("ref", i):
+            error(i, "spouse_id", f"Spouse already claimed by row {claimed[link]}")
+        claimed.setdefault(link, i)
+
+    if creator:
+        spouse_rows = [i for i, row in enumerate(rows) if (row.get("relation") or "").lower() == "spouse"]
+        for i in spouse_rows[1:]:
+            error(i, "relation", f"Only one spouse can be added; row {spouse_rows[0]} is already the spouse")
+        if spouse_rows:
+            head_spouse = spouse_rows[0]
+            if head_spouse in spouse_of:
+                error(head_spouse, "spouse_id", "The head's spouse cannot be linked to another spouse")
+            for i, link in spouse_of.items():
+                if link in (("ref", head_spouse), ("id", creator.id)) and i != head_spouse:
+                    error(i, "spouse_id", f"Row {head_spouse} is already the head's spouse")
+
+    cycle = find_parent_cycle(parent_rows)
+    if cycle:
+        error(cycle[0], "father_id", "Circular dependency between rows " + " → ".join(map(str, cycle)))
+
+    if errors:
+        raise MemberImportError(sorted(errors, key=lambda e: e["row"]))
+
+    # -------------------------------------------------
+    # 4. Write: one insert, then links in memory + one update
+    # -------------------------------------------------
+    with transaction.atomic():
+        members = []
+        for row in rows:
+            values = {k: v for k, v in row.items() if k not in LINK_FIELDS}
+            values.setdefault("status", MemberStatus.ACTIVE)
+            values.update(defaults)
+            member = Member(family=family, **values)
+            member.phone_e164 = normalize_phone(member.mobile, member.country_code)
+            members.append(member)
+        Member.objects.bulk_create(members, batch_size=500)
+
+        def resolve(link):
+            return members[link[1]].id if link[0] == "ref" else link[1]
+
+        touched = {}  # existing members whose links change
+        for i, parsed in enumerate(links):
+            member = members[i]
+            if "father_id" in parsed:
+                member.father_id = resolve(parsed["father_id"])
+            if "mother_id" in parsed:
+                member.mother_id = resolve(parsed["mother_id"])
+            if "spouse_id" in parsed:
+                member.spouse_id = resolve(parsed["spouse_id"])
+                if parsed["spouse_id"][0] == "id":
+                    partner = existing[member.spouse_id]
+                    partner.spouse_id = member.id
+                    touched[partner.id] = partner
+                else:
+                    members[parsed["spouse_id"][1]].spouse_id = member.id
+
+        creator_parents = apply_creator_links(creator, members, touched) if creator else set()
+
+        # spouse is one-to-one: free the old pairings before writing new ones
+        if touched:
+            Member.objects.filter(id__in=list(touched), spouse__isnull=False).update(spouse=None)
+        Member.objects.bulk_update(members, ["father", "mother", "spouse"], batch_size=500)
+        if touched:
+            Member.objects.bulk_update(list(touched.values()), ["father", "mother", "spouse"])
+
+        # bulk writes skip signals: maintain the closure and heal explicitly
+        relink_lineage([m.id for m in members] + ([creator.id] if creator_parents else []))
+        row_of = {m.id: i for i, m in enumerate(members)}
+        for field in sorted(creator_parents):
+            path = find_ancestry_path(creator.id, getattr(creator, field))
+            if path:
+                raise MemberImportError([{
+                    "row": row_of[getattr(creator, field)],
+                    "field": "relation",
+                    "message": "Circular dependency (" + " → ".join(node["name"] for node in path) + ")",
+                }])
+
+        from members.utils import heal_family_relations
+        heal_family_relations(family)
+
+    return members
+
+
+def apply_creator_links(creator, members, touched) -> set:
+    """
+    Back-links the batch to the member who added it, in memory.
+    Returns the creator's parent fields that changed.
+    """
+    parents_changed = set()
+    for member in members:
+        relation = (member.relation or "").lower()
+        if relation in ("son", "daughter"):
+            if creator.gender == MemberGender.FEMALE:
+                member.mother_id = creator.id
+            else:
+                member.father_id = creator.id
+        elif relation in ("brother", "sister"):
+            member.father_id = creator.father_id or member.father_id
+            member.mother_id = creator.mother_id or member.mother_id
+        elif relation in ("father", "mother"):
+            setattr(creator, f"{relation}_id", member.id)
+            touched[creator.id] = creator
+            parents_changed.add(f"{relation}_id")
+        elif relation == "spouse":
+            if creator.spouse_id and creator.spouse_id != member.id:
+                old_spouse = touched.get(creator.spouse_id) or Member.objects.only("id", "spouse_id").get(id=creator.spouse_id)
+                old_spouse.spouse_id = None
+                touched[old_spouse.id] = old_spouse
+            creator.spouse_id = member.id
+            member.spouse_id = creator.id
+            touched[creator.id] = creator
+    return parents_changed
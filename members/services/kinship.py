@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.db.models import Q
+
+from members.models import KinshipClosure, KinshipLine, Member
+
+
+def compute_ancestry(parents: dict, known_ancestors: dict | None = None) -> dict:
+    """
+    Computes {member_id: {ancestor_id: (depth, line)}} for every member in
+    `parents` ({member_id: (father_id, mother_id)}).
+
+    Parents that are not part of `parents` are resolved through
+    `known_ancestors`, which holds their (already correct) closure rows.
+    The shortest path wins; on a tie the paternal line is kept.
+    """
+    known_ancestors = known_ancestors or {}
+    result = {}
+    in_progress = set()
+
+    def offer(rows, ancestor_id, depth, line):
+        current = rows.get(ancestor_id)
+        if current is None or depth < current[0]:
+            rows[ancestor_id] = (depth, line)
+
+    def resolve(member_id):
+        if member_id in result:
+            return result[member_id]
+        if member_id not in parents:
+            return known_ancestors.get(member_id, {})
+        if member_id in in_progress:
+            return {}  # corrupt data: parent cycle
+
+        in_progress.add(member_id)
+        rows = {}
+        father_id, mother_id = parents[member_id]
+        for parent_id, line in ((father_id, KinshipLine.PATERNAL), (mother_id, KinshipLine.MATERNAL)):
+            if not parent_id:
+                continue
+            offer(rows, parent_id, 1, line)
+            for ancestor_id, (depth, _) in resolve(parent_id).items():
+                offer(rows, ancestor_id, depth + 1, line)
+        in_progress.discard(member_id)
+
+        result[member_id] = rows
+        return rows
+
+    for member_id in parents:
+        resolve(member_id)
+    return result
+
+
+def ancestors_of(member_ids, max_depth: int | None = None) -> dict:
+    """
+    Returns {member_id: {ancestor_id: (depth, line)}} for the given members
+    in a single query.
+    """
+    member_ids = [m for m in set(member_ids) if m]
+    ancestry = {member_id: {} for member_id in member_ids}
+    if not member_ids:
+        return ancestry
+
+    rows = KinshipClosure.objects.filter(descendant_id__in=member_ids)
+    if max_depth is not None:
+        rows = rows.filter(depth__lte=max_depth)
+
+    for descendant_id, ancestor_id, depth, line in rows.values_list("descendant_id", "ancestor_id", "depth", "line"):
+        ancestry[descendant_id][ancestor_id] = (depth, line)
+    return ancestry
+
+
+def _closure_rows(ancestry: dict) -> list[KinshipClosure]:
+    return [
+        KinshipClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth, line=line)
+        for descendant_id, ancestors in ancestry.items()
+        for ancestor_id, (depth, line) in ancestors.items()
+    ]
+
+
+def relink_lineage(member_ids) -> int:
+    """
+    Recomputes the closure rows of the given members and of all their
+    descendants after a father/mother change. Only the affected subtree is
+    touched. Returns the number of rows written.
+    """
+    member_ids = {m for m in member_ids if m}
+    if not member_ids:
+        return 0
+
+    subtree = set(member_ids)
+    subtree.update(
+        KinshipClosure.objects.filter(ancestor_id__in=member_ids).values_list("descendant_id", flat=True)
+    )
+
+    parents = {
+        member_id: (father_id, mother_id)
+        for member_id, father_id, mother_id in Member.objects.filter(id__in=subtree).values_list("id", "father_id", "mother_id")
+    }
+    outside_parents = {
+        parent_id
+        for father_id, mother_id in parents.values()
+        for parent_id in (father_id, mother_id)
+        if parent_id and parent_id not in parents
+    }
+    ancestry = compute_ancestry(parents, ancestors_of(outside_parents))
+    rows = _closure_rows(ancestry)
+
+    with transaction.atomic():
+        KinshipClosure.objects.filter(descendant_id__in=subtree).delete()
+        KinshipClosure.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_lineage(batch_size: int = 1000) -> int:
+    """
+    Rebuilds the whole closure table from the father/mother columns.
+    Returns the number of rows written.
+    """
+    parents = {
+        member_id: (father_id, mother_id)
+        for member_id, father_id, mother_id in Member.objects.values_list("id", "father_id", "mother_id").iterator()
+    }
+    rows = _closure_rows(compute_ancestry(parents))
+
+    with transaction.atomic():
+        KinshipClosure.objects.all().delete()
+        KinshipClosure.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def find_ancestry_path(ancestor_id, descendant_id) -> list[dict]:
+    """
+    Returns the lineage from `descendant_id` up to `ancestor_id` as
+    [{"id": ..., "name": ...}, ...], or [] when `ancestor_id` is not an
+    ancestor (or the same member). Uses one closure query.
+    """
+    if not ancestor_id or not descendant_id:
+        return []
+
+    on_path = (
+        Member.objects
+        .filter(Q(id=descendant_id) | Q(descendant_links__descendant_id=descendant_id))
+        .filter(Q(id=ancestor_id) | Q(ancestor_links__ancestor_id=ancestor_id))
+        .values_list("id", "name", "father_id", "mother_id")
+        .distinct()
+    )
+    nodes = {member_id: (name, father_id, mother_id) for member_id, name, father_id, mother_id in on_path}
+    if ancestor_id not in nodes or descendant_id not in nodes:
+        return []
+
+    path = []
+    current = descendant_id
+    while current is not None and len(path) <= len(nodes):
+        name, father_id, mother_id = nodes[current]
+        path.append({"id": current, "name": name})
+        if current == ancestor_id:
+            return path
+        current = next((p for p in (father_id, mother_id) if p in nodes), None)
+    return path
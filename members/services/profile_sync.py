@@ -0,0 +1,295 @@
+"""
+Member ⇄ profile synchronization.
+
+Signal receivers only record which side of a user changed (and which
+fields, when the save names them) in one batch per transaction; each save
+is confirmed by an on_commit callback registered where it happened, so a
+rolled-back savepoint discards its saves. The sync itself runs on
+commit: it loads the member(s) and the profile records for each queued
+user, builds one field-level diff per direction and saves only the
+fields that differ. Saves made by the sync carry
+`_skip_member_sync`, so they never queue another round.
+
+When both sides changed the same field in one transaction, the side
+saved last wins.
+"""
+import threading
+import weakref
+from collections import Counter
+from typing import NamedTuple
+
+from django.db import transaction
+
+from members.models import Member, MemberGender
+
+MEMBER = "member"
+PROFILE = "profile"
+PERSONAL = "personal"
+JOB = "job"
+EDUCATION = "education"
+
+
+class SyncField(NamedTuple):
+    member_field: str
+    source: str           # profile record holding the other side
+    profile_field: str
+    to_member: bool = True
+    to_profile: bool = False
+
+
+SYNC_FIELDS = (
+    SyncField("role", PROFILE, "registration_role", to_member=False, to_profile=True),
+    SyncField("name", PERSONAL, "full_name", to_profile=True),
+    SyncField("country_code", PERSONAL, "country_code", to_profile=True),
+    SyncField("mobile", PERSONAL, "phone", to_profile=True),
+    SyncField("native_place", PERSONAL, "native_place", to_profile=True),
+    SyncField("status", PERSONAL, "status", to_profile=True),
+    SyncField("email", PERSONAL, "email"),
+    SyncField("date_of_birth", PERSONAL, "dob"),
+    SyncField("gender", PERSONAL, "gender"),
+    SyncField("profile_image", PERSONAL, "profile_image"),
+    SyncField("occupation", JOB, "occupation_type"),
+    SyncField("highest_qualification", EDUCATION, "qualification"),
+)
+
+# Fields a save on each side must touch to be worth syncing
+RELEVANT_FIELDS = {
+    MEMBER: {f.member_field for f in SYNC_FIELDS if f.to_profile},
+    **{
+        source: {f.profile_field for f in SYNC_FIELDS if f.source == source and f.to_member}
+        for source in (PERSONAL, JOB, EDUCATION)
+    },
+}
+
+GENDER_MAP = {
+    "male": MemberGender.MALE,
+    "female": MemberGender.FEMALE,
+    "other": MemberGender.OTHER,
+}
+
+# queued: saves recorded; coalesced: saves merged into an already queued
+# sync; skipped_irrelevant: saves whose update_fields sync nothing;
+# unchanged: synced records that already matched; writes: records saved
+SYNC_STATS = Counter()
+
+def sync_stats() -> dict:
+    stats = dict(SYNC_STATS)
+    stats["writes_avoided"] = (
+        SYNC_STATS["coalesced"] + SYNC_STATS["skipped_irrelevant"] + SYNC_STATS["unchanged"]
+    )
+    return stats
+
+
+def reset_sync_stats():
+    SYNC_STATS.clear()
+
+
+# -------------------------------------------------
+# QUEUE
+# -------------------------------------------------
+def queue_sync(user_id, source, update_fields=None, member_id=None):
+    """
+    Records that `source` (MEMBER, PERSONAL, JOB or EDUCATION) of the user
+    was saved. Saves whose update_fields hold no synced field are dropped.
+    """
+    if not user_id or not sync_relevant(source, update_fields):
+        return
+
+    batch = _batch()
+    if user_id in batch.users:
+        SYNC_STATS["coalesced"] += 1
+    else:
+        SYNC_STATS["queued"] += 1
+
+    save = QueuedSave(batch, user_id, source, update_fields, member_id)
+    batch.add(save)
+    # Registered in the current savepoint, so rolling it back drops the
+    # save; runs immediately outside an atomic block
+    transaction.on_commit(save)
+
+
+def sync_relevant(source, update_fields) -> bool:
+    """False (and counted as avoided) when update_fields hold no synced field."""
+    if update_fields is not None and not RELEVANT_FIELDS[source] & set(update_fields):
+        SYNC_STATS["skipped_irrelevant"] += 1
+        return False
+    return True
+
+
+class QueuedSave:
+    """
+    One recorded save, and the on_commit callback confirming it. The
+    batch only keeps a weak reference until the callback runs: Django
+    discards the callbacks of a rolled-back savepoint, and with them the
+    saves made inside it.
+    """
+
+    __slots__ = ("batch", "user_id", "source", "fields", "member_id", "__weakref__")
+
+    def __init__(self, batch, user_id, source, update_fields, member_id):
+        self.batch = batch
+        self.user_id = user_id
+        self.source = source
+        self.fields = None if update_fields is None else set(update_fields)
+        self.member_id = member_id
+
+    def __call__(self):
+        self.batch.confirm(self)
+
+
+class SyncBatch:
+    """
+    Saves recorded during one outermost transaction, in save order. The
+    last surviving save to be confirmed on commit flushes the batch, so
+    every user is synced once with the side saved last winning.
+    """
+
+    def __init__(self):
+        self.saves = []      # weakrefs, in save order
+        self.confirmed = []  # saves whose callback ran, in save order
+        self.users = set()
+
+    def add(self, save):
+        self.saves.append(weakref.ref(save))
+        self.users.add(save.user_id)
+
+    def is_open(self) -> bool:
+        """False once its commit started, or when every save was rolled back."""
+        self._drop_rolled_back()
+        return not self.confirmed and bool(self.saves)
+
+    def _drop_rolled_back(self):
+        while self.saves and self.saves[-1]() is None:
+            self.saves.pop()
+
+    def confirm(self, save):
+        self.confirmed.append(save)
+        # Callbacks run in save order: a later save still alive will be
+        # confirmed after this one
+        self._drop_rolled_back()
+        if self.saves[-1]() is save:
+            self.flush()
+
+    def flush(self):
+        if getattr(_local, "batch", None) is self:
+            del _local.batch
+
+        pending = {}
+        for save in self.confirmed:
+            entry = pending.setdefault(save.user_id, {"sources": {}, "member_id": None})
+            # Re-insert so the dict order is the order of the latest saves
+            fields = entry["sources"].pop(save.source, set())
+            entry["sources"][save.source] = None if fields is None or save.fields is None else fields | save.fields
+            if save.member_id:
+                entry["member_id"] = save.member_id
+
+        for user_id, entry in pending.items():
+            with transaction.atomic():
+                sync_user(user_id, entry["sources"], entry["member_id"])
+
+
+_local = threading.local()
+
+
+def _batch() -> SyncBatch:
+    """The batch of the running transaction, opened by its first save."""
+    batch = getattr(_local, "batch", None)
+    if batch is None or not batch.is_open():
+        batch = _local.batch = SyncBatch()
+    return batch
+
+
+# -------------------------------------------------
+# SYNC
+# -------------------------------------------------
+def sync_user(user_id, sources, member_id=None):
+    """
+    Applies one diff per direction for the user. `sources` maps each saved
+    side to its update_fields (None for a full save), oldest save first.
+    """
+    from profiles.models import PersonalDetail, UserProfile
+
+    members = list(Member.objects.filter(user_id=user_id).order_by("id"))
+    if not members:
+        return
+    source_member = next((m for m in members if m.id == member_id), members[0])
+
+    profile = (
+        UserProfile.objects.select_related("personal", "job", "education_detail")
+        .filter(user_id=user_id)
+        .first()
+    )
+    records = {
+        PROFILE: profile,
+        PERSONAL: getattr(profile, "personal", None),
+        JOB: getattr(profile, "job", None),
+        EDUCATION: getattr(profile, "education_detail", None),
+    }
+    order = {source: position for position, source in enumerate(sources)}
+
+    member_changes = {}      # member field -> value
+    profile_changes = {}     # (source, profile field) -> value
+    for field in SYNC_FIELDS:
+        winner = None
+        for side, name in ((MEMBER, field.member_field), (field.source, field.profile_field)):
+            if side in sources and (sources[side] is None or name in sources[side]):
+                if winner is None or order[side] > order[winner]:
+                    winner = side
+
+        if winner == MEMBER and field.to_profile:
+            value = getattr(source_member, field.member_field)
+            if value not in (None, ""):
+                profile_changes[(field.source, field.profile_field)] = value
+        elif winner == field.source and field.to_member and records[field.source] is not None:
+            value = member_value(field, getattr(records[field.source], field.profile_field))
+            if value not in (None, ""):
+                member_changes[field.member_field] = value
+
+    for member in members:
+        changed = [name for name, value in member_changes.items() if not same_value(getattr(member, name), value)]
+        save_synced(member, changed, member_changes)
+
+    if profile_changes:
+        if profile is None:
+            profile, _ = UserProfile.objects.get_or_create(user_id=user_id)
+            records[PROFILE] = profile
+        if records[PERSONAL] is None and any(source == PERSONAL for source, _ in profile_changes):
+            records[PERSONAL], _ = PersonalDetail.objects.get_or_create(profile=profile)
+
+        by_record = {}
+        for (source, name), value in profile_changes.items():
+            by_record.setdefault(source, {})[name] = value
+        for source, values in by_record.items():
+            record = records[source]
+            changed = [name for name, value in values.items() if not same_value(getattr(record, name), value)]
+            save_synced(record, changed, values)
+
+
+def member_value(field, value):
+    if field.member_field == "gender" and value:
+        return GENDER_MAP.get(value.lower(), MemberGender.OTHER)
+    if field.member_field == "profile_image":
+        return value.name or None
+    return value
+
+
+def same_value(current, value):
+    if hasattr(current, "name") and not isinstance(current, str):
+        current = current.name or None  # FieldFile
+    return current == value
+
+
+def save_synced(instance, changed, values):
+    if not values:
+        return
+    if not changed:
+        SYNC_STATS["unchanged"] += 1
+        return
+    for name in changed:
+        setattr(instance, name, values[name])
+    instance._skip_member_sync = True
+    try:
+        instance.save(update_fields=changed)
+    finally:
+        instance._skip_member_sync = False
+    SYNC_STATS["writes"] += 1
@@ -0,0 +1,66 @@
+from django.db.models import Q
+
+from members.models import Member
+
+
+def collect_family_tree(root_member: Member) -> list[Member]:
+    """
+    Collects every member reachable from the root member's family through
+    spouse, father, mother and child links.
+
+    The traversal expands a whole generation (frontier) per query instead of
+    one query per visited member, so the number of queries is bounded by the
+    depth of the tree rather than by its size.
+    """
+    if root_member.family_id:
+        seed = list(Member.objects.filter(family_id=root_member.family_id).order_by("id"))
+    else:
+        seed = [root_member]
+
+    nodes = {}
+    frontier = []
+    for member in seed:
+        if member.id not in nodes:
+            nodes[member.id] = member
+            frontier.append(member)
+
+    while frontier:
+        frontier_ids = [m.id for m in frontier]
+        linked_ids = {
+            linked_id
+            for m in frontier
+            for linked_id in (m.spouse_id, m.father_id, m.mother_id)
+            if linked_id and linked_id not in nodes
+        }
+
+        query = Q(father_id__in=frontier_ids) | Q(mother_id__in=frontier_ids)
+        if linked_ids:
+            query |= Q(id__in=linked_ids)
+
+        frontier = []
+        for member in Member.objects.filter(query).order_by("id"):
+            if member.id not in nodes:
+                nodes[member.id] = member
+                frontier.append(member)
+
+    return list(nodes.values())
+
+
+def build_tree_edges(members: list[Member]) -> list[dict]:
+    """
+    Builds the sorted spouse / father / mother edge list for the given nodes.
+    Spouse edges are emitted once per couple (lower id first).
+    """
+    node_ids = {m.id for m in members}
+    edges = set()  # (source, target, type)
+
+    for node in members:
+        if node.spouse_id and node.spouse_id in node_ids:
+            s, t = (node.id, node.spouse_id) if node.id < node.spouse_id else (node.spouse_id, node.id)
+            edges.add((s, t, "spouse"))
+        if node.father_id and node.father_id in node_ids:
+            edges.add((node.father_id, node.id, "father"))
+        if node.mother_id and node.mother_id in node_ids:
+            edges.add((node.mother_id, node.id, "mother"))
+
+    return [{"source": s, "target": t, "type": edge_type} for s, t, edge_type in sorted(edges)]
@@ -1,83 +1,89 @@
-from django.db.models.signals import post_save
+from django.db import connections
+from django.db.models import Q
+from django.db.models.signals import post_migrate, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from members.models import Member
-from profiles.models import UserProfile, PersonalDetail
+from members.search import SEARCH_TABLE, install_search_index
+from members.services.profile_sync import MEMBER, queue_sync
+from members.services.kinship import relink_lineage
+from members.utils import HEAL_INPUT_FIELDS, mark_families_dirty
 
+
+# --------------------------------------------------
+# Kinship closure maintenance
+# --------------------------------------------------
 @receiver(post_save, sender=Member)
-def sync_member_to_userprofile(sender, instance, **kwargs):
+def maintain_kinship_closure(sender, instance, update_fields=None, **kwargs):
     """
-    Sync Member → UserProfile & PersonalDetail
-    Triggered on:
-    - API approval
-    - Admin panel change
+    Keep the ancestor/descendant closure in step with father/mother links.
+    Spouse links are plain columns and need no closure rows.
     """
-    if not instance.user:
-        return
-
-    user = instance.user
-    profile, _ = UserProfile.objects.get_or_create(user=user)
+    if instance.tracked_changes(update_fields) & {"father", "mother"}:
+        relink_lineage([instance.id])
 
-    # ---------------------------
-    # Sync ROLE
-    # ---------------------------
-    if instance.role and profile.registration_role != instance.role:
-        profile.registration_role = instance.role
-        profile.save(update_fields=["registration_role"])
 
-    # ---------------------------
-    # Sync PERSONAL DETAIL
-    # ---------------------------
-    personal, _ = PersonalDetail.objects.get_or_create(profile=profile)
-    changed_fields = []
+# --------------------------------------------------
+# Search index triggers
+# --------------------------------------------------
+@receiver(post_migrate)
+def restore_member_search_index(sender, using="default", **kwargs):
+    """
+    SQLite rebuilds members_member on many schema changes, dropping the
+    search triggers with the old table; put them back after migrate.
+    """
+    if sender.name != "members":
+        return
+    connection = connections[using]
+    if connection.vendor == "sqlite" and SEARCH_TABLE in connection.introspection.table_names():
+        install_search_index(connection)
 
-    if instance.name and personal.full_name != instance.name:
-        personal.full_name = instance.name
-        changed_fields.append("full_name")
 
-    if instance.country_code and personal.country_code != instance.country_code:
-            personal.country_code = instance.country_code
-            changed_fields.append("country_code")
+# --------------------------------------------------
+# Family healing dirty markers
+# --------------------------------------------------
+@receiver(post_save, sender=Member)
+def mark_family_for_healing(sender, instance, update_fields=None, **kwargs):
+    """
+    Flag the member's family (and the family it left) as needing a heal
+    whenever a field the healer reads has changed.
+    """
+    changed = instance.tracked_changes(update_fields)
+    if not changed & HEAL_INPUT_FIELDS:
+        return
 
-    if instance.mobile and personal.phone != instance.mobile:
-        personal.phone = instance.mobile
-        changed_fields.append("phone")
+    family_ids = {instance.family_id}
+    if "family" in changed:
+        family_ids.add(getattr(instance, "_tracked_values", {}).get("family"))
+    mark_families_dirty(family_ids)
 
-    if instance.native_place and personal.native_place != instance.native_place:
-        personal.native_place = instance.native_place
-        changed_fields.append("native_place")
 
-    # ✅ IMPORTANT: SYNC STATUS
-    if hasattr(personal, "status") and personal.status != instance.status:
-        personal.status = instance.status
-        changed_fields.append("status")
+@receiver(pre_delete, sender=Member)
+def remember_children_before_delete(sender, instance, **kwargs):
+    # Children lose this parent through SET_NULL, which sends no signals
+    instance._orphaned_children = list(
+        Member.objects.filter(Q(father=instance) | Q(mother=instance)).values_list("id", flat=True)
+    )
 
-    if changed_fields:
-        personal.save(update_fields=changed_fields)
 
+@receiver(post_delete, sender=Member)
+def relink_children_after_delete(sender, instance, **kwargs):
+    relink_lineage(getattr(instance, "_orphaned_children", []))
+    mark_families_dirty([instance.family_id])
 
 
-def sync_member_to_profile_helper(member):
-    if not member.user:
+# --------------------------------------------------
+# Member → UserProfile & PersonalDetail
+# --------------------------------------------------
+@receiver(post_save, sender=Member)
+def sync_member_to_userprofile(sender, instance, update_fields=None, **kwargs):
+    """
+    Sync Member → UserProfile & PersonalDetail
+    Triggered on:
+    - API approval
+    - Admin panel change
+    Queued and applied once on commit by members.services.profile_sync.
+    """
+    if not instance.user_id or getattr(instance, "_skip_member_sync", False):
         return
-
-    profile, _ = UserProfile.objects.get_or_create(user=member.user)
-    personal, _ = PersonalDetail.objects.get_or_create(profile=profile)
-
-    updated_fields = []
-
-    if personal.status != member.status:
-        personal.status = member.status
-        updated_fields.append("status")
-
-    if personal.country_code != member.country_code:
-        personal.country_code = member.country_code
-        updated_fields.append("country_code")
-
-    if personal.phone != member.mobile:
-        personal.phone = member.mobile
-        updated_fields.append("phone")
-
-    if updated_fields:
-        personal._skip_member_sync = True
-        personal.save(update_fields=updated_fields)
+    queue_sync(instance.user_id, MEMBER, update_fields, member_id=instance.id)
 
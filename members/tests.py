@@ -1,10 +1,12 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIRequestFactory, force_authenticate
-from members.models import Member, MemberGender, MemberRole, Family
+from members.models import Member, MemberGender, MemberRole, Family, KinshipLine
+from django.db.models import F
 from members.utils import get_relationship, heal_family_relations
 from members.views import FamilyTreeView
 import datetime
+import io
 
 User = get_user_model()
 
@@ -79,6 +81,99 @@ class RelationshipResolverTests(TestCase):
         self.assertEqual(get_relationship(grandson, self.juee), "Grandmother")
 
 
+    def test_extended_relationships(self):
+        grandfather = Member.objects.create(name="Grandfather", gender=MemberGender.MALE, family=self.family, mobile="11")
+        bua = Member.objects.create(name="Bua", gender=MemberGender.FEMALE, family=self.family, mobile="12", father=grandfather)
+        self.sachin.father = grandfather
+        self.sachin.save()
+        nephew = Member.objects.create(name="Nephew", gender=MemberGender.MALE, family=self.family, mobile="13", mother=bua)
+        juee_father = Member.objects.create(name="Juee Father", gender=MemberGender.MALE, family=self.family, mobile="14")
+        self.juee.father = juee_father
+        self.juee.save()
+
+        self.assertEqual(get_relationship(self.son, bua), "Bua")
+        self.assertEqual(get_relationship(bua, self.son), "Nephew")
+        self.assertEqual(get_relationship(self.sachin, nephew), "Nephew")
+        self.assertEqual(get_relationship(self.sachin, juee_father), "Father-in-law")
+        self.assertEqual(get_relationship(self.son, grandfather), "Grandfather")
+
+    def test_extended_relationship_uses_single_query(self):
+        grandson = Member.objects.create(name="Grandson", gender=MemberGender.MALE, family=self.family, father=self.son)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_relationship(grandson, self.sachin), "Grandfather")
+
+
+    def test_batch_resolver_matches_single_lookups(self):
+        from members.utils import resolve_relationships
+
+        grandson = Member.objects.create(name="Grandson", gender=MemberGender.MALE, family=self.family, father=self.son)
+        members = list(Member.objects.filter(family=self.family))
+
+        with self.assertNumQueries(0):
+            labels = resolve_relationships(grandson, members)
+
+        for member in members:
+            self.assertEqual(labels[member.id], get_relationship(grandson, member))
+
+class KinshipClosureTests(TestCase):
+    def setUp(self):
+        self.grandfather = Member.objects.create(name="Grandfather", gender=MemberGender.MALE, mobile="21")
+        self.father = Member.objects.create(name="Father", gender=MemberGender.MALE, mobile="22", father=self.grandfather)
+        self.mother = Member.objects.create(name="Mother", gender=MemberGender.FEMALE, mobile="23")
+        self.child = Member.objects.create(
+            name="Child", gender=MemberGender.MALE, mobile="24", father=self.father, mother=self.mother
+        )
+
+    def ancestry(self, member):
+        from members.services.kinship import ancestors_of
+        return ancestors_of([member.id])[member.id]
+
+    def test_closure_built_on_create(self):
+        self.assertEqual(
+            self.ancestry(self.child),
+            {
+                self.father.id: (1, KinshipLine.PATERNAL),
+                self.mother.id: (1, KinshipLine.MATERNAL),
+                self.grandfather.id: (2, KinshipLine.PATERNAL),
+            },
+        )
+
+    def test_parent_change_relinks_descendants(self):
+        maternal_grandmother = Member.objects.create(name="Nani", gender=MemberGender.FEMALE, mobile="25")
+        self.mother.mother = maternal_grandmother
+        self.mother.save(update_fields=["mother"])
+
+        self.assertEqual(self.ancestry(self.child)[maternal_grandmother.id], (2, KinshipLine.MATERNAL))
+
+        self.father.father = None
+        self.father.save()
+        self.assertNotIn(self.grandfather.id, self.ancestry(self.child))
+
+    def test_delete_relinks_orphaned_children(self):
+        self.father.delete()
+        self.assertEqual(self.ancestry(self.child), {self.mother.id: (1, KinshipLine.MATERNAL)})
+
+    def test_rebuild_matches_incremental_state(self):
+        from members.models import KinshipClosure
+        from members.services.kinship import rebuild_lineage
+
+        before = set(KinshipClosure.objects.values_list("ancestor_id", "descendant_id", "depth", "line"))
+        rebuild_lineage()
+        after = set(KinshipClosure.objects.values_list("ancestor_id", "descendant_id", "depth", "line"))
+        self.assertEqual(before, after)
+
+
+    def test_cycle_check_reports_path_in_one_query(self):
+        from members.serializers import check_circular_dependency
+
+        with self.assertNumQueries(1):
+            path = check_circular_dependency(self.grandfather.id, self.child.id)
+        self.assertEqual([node["name"] for node in path], ["Child", "Father", "Grandfather"])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(check_circular_dependency(self.child.id, self.mother.id), [])
+        self.assertEqual(check_circular_dependency(self.child.id, self.child.id), [{"id": self.child.id, "name": "Child"}])
+
 class TenMemberFamilyTreeTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(phone="9510981420", country_code="+91", password="123")
@@ -255,3 +350,771 @@ class TenMemberFamilyTreeTests(TestCase):
 
         # Check edges exist
         self.assertTrue(len(edges) >= 8)
+
+
+    def test_tree_read_is_pure_once_healed(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        factory = APIRequestFactory()
+        view = FamilyTreeView.as_view()
+
+        request = factory.get('/api/members/tree/')
+        force_authenticate(request, user=self.user)
+        view(request)  # heals the freshly created family
+
+        request = factory.get('/api/members/tree/')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+        writes = [q["sql"] for q in ctx.captured_queries if not q["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertEqual(writes, [])
+
+    def test_relation_writes_mark_family_dirty(self):
+        from members.utils import heal_family_if_dirty
+
+        heal_family_relations(self.family)
+        self.assertEqual(heal_family_if_dirty(self.family), 0)
+        self.family.refresh_from_db()
+        self.assertEqual(self.family.healed_version, self.family.relations_version)
+
+        self.son.name = "Renamed Son"
+        self.son.save()
+        self.family.refresh_from_db()
+        self.assertEqual(self.family.healed_version, self.family.relations_version)
+
+        self.son.relation = "brother"
+        self.son.save(update_fields=["relation"])
+        self.family.refresh_from_db()
+        self.assertLess(self.family.healed_version, self.family.relations_version)
+
+        self.assertGreater(heal_family_if_dirty(self.family), 0)
+        self.son.refresh_from_db()
+        self.assertEqual(self.son.father_id, self.father.id)
+
+class FamilyTreeTraversalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone="9000000001", country_code="+91", password="123")
+        self.family = Family.objects.create(head=self.user)
+
+        # Five generations, only the youngest one belongs to the family
+        self.generations = []
+        parent = None
+        for level in range(5):
+            member = Member.objects.create(
+                name=f"Generation {level}",
+                gender=MemberGender.MALE,
+                mobile=f"90000001{level}",
+                father=parent,
+                family=self.family if level == 4 else None,
+            )
+            self.generations.append(member)
+            parent = member
+
+        self.cousin = Member.objects.create(
+            name="Cousin",
+            gender=MemberGender.FEMALE,
+            mobile="9000000200",
+            father=self.generations[1],
+        )
+
+    def test_reaches_linked_members_outside_family(self):
+        from members.services.tree import collect_family_tree
+
+        root = self.generations[4]
+        nodes = collect_family_tree(root)
+
+        node_ids = {m.id for m in nodes}
+        expected = {m.id for m in self.generations} | {self.cousin.id}
+        self.assertEqual(node_ids, expected)
+
+    def test_queries_scale_with_generations_not_members(self):
+        from members.services.tree import collect_family_tree, build_tree_edges
+
+        root = self.generations[4]
+        # seed + one query per generation walked up (the cousin comes in the
+        # same frontier as the eldest generation)
+        with self.assertNumQueries(6):
+            nodes = collect_family_tree(root)
+
+        edges = build_tree_edges(nodes)
+        self.assertEqual(len(edges), 5)
+        self.assertTrue(all(edge["type"] == "father" for edge in edges))
+
+
+class HealFamilyBulkTests(TestCase):
+    def build_family(self, phone, children):
+        user = User.objects.create_user(phone=phone, country_code="+91", password="123")
+        family = Family.objects.create(head=user)
+        head = Member.objects.create(
+            user=user, family=family, name="Head", gender=MemberGender.MALE,
+            role=MemberRole.FAMILY_HEAD, mobile=phone,
+        )
+        wife = Member.objects.create(family=family, name="Wife", gender=MemberGender.FEMALE, relation="spouse", mobile=f"{phone}1")
+        for i in range(children):
+            Member.objects.create(family=family, name=f"Child {i}", gender=MemberGender.MALE, relation="son", mobile=f"{phone}2{i}")
+        return family, head, wife
+
+    def count_heal_queries(self, family):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            healed = heal_family_relations(family)
+        return healed, len(ctx.captured_queries)
+
+    def test_heal_query_count_does_not_grow_with_family(self):
+        small, _, _ = self.build_family("9100000001", children=3)
+        large, head, wife = self.build_family("9100000002", children=30)
+
+        small_healed, small_queries = self.count_heal_queries(small)
+        large_healed, large_queries = self.count_heal_queries(large)
+
+        self.assertEqual(small_healed, 5)
+        self.assertEqual(large_healed, 32)
+        self.assertEqual(small_queries, large_queries)
+
+        child = Member.objects.filter(family=large, relation="son").first()
+        self.assertEqual((child.father_id, child.mother_id), (head.id, wife.id))
+        self.assertEqual(get_relationship(child, head), "Father")
+
+    def test_sync_family_tree_command_heals_in_chunks(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        first, head, wife = self.build_family("9100000003", children=4)
+        second, _, _ = self.build_family("9100000004", children=2)
+
+        out = StringIO()
+        call_command("sync_family_tree", "--chunk-size", "1", "--since", "2000-01-01", stdout=out)
+
+        self.assertIn("Chunk 2:", out.getvalue())
+        self.assertIn("2 families", out.getvalue())
+        for family in (first, second):
+            family.refresh_from_db()
+            self.assertEqual(family.healed_version, family.relations_version)
+
+        child = Member.objects.filter(family=first, relation="son").first()
+        self.assertEqual((child.father_id, child.mother_id), (head.id, wife.id))
+
+    def test_sync_family_tree_since_includes_unstamped_families_with_workers(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        stamped, _, _ = self.build_family("9100000005", children=2)
+        unstamped, head, wife = self.build_family("9100000006", children=3)
+        Family.objects.filter(id=unstamped.id).update(relations_changed_at=None)
+
+        out = StringIO()
+        call_command("sync_family_tree", "--since", "2999-01-01", "--workers", "2", stdout=out)
+
+        self.assertIn("1 families", out.getvalue())
+        stamped.refresh_from_db()
+        unstamped.refresh_from_db()
+        self.assertNotEqual(stamped.healed_version, stamped.relations_version)
+        self.assertEqual(unstamped.healed_version, unstamped.relations_version)
+
+        child = Member.objects.filter(family=unstamped, relation="son").first()
+        self.assertEqual((child.father_id, child.mother_id), (head.id, wife.id))
+
+        # Once healed, an unstamped family is left out of later runs
+        out = StringIO()
+        call_command("sync_family_tree", "--since", "2999-01-01", "--workers", "2", stdout=out)
+        self.assertIn("for 0 families", out.getvalue())
+
+
+class MemberProfileImageTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def add_member_with_image(self, index):
+        from profiles.models import PersonalDetail, UserProfile
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(phone=f"92000000{index:02d}", country_code="+91", password="123")
+            member = Member.objects.create(name=f"Member {index}", gender=MemberGender.MALE, mobile=user.phone, user=user)
+            profile, _ = UserProfile.objects.get_or_create(user=user)
+            PersonalDetail.objects.update_or_create(profile=profile, defaults={"profile_image": f"profile/{index}.jpg"})
+        return member
+
+    def image_queries(self, members):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from members.serializers import MemberSerializer
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = MemberSerializer(members, many=True).data
+        return data, sum("profiles_personaldetail" in q["sql"] for q in ctx.captured_queries)
+
+    def test_list_resolves_images_in_one_query_then_from_cache(self):
+        from django.core.cache import cache
+
+        members = [self.add_member_with_image(i) for i in range(5)]
+        cache.clear()  # the invalidation hold of the new images has passed
+
+        data, queries = self.image_queries(Member.objects.filter(id__in=[m.id for m in members]).order_by("id"))
+        self.assertEqual(queries, 1)
+        self.assertEqual([row["profileImageUrl"] for row in data], [f"/media/profile/{i}.jpg" for i in range(5)])
+
+        _, queries = self.image_queries(Member.objects.filter(id__in=[m.id for m in members]))
+        self.assertEqual(queries, 0)
+
+    def test_image_change_invalidates_cache(self):
+        from members.serializers import MemberSerializer
+        from profiles.models import PersonalDetail
+
+        member = self.add_member_with_image(1)
+        self.assertEqual(MemberSerializer(member).data["profileImageUrl"], "/media/profile/1.jpg")
+
+        personal = PersonalDetail.objects.get(profile__user=member.user)
+        personal.profile_image = "profile/new.jpg"
+        personal.save()
+        self.assertEqual(MemberSerializer(member).data["profileImageUrl"], "/media/profile/new.jpg")
+
+    def test_stale_read_cannot_overwrite_an_invalidation(self):
+        from django.core.cache import cache
+        from profiles.models import PersonalDetail
+        from profiles.utils import PROFILE_IMAGE_CACHE_KEY, profile_image_names
+
+        member = self.add_member_with_image(1)
+        cache.clear()
+        key = PROFILE_IMAGE_CACHE_KEY.format(user_id=member.user_id)
+
+        personal = PersonalDetail.objects.get(profile__user=member.user)
+        personal.profile_image = "profile/new.jpg"
+        personal.save()
+
+        # A request that loaded the old name before the change cannot write it back
+        self.assertFalse(cache.add(key, "profile/1.jpg", 60))
+
+        self.assertEqual(profile_image_names([member.user_id]), {member.user_id: "profile/new.jpg"})
+
+
+class MemberListQueryCountTests(TestCase):
+    """Regression benchmark: list responses must not grow with family size."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def build_family(self, size, offset):
+        head_user = User.objects.create_user(phone=f"93{offset:04d}0000", country_code="+91", password="123")
+        family = Family.objects.create(head=head_user)
+        father = Member.objects.create(
+            name="Head", gender=MemberGender.MALE, mobile=head_user.phone,
+            user=head_user, family=family, role=MemberRole.FAMILY_HEAD,
+        )
+        mother = Member.objects.create(
+            name="Wife", gender=MemberGender.FEMALE, mobile=f"93{offset:04d}0001", family=family, spouse=father,
+        )
+        for i in range(size - 2):
+            Member.objects.create(
+                name=f"Child {i}", gender=MemberGender.MALE, mobile=f"93{offset:04d}1{i:03d}",
+                family=family, father=father, mother=mother,
+            )
+        return head_user
+
+    def count_queries(self, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from members.views import MyFamilyMembers
+
+        request = self.factory.get("/api/members/my-family/")
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = MyFamilyMembers.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data["familyMembers"]
+
+    def test_query_count_is_flat_in_family_size(self):
+        small, _ = self.count_queries(self.build_family(4, 1))
+        large, rows = self.count_queries(self.build_family(40, 2))
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(rows), 40)
+        child = next(row for row in rows if row["name"] == "Child 0")
+        self.assertIsNotNone(child["father_id"])
+        self.assertIsNotNone(child["mother_id"])
+        self.assertTrue(child["family_id_display"].startswith("F_"))
+
+
+class MemberListPaginationTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.admin = User.objects.create_user(phone="9400000000", country_code="+91", password="123")
+        self.members = []
+        for i in range(7):
+            user = User.objects.create_user(phone=f"94000001{i:02d}", country_code="+91", password="123")
+            self.members.append(Member.objects.create(
+                name=f"Member {i}", gender=MemberGender.MALE, mobile=user.phone, user=user,
+                city="Jodhpur" if i % 2 else "Pali",
+            ))
+        # Same timestamp for everyone: the id tiebreaker must keep pages disjoint
+        Member.objects.update(created_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def get(self, url):
+        from members.views import MemberListView
+
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.admin)
+        response = MemberListView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_walks_all_members_once(self):
+        seen = []
+        url = "/api/members/all/?page_size=3"
+        while url:
+            page = self.get(url)
+            self.assertEqual(page["count"], 7)
+            seen.extend(row["id"] for row in page["familyMembers"])
+            url = page["next"]
+        self.assertEqual(seen, sorted((m.id for m in self.members), reverse=True))
+
+    def test_filters_and_optional_count(self):
+        page = self.get("/api/members/all/?city=jodhpur&include_count=false")
+        self.assertIsNone(page["count"])
+        self.assertEqual({row["city"] for row in page["familyMembers"]}, {"Jodhpur"})
+        self.assertEqual(len(page["familyMembers"]), 3)
+
+
+class MemberSearchTests(TestCase):
+    def setUp(self):
+        self.alpha = Member.objects.create(name="Ramesh Suthar", gender=MemberGender.MALE, mobile="9811100001", city="Pali")
+        self.beta = Member.objects.create(name="Suresh Ram", gender=MemberGender.MALE, mobile="9822200002", city="Jodhpur")
+        self.gamma = Member.objects.create(name="Mahesh", gender=MemberGender.MALE, mobile="9833300003", gotra="Ram")
+
+    def names(self, query, **filters):
+        from members.search import search_members
+        return [m.name for m in search_members(query, filters=filters)]
+
+    def test_uses_index_and_ranks_prefix_first(self):
+        from members.search import fts_available
+
+        self.assertTrue(fts_available())
+        self.assertEqual(self.names("ram"), ["Ramesh Suthar", "Suresh Ram"])
+        self.assertEqual(self.names("00003"), ["Mahesh"])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.gamma.name = "Ramkumar"
+        self.gamma.save()
+        self.assertEqual(self.names("ramk"), ["Ramkumar"])
+
+        self.gamma.delete()
+        self.assertEqual(self.names("ramk"), [])
+
+    def test_filters_and_short_queries(self):
+        self.assertEqual(self.names("ram", city="jodhpur"), ["Suresh Ram"])
+        self.assertEqual(self.names("ma"), ["Mahesh"])
+
+
+class PhoneNormalizationTests(TestCase):
+    def test_normalize_phone_variants(self):
+        from members.phone import normalize_phone
+
+        for raw in ("9811100001", "98111 00001", "+91 98111-00001", "919811100001", "09811100001", "0091 9811100001"):
+            self.assertEqual(normalize_phone(raw, "+91"), "+919811100001", raw)
+        self.assertEqual(normalize_phone("4155550100", "+1"), "+14155550100")
+        self.assertEqual(normalize_phone("", "+91"), "")
+
+    def test_save_keeps_phone_e164_in_step(self):
+        member = Member.objects.create(name="A", gender=MemberGender.MALE, mobile="98111 00001")
+        self.assertEqual(member.phone_e164, "+919811100001")
+
+        member.mobile = "9822200002"
+        member.save(update_fields=["mobile"])
+        member.refresh_from_db()
+        self.assertEqual(member.phone_e164, "+919822200002")
+
+    def test_backfill_fixes_stale_rows(self):
+        from django.core.management import call_command
+
+        member = Member.objects.create(name="A", gender=MemberGender.MALE, mobile="+91 98111 00001")
+        Member.objects.filter(id=member.id).update(phone_e164="")
+        call_command("backfill_phone_e164", stdout=io.StringIO())
+        member.refresh_from_db()
+        self.assertEqual(member.phone_e164, "+919811100001")
+
+    def test_family_rejects_another_spelling_of_a_mobile(self):
+        from django.db import IntegrityError, transaction
+
+        user = User.objects.create_user(phone="9811100009", country_code="+91", password="123")
+        family, other = Family.objects.create(head=user), Family.objects.create()
+        Member.objects.create(name="A", gender=MemberGender.MALE, mobile="9811100001", family=family)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Member.objects.create(name="B", gender=MemberGender.MALE, mobile="+91 98111 00001", family=family)
+        Member.objects.create(name="C", gender=MemberGender.MALE, mobile="+91 98111 00001", family=other)
+        Member.objects.create(name="D", gender=MemberGender.MALE, mobile="", family=family)
+        Member.objects.create(name="E", gender=MemberGender.MALE, mobile="", family=family)
+
+
+class RequestingMemberMixinTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(phone="9500000001", country_code="+91", password="123")
+        self.family = Family.objects.create(head=self.user)
+        self.head = Member.objects.create(
+            name="Head", gender=MemberGender.MALE, mobile=self.user.phone, user=self.user,
+            family=self.family, role=MemberRole.FAMILY_HEAD,
+        )
+
+    def test_caller_resolved_once_per_request(self):
+        from members.mixins import RequestingMemberMixin
+
+        view = RequestingMemberMixin()
+        view.request = self.factory.get("/")
+        view.request.user = self.user
+
+        with self.assertNumQueries(1):
+            self.assertEqual(view.get_family_head_context(), (self.head, self.family))
+            self.assertEqual(view.get_requesting_member(), self.head)
+            view.get_family_head_context()
+
+    def test_add_member_links_child_to_head_from_context(self):
+        from members.views import FamilyHeadAddMember
+
+        request = self.factory.post("/api/members/add/", {
+            "name": "Son", "gender": "male", "relation": "son", "date_of_birth": "2010-01-01", "mobile": "9500000002",
+        }, format="json")
+        force_authenticate(request, user=self.user)
+        response = FamilyHeadAddMember.as_view()(request)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        son = Member.objects.get(id=response.data["member"]["id"])
+        self.assertEqual((son.family_id, son.father_id), (self.family.id, self.head.id))
+
+    def test_add_member_country_code_defaults_like_other_paths(self):
+        from members.views import FamilyHeadAddMember
+
+        Member.objects.filter(id=self.head.id).update(country_code="+1")
+        request = self.factory.post("/api/members/add/", {
+            "name": "Son", "gender": "male", "relation": "son", "date_of_birth": "2010-01-01", "mobile": "9500000002",
+        }, format="json")
+        force_authenticate(request, user=self.user)
+        response = FamilyHeadAddMember.as_view()(request)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        son = Member.objects.get(id=response.data["member"]["id"])
+        self.assertEqual((son.country_code, son.phone_e164), ("+91", "+919500000002"))
+
+
+class BulkMemberImportTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(phone="9600000001", country_code="+91", password="123")
+        self.family = Family.objects.create(head=self.user)
+        self.head = Member.objects.create(
+            name="Head", gender=MemberGender.MALE, mobile=self.user.phone, user=self.user,
+            family=self.family, role=MemberRole.FAMILY_HEAD,
+        )
+
+    def post(self, rows):
+        from members.views import FamilyHeadBulkAddMembers
+
+        request = self.factory.post("/api/members/add/bulk/", {"members": rows}, format="json")
+        force_authenticate(request, user=self.user)
+        return FamilyHeadBulkAddMembers.as_view()(request)
+
+    def family_rows(self, children):
+        rows = [
+            {"name": "Wife", "gender": "female", "relation": "spouse", "date_of_birth": "1980-01-01", "mobile": "9600001000"},
+        ]
+        for i in range(children):
+            rows.append({
+                "name": f"Child {i}", "gender": "male", "relation": "son", "date_of_birth": "2005-01-01",
+                "mobile": f"96000{i + 2:05d}", "mother_id": "$ref:0",
+            })
+        return rows
+
+    def test_imports_linked_family_in_constant_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.post(self.family_rows(4)).status_code, 201)
+        Member.objects.exclude(id=self.head.id).delete()
+        self.head.refresh_from_db()
+
+        with CaptureQueriesContext(connection) as large:
+            response = self.post(self.family_rows(39))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["count"], 40)
+        # SQLite caps variables per statement, so 40 rows need a second INSERT
+        self.assertLessEqual(len(large.captured_queries), len(small.captured_queries) + 1)
+        self.assertLess(len(large.captured_queries), 25)
+
+        wife = Member.objects.get(name="Wife")
+        child = Member.objects.get(name="Child 38")
+        self.head.refresh_from_db()
+        self.assertEqual(self.head.spouse_id, wife.id)
+        self.assertEqual((child.father_id, child.mother_id), (self.head.id, wife.id))
+        self.assertEqual(get_relationship(self.head, child), "Son")
+
+    def test_invalid_batch_writes_nothing(self):
+        rows = self.family_rows(2)
+        rows[1]["mobile"] = self.head.mobile
+        rows[2]["father_id"] = "$ref:9"
+
+        response = self.post(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual({(e["row"], e["field"]) for e in response.data["errors"]}, {(1, "mobile"), (2, "father_id")})
+        self.assertEqual(Member.objects.count(), 1)
+
+    def test_new_spouse_replaces_the_heads_current_spouse(self):
+        old_wife = Member.objects.create(
+            name="Old Wife", gender=MemberGender.FEMALE, mobile="9600009999", family=self.family, spouse=self.head,
+        )
+        Member.objects.filter(id=self.head.id).update(spouse=old_wife)
+
+        response = self.post(self.family_rows(1))
+
+        self.assertEqual(response.status_code, 201, response.data)
+        wife = Member.objects.get(name="Wife")
+        self.head.refresh_from_db()
+        old_wife.refresh_from_db()
+        self.assertEqual((self.head.spouse_id, wife.spouse_id, old_wife.spouse_id), (wife.id, self.head.id, None))
+
+    def test_heads_spouse_cannot_be_claimed_by_another_row(self):
+        rows = self.family_rows(0) + [
+            {"name": "Other", "gender": "male", "relation": "other", "date_of_birth": "1980-01-01",
+             "mobile": "9600001001", "spouse_id": "$ref:0"},
+        ]
+
+        response = self.post(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e["row"], e["field"]) for e in response.data["errors"]], [(1, "spouse_id")])
+        self.assertEqual(Member.objects.count(), 1)
+
+
+class ImportMembersCommandTests(TestCase):
+    HEADER = "family_key,name,gender,relation,date_of_birth,mobile,father_id,mother_id,spouse_id\n"
+
+    def write_csv(self, body):
+        import os
+        import tempfile
+
+        handle = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8")
+        handle.write(self.HEADER + body)
+        handle.close()
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def run_import(self, path, *args):
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command("import_members", path, "--chunk-size", "2", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_imports_families_with_cross_chunk_links(self):
+        path = self.write_csv(
+            "A,Ramesh,male,self,1960-01-01,9700000001,,,$ref:1\n"
+            "A,Sita,female,spouse,1962-01-01,9700000002,,,$ref:0\n"
+            "B,Other,male,self,1970-01-01,9700000010,,,\n"
+            "A,Son,male,son,1990-01-01,9700000003,$ref:0,$ref:1,\n"
+            "A,Grandson,male,other,2015-01-01,9700000004,$ref:3,,\n"
+        )
+        output = self.run_import(path)
+
+        self.assertIn("Chunk 3: 1 rows", output)
+        self.assertIn("rows/s", output)
+        self.assertEqual(Family.objects.count(), 2)
+        ramesh = Member.objects.get(name="Ramesh")
+        sita = Member.objects.get(name="Sita")
+        grandson = Member.objects.get(name="Grandson")
+        self.assertEqual((ramesh.spouse_id, sita.spouse_id), (sita.id, ramesh.id))
+        self.assertEqual(grandson.father.mother_id, sita.id)
+        self.assertEqual(grandson.family_id, ramesh.family_id)
+        self.assertNotEqual(Member.objects.get(name="Other").family_id, ramesh.family_id)
+        self.assertEqual(grandson.phone_e164, "+919700000004")
+        # the closure is maintained even though the links were bulk-written
+        self.assertTrue(grandson.ancestor_links.filter(ancestor=ramesh, depth=2).exists())
+        self.assertFalse(Family.objects.filter(healed_version__lt=F("relations_version")).exists())
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write_csv(
+            "A,Ramesh,male,self,1960-01-01,9700000001,,,\n"
+            "A,Son,male,son,1990-01-01,9700000003,$ref:0,,\n"
+        )
+        output = self.run_import(path, "--dry-run")
+
+        self.assertIn("Dry run", output)
+        self.assertFalse(Member.objects.exists())
+        self.assertFalse(Family.objects.exists())
+
+    def test_invalid_rows_abort_the_whole_import(self):
+        from django.core.management.base import CommandError
+
+        path = self.write_csv(
+            "A,Ramesh,male,self,1960-01-01,9700000001,$ref:1,,\n"
+            "A,Son,male,son,1990-01-01,9700000001,$ref:0,,\n"
+            "A,Ghost,male,son,1990-01-01,9700000005,$ref:9,,\n"
+        )
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        self.assertFalse(Member.objects.exists())
+        self.assertFalse(Family.objects.exists())
+
+
+class SyncMembersCommandTests(TestCase):
+    def setUp(self):
+        from profiles.models import EducationDetail, PersonalDetail, UserProfile
+
+        self.head_user = User.objects.create_user(phone="9510981420", country_code="+91", password="123")
+        self.users = []
+        for i in range(5):
+            user = User.objects.create_user(phone=f"98000000{i:02d}", country_code="+91", password="123")
+            profile = UserProfile.objects.create(
+                user=user, registration_role="familyHead" if i == 0 else "member"
+            )
+            PersonalDetail.objects.create(
+                profile=profile, full_name=f"Person {i}", phone=user.phone, gender="male",
+                dob=datetime.date(1990, 1, 1), native_place="Jodhpur",
+            )
+            EducationDetail.objects.create(profile=profile, qualification="B.Com")
+            self.users.append(user)
+        UserProfile.objects.create(user=self.head_user)  # no personal details: skipped
+
+    def sync(self):
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command("sync_members", "--chunk-size", "2", stdout=out)
+        return out.getvalue()
+
+    def test_creates_members_in_bulk_then_is_a_no_op(self):
+        output = self.sync()
+        self.assertIn("5 created, 0 updated, 0 unchanged, 1 profiles without personal details", output)
+
+        members = Member.objects.filter(user__in=self.users).order_by("user_id")
+        self.assertEqual(members.count(), 5)
+        primary = Family.objects.get(head=self.head_user)
+        self.assertEqual(members[0].family.head_id, self.users[0].id)
+        self.assertEqual(members[0].role, MemberRole.FAMILY_HEAD)
+        self.assertTrue(all(m.family_id == primary.id for m in members[1:]))
+        self.assertEqual(members[1].highest_qualification, "B.Com")
+        self.assertEqual(members[1].phone_e164, "+919800000001")
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            output = self.sync()
+        self.assertIn("0 created, 0 updated, 5 unchanged", output)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith(("UPDATE", "INSERT"))])
+
+    def test_updates_only_changed_members(self):
+        from profiles.models import PersonalDetail
+
+        self.sync()
+        PersonalDetail.objects.filter(profile__user=self.users[2]).update(full_name="Renamed", phone="9811111111")
+
+        output = self.sync()
+        self.assertIn("0 created, 1 updated, 4 unchanged", output)
+        member = Member.objects.get(user=self.users[2])
+        self.assertEqual((member.name, member.phone_e164), ("Renamed", "+919811111111"))
+
+
+class ProfileSyncTests(TestCase):
+    def setUp(self):
+        from members.services.profile_sync import reset_sync_stats
+        from profiles.models import PersonalDetail, UserProfile
+
+        self.user = User.objects.create_user(phone="9300000001", country_code="+91", password="123")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member = Member.objects.create(
+                name="Asha", gender=MemberGender.FEMALE, mobile=self.user.phone, user=self.user
+            )
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.personal = PersonalDetail.objects.get(profile=self.profile)
+        reset_sync_stats()
+
+    def test_member_save_reaches_profile_once_on_commit(self):
+        from members.services.profile_sync import QueuedSave, sync_stats
+
+        self.assertEqual((self.personal.full_name, self.personal.phone), ("Asha", "9300000001"))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.member.name = "Asha Suthar"
+            self.member.save(update_fields=["name"])
+            self.member.status = "active"
+            self.member.save(update_fields=["status"])
+        saves = [callback for callback in callbacks if isinstance(callback, QueuedSave)]
+        self.assertEqual(len(saves), 2)
+        self.assertEqual(len({save.batch for save in saves}), 1)
+
+        self.personal.refresh_from_db()
+        self.assertEqual((self.personal.full_name, self.personal.status), ("Asha Suthar", "active"))
+        self.assertEqual(sync_stats()["writes"], 1)
+        self.assertEqual(sync_stats()["coalesced"], 1)
+
+    def test_irrelevant_update_fields_skip_the_sync(self):
+        from members.services.profile_sync import sync_stats
+
+        father = Member.objects.create(name="Father", gender=MemberGender.MALE, mobile="9300000002")
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.member.father = father
+            self.member.save(update_fields=["father"])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(sync_stats()["skipped_irrelevant"], 1)
+        self.assertGreaterEqual(sync_stats()["writes_avoided"], 1)
+
+    def test_profile_saves_coalesce_and_last_side_wins(self):
+        from profiles.models import JobDetail
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.personal.full_name = "From Profile"
+            self.personal.email = "asha@example.com"
+            self.personal.save()
+            JobDetail.objects.create(profile=self.profile, occupation_type="Teacher")
+            self.member.name = "From Member"
+            self.member.save(update_fields=["name"])
+
+        self.member.refresh_from_db()
+        self.personal.refresh_from_db()
+        self.assertEqual(self.member.name, "From Member")
+        self.assertEqual(self.personal.full_name, "From Member")
+        self.assertEqual((self.member.email, self.member.occupation), ("asha@example.com", "Teacher"))
+
+    def test_later_save_in_a_nested_savepoint_wins(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.name = "FromMember"
+            self.member.save()
+            with transaction.atomic():
+                self.personal.full_name = "FromPersonal"
+                self.personal.save()
+
+        self.member.refresh_from_db()
+        self.personal.refresh_from_db()
+        self.assertEqual(self.member.name, "FromPersonal")
+        self.assertEqual(self.personal.full_name, "FromPersonal")
+
+    def test_rolled_back_savepoint_drops_its_queued_syncs(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.personal.full_name = "From Profile"
+            self.personal.save()
+            try:
+                with transaction.atomic():
+                    self.member.name = "Rolled Back"
+                    self.member.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.member.refresh_from_db()
+        self.personal.refresh_from_db()
+        self.assertEqual(self.member.name, "From Profile")
+        self.assertEqual(self.personal.full_name, "From Profile")
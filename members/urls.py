@@ -3,6 +3,7 @@ from .views import (
     MemberListView,
     ApproveMemberView,
     FamilyHeadAddMember,
+    FamilyHeadBulkAddMembers,
     FamilyHeadUpdateMember,
     FamilyHeadDeleteMember,
     MyFamilyMembers,
@@ -17,6 +18,7 @@ urlpatterns = [
     path('all/', MemberListView.as_view()),             # Admin
     path('accept-reject/<int:pk>/', ApproveMemberView.as_view()),  # Admin
     path('add/', FamilyHeadAddMember.as_view()),       # Family head
+    path('add/bulk/', FamilyHeadBulkAddMembers.as_view()),  # Family head, many at once
     path( 'update/<int:member_id>/', FamilyHeadUpdateMember.as_view(), name='family-head-update-member'),
     path( 'delete/<int:member_id>/', FamilyHeadDeleteMember.as_view(), name='family-head-delete-member'),
     path('my-family/', MyFamilyMembers.as_view()),      # Logged user
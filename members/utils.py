@@ -1,41 +1,119 @@
+from collections import defaultdict
+
 from django.db import transaction
-from members.models import Member, MemberGender, MemberRole, Family
+from django.db.models import F
+from django.utils import timezone
+from members.models import Member, MemberGender, MemberRole, Family, KinshipLine
+from members.services.kinship import ancestors_of, relink_lineage
+
+
+# Member fields the healer reads; writing any of them makes the family dirty
+HEAL_INPUT_FIELDS = {"father", "mother", "spouse", "family", "relation", "role", "gender"}
+
+
+def mark_families_dirty(family_ids):
+    """Flags families as needing a heal by bumping their relations version."""
+    family_ids = {f for f in family_ids if f}
+    if family_ids:
+        Family.objects.filter(id__in=family_ids).update(
+            relations_version=F("relations_version") + 1,
+            relations_changed_at=timezone.now(),
+        )
+
+
+def heal_family_if_dirty(family: Family | int | None) -> int:
+    """
+    Heals the family only when relation fields were written since the last
+    heal. Clean families cost a single read and no write.
+    Returns the number of members that were healed.
+    """
+    if not family:
+        return 0
 
+    family_id = family.id if isinstance(family, Family) else family
+    versions = Family.objects.filter(id=family_id).values_list("relations_version", "healed_version").first()
+    if not versions or versions[0] == versions[1]:
+        return 0
+    return heal_family_relations(family_id)
 
-def heal_family_relations(family: Family | int | None):
+
+def heal_family_relations(family: Family | int | None) -> int:
     """
     Analyzes all members in a family and automatically infers & heals missing
     father, mother, spouse, and child relationships in the database based on
     their roles and relations.
+    Returns the number of members that were healed.
     """
     if not family:
-        return
+        return 0
 
     family_id = family.id if isinstance(family, Family) else family
+    family_state = Family.objects.filter(id=family_id).values_list("relations_version", "head_id").first()
+    if not family_state:
+        return 0
+    version, head_user_id = family_state
+
     members = list(Member.objects.filter(family_id=family_id))
-    if not members:
+    parents_before = {m.id: (m.father_id, m.mother_id) for m in members}
+    dirty_members = heal_members(members, head_user_id)
+
+    with transaction.atomic():
+        save_healed_members(dirty_members, parents_before)
+        mark_families_healed({family_id: version})
+
+    return len(dirty_members)
+
+
+def save_healed_members(dirty_members: list, parents_before: dict):
+    """
+    Writes healed members with one bulk_update and relinks the kinship
+    closure for those whose parents changed. bulk_update sends no signals,
+    so the healer's own writes do not flag the family dirty again.
+    """
+    if not dirty_members:
         return
+    Member.objects.bulk_update(dirty_members, ["father", "mother", "spouse"], batch_size=500)
+    relink_lineage(
+        m.id for m in dirty_members if (m.father_id, m.mother_id) != parents_before[m.id]
+    )
+
+
+def mark_families_healed(versions: dict):
+    """Stamps {family_id: relations_version read before healing} as healed."""
+    by_version = defaultdict(list)
+    for family_id, version in versions.items():
+        by_version[version].append(family_id)
+    for version, family_ids in by_version.items():
+        Family.objects.filter(id__in=family_ids, healed_version__lt=version).update(healed_version=version)
+
+
+def heal_members(members: list, head_user_id: int | None = None) -> list:
+    """
+    In-memory healing pass over one family's members. Only reads and writes
+    the id columns (father_id, mother_id, spouse_id), so it works on Member
+    instances as well as on lightweight row objects with the same attributes.
+    Returns the members that were modified.
+
+    Runs in time linear in the family size: children and spouses are looked
+    up through indexes instead of rescanning the family per member.
+    """
+    if not members:
+        return []
 
     # 1. Identify Family Head
     head = next((m for m in members if m.role == MemberRole.FAMILY_HEAD), None)
-    if not head:
-        head_user_id = None
-        if isinstance(family, Family) and family.head_id:
-            head_user_id = family.head_id
-        else:
-            fam_obj = Family.objects.filter(id=family_id).first()
-            if fam_obj:
-                head_user_id = fam_obj.head_id
-
-        if head_user_id:
-            head = next((m for m in members if m.user_id == head_user_id), None)
+    if not head and head_user_id:
+        head = next((m for m in members if m.user_id == head_user_id), None)
 
-    if not head and members:
+    if not head:
         head = members[0]
 
     # Map members by ID for quick access
     member_map = {m.id: m for m in members}
-    dirty_members = set()
+    dirty_members = {}
+
+    def mark(m):
+        dirty_members[m.id] = m
 
     # 2. Categorize relations relative to Head
     spouse = None
@@ -82,111 +160,123 @@ def heal_family_relations(family: Family | int | None):
     # 3. Heal Head & Spouse
     if spouse:
         if head.spouse_id != spouse.id:
-            head.spouse = spouse
-            dirty_members.add(head)
+            head.spouse_id = spouse.id
+            mark(head)
         if spouse.spouse_id != head.id:
-            spouse.spouse = head
-            dirty_members.add(spouse)
+            spouse.spouse_id = head.id
+            mark(spouse)
 
     # 4. Heal Head & Parents
     if father:
         if head.father_id != father.id:
-            head.father = father
-            dirty_members.add(head)
+            head.father_id = father.id
+            mark(head)
     if mother:
         if head.mother_id != mother.id:
-            head.mother = mother
-            dirty_members.add(head)
+            head.mother_id = mother.id
+            mark(head)
     if father and mother:
         if father.spouse_id != mother.id:
-            father.spouse = mother
-            dirty_members.add(father)
+            father.spouse_id = mother.id
+            mark(father)
         if mother.spouse_id != father.id:
-            mother.spouse = father
-            dirty_members.add(mother)
+            mother.spouse_id = father.id
+            mark(mother)
 
     # 5. Heal Grandparents
     if grandfather and father:
         if father.father_id != grandfather.id:
-            father.father = grandfather
-            dirty_members.add(father)
+            father.father_id = grandfather.id
+            mark(father)
     if grandmother and father:
         if father.mother_id != grandmother.id:
-            father.mother = grandmother
-            dirty_members.add(father)
+            father.mother_id = grandmother.id
+            mark(father)
     if grandfather and grandmother:
         if grandfather.spouse_id != grandmother.id:
-            grandfather.spouse = grandmother
-            dirty_members.add(grandfather)
+            grandfather.spouse_id = grandmother.id
+            mark(grandfather)
         if grandmother.spouse_id != grandfather.id:
-            grandmother.spouse = grandfather
-            dirty_members.add(grandmother)
+            grandmother.spouse_id = grandfather.id
+            mark(grandmother)
 
     # 6. Heal Siblings (Brothers and Sisters of Head)
-    effective_father = father or head.father
-    effective_mother = mother or head.mother
+    effective_father_id = father.id if father else head.father_id
+    effective_mother_id = mother.id if mother else head.mother_id
     for sib in brothers + sisters:
-        if effective_father and sib.father_id != effective_father.id:
-            sib.father = effective_father
-            dirty_members.add(sib)
-        if effective_mother and sib.mother_id != effective_mother.id:
-            sib.mother = effective_mother
-            dirty_members.add(sib)
+        if effective_father_id and sib.father_id != effective_father_id:
+            sib.father_id = effective_father_id
+            mark(sib)
+        if effective_mother_id and sib.mother_id != effective_mother_id:
+            sib.mother_id = effective_mother_id
+            mark(sib)
 
     # 7. Heal Children (Sons and Daughters of Head)
-    effective_spouse = spouse or head.spouse
-    children = sons + daughters
-    for child in children:
+    effective_spouse_id = spouse.id if spouse else head.spouse_id
+    for child in sons + daughters:
         if head.gender == MemberGender.FEMALE:
             if child.mother_id != head.id:
-                child.mother = head
-                dirty_members.add(child)
-            if effective_spouse and child.father_id != effective_spouse.id:
-                child.father = effective_spouse
-                dirty_members.add(child)
+                child.mother_id = head.id
+                mark(child)
+            if effective_spouse_id and child.father_id != effective_spouse_id:
+                child.father_id = effective_spouse_id
+                mark(child)
         else:
             if child.father_id != head.id:
-                child.father = head
-                dirty_members.add(child)
-            if effective_spouse and child.mother_id != effective_spouse.id:
-                child.mother = effective_spouse
-                dirty_members.add(child)
+                child.father_id = head.id
+                mark(child)
+            if effective_spouse_id and child.mother_id != effective_spouse_id:
+                child.mother_id = effective_spouse_id
+                mark(child)
 
     # 8. Heal Uncle & Bua
     for u in uncles + buas:
         if grandfather and u.father_id != grandfather.id:
-            u.father = grandfather
-            dirty_members.add(u)
+            u.father_id = grandfather.id
+            mark(u)
         if grandmother and u.mother_id != grandmother.id:
-            u.mother = grandmother
-            dirty_members.add(u)
+            u.mother_id = grandmother.id
+            mark(u)
 
     # 9. Cross-heal Spouses & Children across all members
+    children_by_father = defaultdict(dict)
+    children_by_mother = defaultdict(dict)
+    for child in members:
+        if child.father_id:
+            children_by_father[child.father_id][child.id] = child
+        if child.mother_id:
+            children_by_mother[child.mother_id][child.id] = child
+
     for m in members:
         # If member has a spouse and children
-        if m.spouse_id and m.spouse_id in member_map:
-            sp = member_map[m.spouse_id]
-            if sp.spouse_id != m.id:
-                sp.spouse = m
-                dirty_members.add(sp)
-
-            # Any child having m as father should have sp as mother (if sp is female)
-            if m.gender == MemberGender.MALE or sp.gender == MemberGender.FEMALE:
-                father_m = m if m.gender == MemberGender.MALE else sp
-                mother_m = sp if sp.gender == MemberGender.FEMALE else m
-                for child in members:
-                    if child.father_id == father_m.id and child.mother_id != mother_m.id:
-                        child.mother = mother_m
-                        dirty_members.add(child)
-                    elif child.mother_id == mother_m.id and child.father_id != father_m.id:
-                        child.father = father_m
-                        dirty_members.add(child)
-
-    # 10. Save all modified members atomically
-    if dirty_members:
-        with transaction.atomic():
-            for m in dirty_members:
-                m.save(update_fields=["father", "mother", "spouse"])
+        if not (m.spouse_id and m.spouse_id in member_map):
+            continue
+
+        sp = member_map[m.spouse_id]
+        if sp.spouse_id != m.id:
+            sp.spouse_id = m.id
+            mark(sp)
+
+        # Any child having m as father should have sp as mother (if sp is female)
+        if m.gender == MemberGender.MALE or sp.gender == MemberGender.FEMALE:
+            father_m = m if m.gender == MemberGender.MALE else sp
+            mother_m = sp if sp.gender == MemberGender.FEMALE else m
+
+            for child in list(children_by_father[father_m.id].values()):
+                if child.mother_id != mother_m.id:
+                    children_by_mother[child.mother_id].pop(child.id, None)
+                    children_by_mother[mother_m.id][child.id] = child
+                    child.mother_id = mother_m.id
+                    mark(child)
+
+            for child in list(children_by_mother[mother_m.id].values()):
+                if child.father_id != father_m.id:
+                    children_by_father[child.father_id].pop(child.id, None)
+                    children_by_father[father_m.id][child.id] = child
+                    child.father_id = father_m.id
+                    mark(child)
+
+    return list(dirty_members.values())
 
 
 def get_relationship(viewer: Member, target: Member) -> str:
@@ -195,10 +285,69 @@ def get_relationship(viewer: Member, target: Member) -> str:
     Returns strings like 'Father', 'Mother', 'Son', 'Daughter', 'Brother', 'Sister',
     'Husband', 'Wife', 'Grandfather', 'Grandmother', 'Grandson', 'Granddaughter',
     'Uncle', 'Bua', 'Nephew', 'Niece', etc.
+
+    Extended relations are answered from the kinship closure table with a
+    single indexed lookup instead of walking father/mother objects.
     """
     if not viewer or not target:
         return "Unknown"
 
+    ancestry = {}
+
+    def ancestors(member_id):
+        if not ancestry:
+            ancestry.update(ancestors_of([viewer.id, target.id, viewer.spouse_id], max_depth=2))
+        return ancestry.get(member_id, {})
+
+    return relationship_label(viewer, target, ancestors)
+
+
+def resolve_relationships(root: Member, members) -> dict:
+    """
+    Labels every member relative to `root` in a single pass.
+
+    Builds an in-memory id → (father, mother, spouse, gender) index from the
+    rows already loaded, so no queries are issued. `members` should be
+    closed under parent links (as a family tree is) for grandparent, uncle
+    and nephew labels to resolve.
+    """
+    index = {m.id: m for m in members}
+    index.setdefault(root.id, root)
+    cache = {}
+
+    def ancestors(member_id):
+        if member_id in cache:
+            return cache[member_id]
+
+        rows = {}
+        member = index.get(member_id)
+        if member:
+            lines = ((member.father_id, KinshipLine.PATERNAL), (member.mother_id, KinshipLine.MATERNAL))
+            for parent_id, line in lines:
+                if parent_id:
+                    rows.setdefault(parent_id, (1, line))
+            for parent_id, line in lines:
+                parent = index.get(parent_id)
+                if parent:
+                    for grandparent_id in (parent.father_id, parent.mother_id):
+                        if grandparent_id:
+                            rows.setdefault(grandparent_id, (2, line))
+
+        cache[member_id] = rows
+        return rows
+
+    return {m.id: relationship_label(root, m, ancestors) for m in members}
+
+
+def relationship_label(viewer, target, ancestors) -> str:
+    """
+    Relationship rules shared by the single and batch resolvers.
+
+    `viewer` / `target` only need id, gender, relation, father_id, mother_id
+    and spouse_id. `ancestors(member_id)` must return
+    {ancestor_id: (depth, line)} up to depth 2 for the viewer, the target
+    and the viewer's spouse; it is only called for extended relations.
+    """
     if viewer.id == target.id:
         return "Self"
 
@@ -230,75 +379,45 @@ def get_relationship(viewer: Member, target: Member) -> str:
     # 4. Siblings (Sharing at least one parent or marked as brother/sister)
     share_father = (viewer.father_id is not None and viewer.father_id == target.father_id)
     share_mother = (viewer.mother_id is not None and viewer.mother_id == target.mother_id)
-    
+
     if share_father or share_mother:
         return gender_label("Brother", "Sister", "Sibling")
 
+    viewer_ancestors = ancestors(viewer.id)
+    target_ancestors = ancestors(target.id)
+
+    def at_depth(rows, depth, line=None):
+        return {
+            ancestor_id
+            for ancestor_id, (d, l) in rows.items()
+            if d == depth and (line is None or l == line)
+        }
+
     # 5. Grandparents
-    if viewer.father_id:
-        viewer_father = viewer.father
-        if viewer_father:
-            if viewer_father.father_id == target.id:
-                return "Grandfather"
-            if viewer_father.mother_id == target.id:
-                return "Grandmother"
-            
-    if viewer.mother_id:
-        viewer_mother = viewer.mother
-        if viewer_mother:
-            if viewer_mother.father_id == target.id:
-                return "Grandfather"
-            if viewer_mother.mother_id == target.id:
-                return "Grandmother"
+    if target.id in at_depth(viewer_ancestors, 2):
+        return gender_label("Grandfather", "Grandmother", "Grandparent")
 
     # 6. Grandchildren
-    if target.father_id:
-        target_father = target.father
-        if target_father and (target_father.father_id == viewer.id or target_father.mother_id == viewer.id):
-            return gender_label("Grandson", "Granddaughter", "Grandchild")
-            
-    if target.mother_id:
-        target_mother = target.mother
-        if target_mother and (target_mother.father_id == viewer.id or target_mother.mother_id == viewer.id):
-            return gender_label("Grandson", "Granddaughter", "Grandchild")
+    if viewer.id in at_depth(target_ancestors, 2):
+        return gender_label("Grandson", "Granddaughter", "Grandchild")
 
     # 7. Uncle & Aunt (Father's or Mother's siblings)
-    if viewer.father_id and viewer.father:
-        vf = viewer.father
-        vf_share_father = (vf.father_id is not None and vf.father_id == target.father_id)
-        vf_share_mother = (vf.mother_id is not None and vf.mother_id == target.mother_id)
-        if vf_share_father or vf_share_mother:
-            return "Uncle" if is_male else ("Bua" if is_female else "Uncle/Aunt")
-
-    if viewer.mother_id and viewer.mother:
-        vm = viewer.mother
-        vm_share_father = (vm.father_id is not None and vm.father_id == target.father_id)
-        vm_share_mother = (vm.mother_id is not None and vm.mother_id == target.mother_id)
-        if vm_share_father or vm_share_mother:
-            return "Uncle" if is_male else "Aunt"
+    target_parents = {target.father_id, target.mother_id} - {None}
+    if target_parents & at_depth(viewer_ancestors, 2, KinshipLine.PATERNAL):
+        return "Uncle" if is_male else ("Bua" if is_female else "Uncle/Aunt")
+    if target_parents & at_depth(viewer_ancestors, 2, KinshipLine.MATERNAL):
+        return "Uncle" if is_male else "Aunt"
 
     # 8. Nephew & Niece (Sibling's children)
-    if target.father_id and target.father:
-        tf = target.father
-        tf_share_father = (viewer.father_id is not None and viewer.father_id == tf.father_id)
-        tf_share_mother = (viewer.mother_id is not None and viewer.mother_id == tf.mother_id)
-        if tf_share_father or tf_share_mother:
-            return gender_label("Nephew", "Niece", "Nephew/Niece")
-
-    if target.mother_id and target.mother:
-        tm = target.mother
-        tm_share_father = (viewer.father_id is not None and viewer.father_id == tm.father_id)
-        tm_share_mother = (viewer.mother_id is not None and viewer.mother_id == tm.mother_id)
-        if tm_share_father or tm_share_mother:
-            return gender_label("Nephew", "Niece", "Nephew/Niece")
+    viewer_parents = {viewer.father_id, viewer.mother_id} - {None}
+    if viewer_parents & at_depth(target_ancestors, 2):
+        return gender_label("Nephew", "Niece", "Nephew/Niece")
 
     # 9. In-laws (Spouse's parents)
-    if viewer.spouse_id and viewer.spouse:
-        vs = viewer.spouse
-        if vs.father_id == target.id:
-            return "Father-in-law"
-        if vs.mother_id == target.id:
-            return "Mother-in-law"
+    if viewer.spouse_id:
+        spouse_parent = ancestors(viewer.spouse_id).get(target.id)
+        if spouse_parent and spouse_parent[0] == 1:
+            return "Father-in-law" if spouse_parent[1] == KinshipLine.PATERNAL else "Mother-in-law"
 
     # Fallback to the stored relation
     if target.relation:
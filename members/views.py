@@ -6,6 +6,7 @@ from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
@@ -13,53 +14,49 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from members.signals import sync_member_to_profile_helper
-from notifications.models import Notification
-from django.db.models import Q
+from notifications.dispatch import enqueue_notification
 from .models import Member, Family, MemberRole, MemberStatus, Community, RelationshipRequest, RelationshipRequestStatus, MemberRelation
 from .serializers import (
+    MemberImportRowSerializer,
+    MemberReadSerializer,
     MemberSerializer,
     MemberCreateSerializer,
     MemberProfileUpdateSerializer,
 )
+from .mixins import RequestingMemberMixin
+from .pagination import CreatedAtCursorPagination
+from .phone import DEFAULT_COUNTRY_CODE, normalize_phone
+from .search import SEARCH_FILTERS, search_members
+from .services.importer import MemberImportError, import_family_members
+from .services.tree import collect_family_tree, build_tree_edges
+from .utils import heal_family_if_dirty, resolve_relationships
 
 
 # ============================================================
 # FAMILY HEAD → ADD MEMBER
 # ============================================================
-class FamilyHeadAddMember(APIView):
+class FamilyHeadAddMember(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
         request_body=MemberCreateSerializer,
-        responses={201: MemberSerializer},
+        responses={201: MemberReadSerializer},
     )
     @transaction.atomic
     def post(self, request):
-        user = request.user
-
         # 1️⃣ Verify Family Head
-        try:
-            head_member = Member.objects.get(user=user, role=MemberRole.FAMILY_HEAD)
-        except Member.DoesNotExist:
+        # 2️⃣ Ensure Family exists (resolved once per request)
+        head_member, family = self.get_family_head_context()
+        if not head_member:
             return Response(
                 {"success": False, "message": "Unauthorized"},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # 2️⃣ Ensure Family exists
-        family, _ = Family.objects.get_or_create(head=user)
-        if head_member.family_id != family.id:
-            head_member.family = family
-            head_member.save(update_fields=["family"])
-
         # 3️⃣ Validate payload
         serializer = MemberCreateSerializer(
         data=request.data,
-        context={
-            "request": request,
-            "family": family,
-        }
+        context=self.get_member_serializer_context(family=family),
     )
         serializer.is_valid(raise_exception=True)
 
@@ -70,8 +67,11 @@ class FamilyHeadAddMember(APIView):
 
         # 5️⃣ Check mobile uniqueness across other families
         mobile = serializer.validated_data.get("mobile")
+        country_code = serializer.validated_data.get("country_code") or DEFAULT_COUNTRY_CODE
         if mobile:
-            duplicate = Member.objects.filter(mobile=mobile).exclude(family=family).exists()
+            duplicate = Member.objects.filter(
+                phone_e164=normalize_phone(mobile, country_code)
+            ).exclude(family=family).exists()
             if duplicate:
                 return Response(
                     {"success": False, "message": "This mobile is already registered under another family."},
@@ -81,12 +81,14 @@ class FamilyHeadAddMember(APIView):
         # 6️⃣ Optionally handle empty mobile (use Family Head's number)
         if not mobile:
             serializer.validated_data["mobile"] = head_member.mobile
+            country_code = head_member.country_code
+        serializer.validated_data["country_code"] = country_code
 
         # 7️⃣ Prevent duplicate mobile inside the same family
         existing_member_same_family = Member.objects.filter(
             family=family,
-            mobile=serializer.validated_data.get("mobile")
-        ).first()
+            phone_e164=normalize_phone(serializer.validated_data.get("mobile"), country_code)
+        ).exists()
         if existing_member_same_family:
             return Response(
                 {"success": False, "message": "This mobile is already used in your family."},
@@ -109,7 +111,7 @@ class FamilyHeadAddMember(APIView):
         return Response(
     {
         "success": True,
-        "member": MemberSerializer(
+        "member": MemberReadSerializer(
             member,
             context={"request": request}
         ).data,
@@ -119,32 +121,87 @@ class FamilyHeadAddMember(APIView):
 
 
 
+# ============================================================
+# FAMILY HEAD → BULK ADD MEMBERS
+# ============================================================
+class FamilyHeadBulkAddMembers(RequestingMemberMixin, APIView):
+    """
+    Adds many relatives in one request. Rows may reference each other
+    with "$ref:<index>" in father_id / mother_id / spouse_id.
+    """
+    permission_classes = [IsAuthenticated]
+    max_batch_size = 200
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["members"],
+            properties={"members": openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT))},
+        ),
+        responses={201: MemberReadSerializer(many=True)},
+    )
+    @transaction.atomic
+    def post(self, request):
+        # 1️⃣ Verify Family Head
+        head_member, family = self.get_family_head_context()
+        if not head_member:
+            return Response({"success": False, "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+
+        # 2️⃣ Validate payload
+        rows = request.data.get("members") if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response({"success": False, "message": "members must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_batch_size:
+            return Response(
+                {"success": False, "message": f"At most {self.max_batch_size} members per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = MemberImportRowSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response({"success": False, "message": "Invalid members", "errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 3️⃣ Import (set-based checks, bulk writes, one heal)
+        try:
+            members = import_family_members(
+                family,
+                serializer.validated_data,
+                creator=head_member,
+                defaults={"community": head_member.community or Community.SUTHAR},
+            )
+        except MemberImportError as exc:
+            return Response({"success": False, "message": "Import failed", "errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Re-read: healing may have filled in more links
+        created = Member.objects.filter(id__in=[m.id for m in members]).select_related("family").order_by("id")
+        return Response(
+            {
+                "success": True,
+                "count": len(members),
+                "members": MemberReadSerializer(created, many=True, context={"request": request}).data,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
 # ============================================================
 # FAMILY HEAD → UPDATE MEMBER
 # ============================================================
-class FamilyHeadUpdateMember(APIView):
+class FamilyHeadUpdateMember(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
         request_body=MemberProfileUpdateSerializer,
-        responses={200: MemberSerializer},
+        responses={200: MemberReadSerializer},
     )
     @transaction.atomic
     def put(self, request, member_id):
-        user = request.user
-
         # 1️⃣ Verify Family Head
-        try:
-            head_member = Member.objects.get(user=user, role=MemberRole.FAMILY_HEAD)
-        except Member.DoesNotExist:
+        # 2️⃣ Ensure Family exists (resolved once per request)
+        head_member, family = self.get_family_head_context()
+        if not head_member:
             return Response({"success": False, "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
-        # 2️⃣ Ensure Family exists
-        family, _ = Family.objects.get_or_create(head=user)
-        if head_member.family != family:
-            head_member.family = family
-            head_member.save(update_fields=["family"])
-
         # 3️⃣ Fetch member from same family
         member = get_object_or_404(Member, id=member_id, family=family)
 
@@ -155,44 +212,37 @@ class FamilyHeadUpdateMember(APIView):
 
         # 5️⃣ Prevent changing mobile to one used by another family member
         new_mobile = request.data.get("mobile")
-        if new_mobile and Member.objects.filter(mobile=new_mobile).exclude(id=member.id).exists():
+        new_phone = normalize_phone(new_mobile, request.data.get("country_code") or member.country_code)
+        if new_phone and Member.objects.filter(phone_e164=new_phone).exclude(id=member.id).exists():
             return Response(
                 {"success": False, "message": "This mobile number is already used by another member."},
                 status=status.HTTP_409_CONFLICT
             )
 
         # 6️⃣ Update member (serializer handles spouse linking)
-        serializer = MemberProfileUpdateSerializer(member, data=request.data, context={"request": request})
+        serializer = MemberProfileUpdateSerializer(member, data=request.data, context=self.get_member_serializer_context())
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
         return Response(
-            {"success": True, "data": MemberSerializer(member).data},
+            {"success": True, "data": MemberReadSerializer(member).data},
             status=status.HTTP_200_OK,
         )
 
 # ============================================================
 # FAMILY HEAD → DELETE MEMBER
 # ============================================================
-class FamilyHeadDeleteMember(APIView):
+class FamilyHeadDeleteMember(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @transaction.atomic
     def delete(self, request, member_id):
-        user = request.user
-
         # 1️⃣ Verify Family Head
-        try:
-            head_member = Member.objects.get(user=user, role=MemberRole.FAMILY_HEAD)
-        except Member.DoesNotExist:
+        # 2️⃣ Ensure Family exists (resolved once per request)
+        head_member, family = self.get_family_head_context()
+        if not head_member:
             return Response({"success": False, "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
-        # 2️⃣ Ensure Family exists
-        family, _ = Family.objects.get_or_create(head=user)
-        if head_member.family != family:
-            head_member.family = family
-            head_member.save(update_fields=["family"])
-
         # 3️⃣ Fetch member from same family
         member = get_object_or_404(Member, id=member_id, family=family)
 
@@ -212,21 +262,21 @@ class FamilyHeadDeleteMember(APIView):
 # ============================================================
 # MY FAMILY MEMBERS
 # ============================================================
-class MyFamilyMembers(APIView):
+class MyFamilyMembers(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        member = Member.objects.filter(user=request.user).first()
+        member = self.get_requesting_member()
 
         if not member or not member.family:
             return Response({"success": True, "familyMembers": []})
 
-        members = Member.objects.filter(family=member.family).select_related("user")
+        members = Member.objects.filter(family=member.family).select_related("family")
 
         return Response(
         {
             "success": True,
-            "familyMembers": MemberSerializer(
+            "familyMembers": MemberReadSerializer(
                 members,
                 many=True,
                 context={"request": request}  # ✅ REQUIRED
@@ -239,22 +289,49 @@ class MyFamilyMembers(APIView):
 # ============================================================
 # ADMIN → LIST MEMBERS
 # ============================================================
+class MemberListPagination(CreatedAtCursorPagination):
+    results_key = "familyMembers"
+
+
 class MemberListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = MemberSerializer
+    serializer_class = MemberReadSerializer
+    pagination_class = MemberListPagination
+
+    # query param → model lookup
+    filter_params = {
+        "status": "status",
+        "role": "role",
+        "community": "community",
+        "city": "city__iexact",
+        "family": "family_id",
+    }
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(name, openapi.IN_QUERY, type=openapi.TYPE_STRING)
+            for name in ("status", "role", "community", "city", "family", "cursor", "page_size", "include_count")
+        ],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Member.objects.select_related("user", "family").filter(user__isnull=False)
+        qs = Member.objects.select_related("family").filter(user__isnull=False)
 
-    def list(self, request, *args, **kwargs):
-        qs = self.get_queryset()
-        return Response(
-            {
-                "success": True,
-                "count": qs.count(),
-                "familyMembers": self.get_serializer(qs, many=True).data,
-            }
-        )
+        filters = {}
+        for param, lookup in self.filter_params.items():
+            value = self.request.query_params.get(param, "").strip()
+            if value:
+                filters[lookup] = value
+        try:
+            for key in ("community", "family_id"):
+                if key in filters:
+                    filters[key] = int(filters[key])
+        except ValueError:
+            raise ValidationError({"detail": "community and family must be numeric ids"})
+
+        return qs.filter(**filters)
 
 
 # ============================================================
@@ -285,20 +362,21 @@ class ApproveMemberView(APIView):
         member.status = status_value
         member.save(update_fields=["status"])
 
-        sync_member_to_profile_helper(member)
-            
-        Notification.objects.create(
-        user=member.user,          # 🔥 RECEIVER (approved user)
-        title="Membership Update",
-        message=(
-            "Your membership has been approved."
-            if status_value == MemberStatus.ACTIVE
-            else "Your membership has been rejected."
-        ),
-        type="approve" if status_value == MemberStatus.ACTIVE else "reject",
-        reference_id=member.id,
-        reference_type="member",
-        action_date=timezone.now(), )
+        # 🔔 Queued: stored and pushed by the notification worker
+        if member.user_id:
+            enqueue_notification(
+                user=member.user,          # 🔥 RECEIVER (approved user)
+                title="Membership Update",
+                message=(
+                    "Your membership has been approved."
+                    if status_value == MemberStatus.ACTIVE
+                    else "Your membership has been rejected."
+                ),
+                type="approve" if status_value == MemberStatus.ACTIVE else "reject",
+                reference_id=member.id,
+                reference_type="member",
+                action_date=timezone.now(),
+            )
 
 
         return Response(
@@ -328,79 +406,37 @@ class MemberDetailView(generics.RetrieveUpdateAPIView):
 # ============================================================
 # FAMILY TREE VIEW
 # ============================================================
-class FamilyTreeView(APIView):
+class FamilyTreeView(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk=None):
-        user = request.user
-        requesting_member = Member.objects.filter(user=user).first()
+        requesting_member = self.get_requesting_member()
         if not requesting_member:
             return Response({"success": False, "message": "Member not found"}, status=status.HTTP_404_NOT_FOUND)
 
         if pk:
-            from django.shortcuts import get_object_or_404
             root_member = get_object_or_404(Member, pk=pk)
             if requesting_member.family_id and root_member.family_id != requesting_member.family_id and not request.user.is_staff:
                 return Response({"success": False, "message": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
         else:
             root_member = requesting_member
 
-        from .utils import heal_family_relations
-        if root_member.family:
-            heal_family_relations(root_member.family)
+        # Writes heal their family; this only catches families left dirty
+        # by other paths, so a clean tree read issues no writes.
+        if root_member.family_id and heal_family_if_dirty(root_member.family_id):
             root_member.refresh_from_db()
 
-        from django.db.models import Q
-
-        # 1. Fetch all family members
-        if root_member.family:
-            family_members = list(Member.objects.filter(family=root_member.family))
-        else:
-            family_members = [root_member]
-
-        queue = list(family_members)
-        visited = set()
-        nodes_dict = {}
-
-        while queue:
-            current = queue.pop(0)
-            if current.id in visited:
-                continue
-            visited.add(current.id)
-            nodes_dict[current.id] = current
-
-            # 1. Spouse
-            if current.spouse_id:
-                if current.spouse_id not in visited and current.spouse:
-                    queue.append(current.spouse)
-
-            # 2. Parents
-            if current.father_id:
-                if current.father_id not in visited and current.father:
-                    queue.append(current.father)
-            
-            if current.mother_id:
-                if current.mother_id not in visited and current.mother:
-                    queue.append(current.mother)
-
-            # 3. Children
-            children = Member.objects.filter(Q(father=current) | Q(mother=current))
-            for child in children:
-                if child.id not in visited:
-                    queue.append(child)
-
-        edges = set() # (source, target, type)
-        for node in nodes_dict.values():
-            if node.spouse_id and node.spouse_id in nodes_dict:
-                s, t = (node.id, node.spouse_id) if node.id < node.spouse_id else (node.spouse_id, node.id)
-                edges.add((s, t, "spouse"))
-            if node.father_id and node.father_id in nodes_dict:
-                edges.add((node.father_id, node.id, "father"))
-            if node.mother_id and node.mother_id in nodes_dict:
-                edges.add((node.mother_id, node.id, "mother"))
-
-        formatted_edges = [{"source": s, "target": t, "type": edge_type} for s, t, edge_type in sorted(edges)]
-        serialized_nodes = MemberSerializer(list(nodes_dict.values()), many=True, context={'request': request, 'root_member': root_member}).data
+        nodes = collect_family_tree(root_member)
+        formatted_edges = build_tree_edges(nodes)
+        serialized_nodes = MemberReadSerializer(
+            nodes,
+            many=True,
+            context={
+                'request': request,
+                'root_member': root_member,
+                'relationships': resolve_relationships(root_member, nodes),
+            },
+        ).data
 
         return Response({
             "success": True,
@@ -421,39 +457,47 @@ class MemberSearchView(APIView):
         if not query:
             return Response({"success": True, "members": []})
 
-        members = Member.objects.filter(
-            Q(mobile__icontains=query) | Q(name__icontains=query)
-        ).exclude(user=request.user)[:20]
+        filters = {param: request.GET.get(param, '').strip() for param in SEARCH_FILTERS}
+        if filters["family"] and not filters["family"].isdigit():
+            return Response({"success": False, "message": "family must be a numeric id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        members = search_members(
+            query,
+            filters=filters,
+            queryset=Member.objects.exclude(user=request.user),
+        )
 
         return Response({
             "success": True,
-            "members": MemberSerializer(members, many=True, context={'request': request}).data
+            "members": MemberReadSerializer(members, many=True, context={'request': request}).data
         })
 
 # ============================================================
 # RELATIONSHIP REQUESTS
 # ============================================================
-class RelationshipRequestView(APIView):
+class RelationshipRequestView(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        member = Member.objects.filter(user=request.user).first()
+        member = self.get_requesting_member()
         if not member:
             return Response({"success": False, "message": "Member not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        requests = RelationshipRequest.objects.filter(receiver=member, status=RelationshipRequestStatus.PENDING)
+        requests = RelationshipRequest.objects.filter(
+            receiver=member, status=RelationshipRequestStatus.PENDING
+        ).select_related("sender")
         data = []
         for req in requests:
             data.append({
                 "id": req.id,
-                "sender": MemberSerializer(req.sender, context={'request': request}).data,
+                "sender": MemberReadSerializer(req.sender, context={'request': request}).data,
                 "proposed_relation": req.proposed_relation,
                 "created_at": req.created_at
             })
         return Response({"success": True, "requests": data})
 
     def post(self, request):
-        member = Member.objects.filter(user=request.user).first()
+        member = self.get_requesting_member()
         if not member:
             return Response({"success": False, "message": "Member not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -478,7 +522,7 @@ class RelationshipRequestView(APIView):
         )
 
         if receiver.user:
-            Notification.objects.create(
+            enqueue_notification(
                 user=receiver.user,
                 title="New Family Request",
                 message=f"{member.name} has added you as their {proposed_relation}. Please review.",
@@ -490,12 +534,12 @@ class RelationshipRequestView(APIView):
 
         return Response({"success": True, "message": "Request sent"})
 
-class RelationshipRequestRespondView(APIView):
+class RelationshipRequestRespondView(RequestingMemberMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @transaction.atomic
     def post(self, request, pk):
-        member = Member.objects.filter(user=request.user).first()
+        member = self.get_requesting_member()
         if not member:
             return Response({"success": False, "message": "Member not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -513,13 +557,15 @@ class RelationshipRequestRespondView(APIView):
             from .serializers import check_circular_dependency
             
             if relation == MemberRelation.FATHER:
-                if check_circular_dependency(sender.id, member.id):
-                    return Response({"success": False, "message": "Circular dependency detected"}, status=status.HTTP_400_BAD_REQUEST)
+                cycle = check_circular_dependency(sender.id, member.id)
+                if cycle:
+                    return Response({"success": False, "message": "Circular dependency detected", "path": cycle}, status=status.HTTP_400_BAD_REQUEST)
                 sender.father = member
                 sender.save()
             elif relation == MemberRelation.MOTHER:
-                if check_circular_dependency(sender.id, member.id):
-                    return Response({"success": False, "message": "Circular dependency detected"}, status=status.HTTP_400_BAD_REQUEST)
+                cycle = check_circular_dependency(sender.id, member.id)
+                if cycle:
+                    return Response({"success": False, "message": "Circular dependency detected", "path": cycle}, status=status.HTTP_400_BAD_REQUEST)
                 sender.mother = member
                 sender.save()
             elif relation == MemberRelation.SPOUSE:
@@ -529,8 +575,9 @@ class RelationshipRequestRespondView(APIView):
                 except Exception as e:
                     return Response({"success": False, "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             elif relation == MemberRelation.SON or relation == MemberRelation.DAUGHTER:
-                if check_circular_dependency(member.id, sender.id):
-                    return Response({"success": False, "message": "Circular dependency detected"}, status=status.HTTP_400_BAD_REQUEST)
+                cycle = check_circular_dependency(member.id, sender.id)
+                if cycle:
+                    return Response({"success": False, "message": "Circular dependency detected", "path": cycle}, status=status.HTTP_400_BAD_REQUEST)
                 if sender.gender == 'female':
                     member.mother = sender
                 else:
@@ -538,7 +585,7 @@ class RelationshipRequestRespondView(APIView):
                 member.save()
 
             if sender.user:
-                Notification.objects.create(
+                enqueue_notification(
                     user=sender.user,
                     title="Family Request Accepted",
                     message=f"{member.name} accepted your family request.",
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationJob
 
 
 @admin.register(Notification)
@@ -36,3 +36,33 @@ class NotificationAdmin(admin.ModelAdmin):
 
     date_hierarchy = "created_at"  # ✅ top date navigation
 
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "title",
+        "type",
+        "status",
+        "attempts",
+        "available_at",
+        "created_at",
+    )
+
+    list_filter = (
+        "status",
+        "type",
+    )
+
+    search_fields = (
+        "title",
+        "user__phone",
+    )
+
+    ordering = ("-id",)
+
+    readonly_fields = (
+        "notification", "after_user_id", "up_to_user_id", "locked_by", "locked_at",
+        "retry_tokens", "last_error", "created_at", "updated_at",
+    )
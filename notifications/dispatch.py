@@ -0,0 +1,304 @@
+"""
+Notification dispatch queue.
+
+Views call enqueue_notification(), which only inserts a NotificationJob
+inside the request's transaction, so request latency does not depend on
+how many users a notification reaches. The worker (run_notification_worker)
+claims due jobs in batches and for each batch:
+
+1. stores the Notification rows with one bulk insert,
+2. splits each broadcast into delivery jobs of BROADCAST_PAGE users
+   (keyset ranges over User.id), queued for any worker,
+3. pushes the rest with one message per token (several notifications for
+   the same token are folded into one), sent in transport-sized chunks,
+   renewing its claim after each chunk,
+4. retries tokens that failed transiently with exponential backoff and
+   clears tokens the transport reports as dead.
+"""
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+
+from .models import Notification, NotificationJob
+from .push import PushMessage, PushResult, get_transport
+from .services import adjust_unread_count
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30            # seconds before the first retry, doubled after each
+BACKOFF_MAX = 60 * 60
+LOCK_TIMEOUT = 10 * 60       # a job claimed longer ago than this is claimed again
+BROADCAST_PAGE = 1000        # users per broadcast delivery job
+KEEP_FINISHED = timedelta(days=7)
+
+NOTIFICATION_FIELDS = ("user_id", "title", "message", "type", "reference_id", "reference_type", "action_date")
+
+
+def enqueue_notification(*, title, message, type, user=None, reference_id=None, reference_type=None, action_date=None):
+    """Queues a notification; same rules as Notification.save."""
+    if type in Notification.PUBLIC_TYPES:
+        user = None
+    elif user is None:
+        raise ValueError("User is required for approve/reject notifications")
+
+    return NotificationJob.objects.create(
+        user=user,
+        title=title,
+        message=message,
+        type=type,
+        reference_id=reference_id,
+        reference_type=reference_type,
+        action_date=action_date,
+    )
+
+
+def backoff(attempts) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX))
+
+
+# -------------------------------------------------
+# WORKER
+# -------------------------------------------------
+def process_jobs(batch_size=100, transport=None) -> Counter:
+    """Claims and processes one batch of due jobs. Returns counts by outcome."""
+    counts = Counter()
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return counts
+    counts["claimed"] = len(jobs)
+
+    try:
+        store_notifications(jobs)
+        jobs = split_broadcasts(jobs, counts)
+    except Exception as e:
+        # Nothing pushed yet: the whole batch comes back later
+        finish_jobs(jobs, {job.id: None for job in jobs}, {job.id: str(e) for job in jobs}, counts)
+        return counts
+
+    if not jobs:
+        return counts
+    retry, errors = push_notifications(jobs, transport or get_transport(), counts)
+    finish_jobs(jobs, retry, errors, counts)
+    return counts
+
+
+def claim_jobs(batch_size) -> list[NotificationJob]:
+    """
+    Marks up to `batch_size` due jobs as ours. The UPDATE re-checks the
+    due condition, so two workers never claim the same job.
+    """
+    now = timezone.now()
+    worker = uuid.uuid4().hex
+    due = Q(status=NotificationJob.PENDING, available_at__lte=now) | Q(
+        status=NotificationJob.PROCESSING, locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT)
+    )
+
+    ids = list(NotificationJob.objects.filter(due).order_by("id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    NotificationJob.objects.filter(due, id__in=ids).update(
+        status=NotificationJob.PROCESSING, locked_by=worker, locked_at=now
+    )
+    return list(NotificationJob.objects.filter(locked_by=worker, status=NotificationJob.PROCESSING).order_by("id"))
+
+
+def store_notifications(jobs):
+    """Creates the Notification of every job that has none yet, in one insert."""
+    new = [job for job in jobs if job.notification_id is None]
+    if not new:
+        return
+
+    with transaction.atomic():
+        rows = Notification.objects.bulk_create(
+            [Notification(**{field: getattr(job, field) for field in NOTIFICATION_FIELDS}) for job in new]
+        )
+        for job, row in zip(new, rows):
+            job.notification = row
+        NotificationJob.objects.bulk_update(new, ["notification"])
+
+        # bulk_create sends no post_save: maintain the unread counters here,
+        # in the shared cache the web processes read (broadcasts are caught
+        # up by every counter on its next read)
+        for user_id, created in Counter(row.user_id for row in rows if row.user_id).items():
+            adjust_unread_count(user_id, created)
+
+
+def split_broadcasts(jobs, counts) -> list[NotificationJob]:
+    """
+    Replaces every stored broadcast of the batch by one delivery job per
+    BROADCAST_PAGE users with a push token, so no claim sends to everyone
+    and failed tokens are kept per page. Returns the jobs left to push.
+    """
+    broadcasts = [
+        job for job in jobs
+        if job.user_id is None and job.after_user_id is None and job.retry_tokens is None
+    ]
+    if not broadcasts:
+        return jobs
+
+    ranges = user_ranges()
+    now = timezone.now()
+    with transaction.atomic():
+        NotificationJob.objects.bulk_create([
+            NotificationJob(
+                **{field: getattr(job, field) for field in NOTIFICATION_FIELDS},
+                notification_id=job.notification_id,
+                after_user_id=after_id,
+                up_to_user_id=up_to_id,
+            )
+            for job in broadcasts
+            for after_id, up_to_id in ranges
+        ])
+        for job in broadcasts:
+            job.status = NotificationJob.DONE
+            job.locked_by = ""
+            job.locked_at = None
+            job.updated_at = now  # bulk_update skips auto_now
+        NotificationJob.objects.bulk_update(broadcasts, ["status", "locked_by", "locked_at", "updated_at"])
+
+    counts["split"] += len(broadcasts)
+    split = {job.id for job in broadcasts}
+    return [job for job in jobs if job.id not in split]
+
+
+def user_ranges() -> list[tuple[int, int]]:
+    """(after_id, up_to_id) of consecutive pages of users with a push token."""
+    ranges = []
+    after_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(fcm_token__gt="", id__gt=after_id)
+            .order_by("id").values_list("id", flat=True)[:BROADCAST_PAGE]
+        )
+        if not ids:
+            return ranges
+        ranges.append((after_id, ids[-1]))
+        after_id = ids[-1]
+
+
+def push_notifications(jobs, transport, counts):
+    """
+    Sends the batch: one message per token. Returns the tokens to retry
+    and the last error per job id.
+    """
+    personal = dict(
+        User.objects.filter(id__in={job.user_id for job in jobs if job.user_id}, fcm_token__gt="")
+        .values_list("id", "fcm_token")
+    )
+    pages = {}
+
+    jobs_by_token = defaultdict(list)
+    for job in jobs:
+        if job.retry_tokens is not None:
+            tokens = job.retry_tokens
+        elif job.user_id:
+            tokens = [personal[job.user_id]] if job.user_id in personal else []
+        else:
+            page = (job.after_user_id, job.up_to_user_id)
+            if page not in pages:
+                pages[page] = list(
+                    User.objects.filter(fcm_token__gt="", id__gt=page[0], id__lte=page[1])
+                    .values_list("fcm_token", flat=True).distinct()
+                )
+            tokens = pages[page]
+        for token in tokens:
+            jobs_by_token[token].append(job)
+
+    messages = [build_message(token, token_jobs) for token, token_jobs in jobs_by_token.items()]
+
+    retry = defaultdict(set)
+    errors = {}
+    dead = set()
+    for start in range(0, len(messages), transport.batch_size):
+        chunk = messages[start:start + transport.batch_size]
+        try:
+            results = transport.send(chunk)
+        except Exception as e:
+            results = [PushResult(message.token, False, retry=True, error=str(e)) for message in chunk]
+
+        for result in results:
+            if result.ok:
+                counts["pushed"] += 1
+            elif result.retry:
+                for job in jobs_by_token[result.token]:
+                    retry[job.id].add(result.token)
+                    errors[job.id] = result.error
+            else:
+                dead.add(result.token)
+
+        if start + transport.batch_size < len(messages):
+            renew_claim(jobs)
+
+    if dead:
+        counts["dead_tokens"] += User.objects.filter(fcm_token__in=dead).update(fcm_token=None)
+    return retry, errors
+
+
+def renew_claim(jobs):
+    """Pushes locked_at forward so a long send is not claimed again after LOCK_TIMEOUT."""
+    NotificationJob.objects.filter(id__in=[job.id for job in jobs], locked_by=jobs[0].locked_by).update(
+        locked_at=timezone.now()
+    )
+
+
+def build_message(token, jobs) -> PushMessage:
+    if len(jobs) == 1:
+        job = jobs[0]
+        return PushMessage(token, job.title, job.message, {
+            "notification_id": str(job.notification_id),
+            "type": job.type,
+            "reference_id": str(job.reference_id or ""),
+            "reference_type": job.reference_type or "",
+        })
+
+    latest = jobs[-1]
+    return PushMessage(token, f"{len(jobs)} new notifications", latest.title, {
+        "notification_ids": ",".join(str(job.notification_id) for job in jobs),
+        "type": latest.type,
+    })
+
+
+def finish_jobs(jobs, retry, errors, counts):
+    """
+    Done, or back to pending with backoff (failed after MAX_ATTEMPTS).
+    `retry` maps job ids to their failed tokens; None retries the job whole.
+    """
+    now = timezone.now()
+    for job in jobs:
+        job.locked_by = ""
+        job.locked_at = None
+        job.updated_at = now  # bulk_update skips auto_now
+        if job.id not in retry:
+            job.status = NotificationJob.DONE
+            job.retry_tokens = None
+            job.last_error = ""
+            counts["done"] += 1
+            continue
+
+        tokens = retry[job.id]
+        job.attempts += 1
+        job.retry_tokens = sorted(tokens) if tokens is not None else None
+        job.last_error = errors.get(job.id, "")
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = NotificationJob.FAILED
+            counts["failed"] += 1
+        else:
+            job.status = NotificationJob.PENDING
+            job.available_at = now + backoff(job.attempts)
+            counts["retried"] += 1
+
+    NotificationJob.objects.bulk_update(
+        jobs, ["status", "attempts", "available_at", "locked_by", "locked_at", "retry_tokens", "last_error", "updated_at"]
+    )
+
+
+def purge_finished_jobs() -> int:
+    deleted, _ = NotificationJob.objects.filter(
+        status=NotificationJob.DONE, updated_at__lt=timezone.now() - KEEP_FINISHED
+    ).delete()
+    return deleted
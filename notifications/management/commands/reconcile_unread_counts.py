@@ -0,0 +1,115 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from notifications.models import Notification, NotificationReadCursor, NotificationReceipt, NotificationTypeReadCursor
+from notifications.services import (
+    UNREAD_COUNT_CACHE_KEY,
+    UNREAD_STATE_CACHE_KEY,
+    UNREAD_COUNT_TIMEOUT,
+    broadcast_epoch,
+)
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Recompute cached unread notification counters and repair the ones that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Users counted and compared per chunk (default: 1000)",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Also cache counters for users that have none",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(options["chunk_size"], 1)
+
+        # Broadcast ids once; per user only the part above the cursors counts
+        broadcasts = list(
+            Notification.objects.filter(user__isnull=True).order_by("id").values_list("id", "type")
+        )
+        latest = broadcasts[-1][0] if broadcasts else 0
+        epoch = broadcast_epoch()
+
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            user_ids = list(User.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            counts = self.unread_counts(user_ids, broadcasts)
+            keys = {UNREAD_COUNT_CACHE_KEY.format(user_id=user_id): user_id for user_id in user_ids}
+            states = {UNREAD_STATE_CACHE_KEY.format(user_id=user_id): user_id for user_id in user_ids}
+            cached = cache.get_many(list(keys) + list(states))
+
+            fixed = {}
+            for key, user_id in keys.items():
+                state_key = UNREAD_STATE_CACHE_KEY.format(user_id=user_id)
+                if key not in cached and not options["warm"]:
+                    continue
+                if cached.get(key) != counts[user_id] or cached.get(state_key) != (latest, epoch):
+                    fixed[key] = counts[user_id]
+                    fixed[state_key] = (latest, epoch)
+                    repaired += key in cached
+            cache.set_many(fixed, UNREAD_COUNT_TIMEOUT)
+            checked += len(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, repaired {repaired} drifted unread counters."
+        ))
+
+    @staticmethod
+    def unread_counts(user_ids, broadcasts) -> dict:
+        """unread_count() for a chunk of users with four grouped queries."""
+        broadcast_ids = [pk for pk, _ in broadcasts]
+        types = dict(broadcasts)
+        ids_by_type = defaultdict(list)
+        for pk, notif_type in broadcasts:
+            ids_by_type[notif_type].append(pk)
+
+        personal = dict(
+            Notification.objects.filter(user_id__in=user_ids, is_read=False)
+            .values("user_id").annotate(unread=Count("id")).values_list("user_id", "unread")
+        )
+        cursors = dict(
+            NotificationReadCursor.objects.filter(user_id__in=user_ids).values_list("user_id", "last_read_id")
+        )
+        type_cursors = defaultdict(dict)
+        for user_id, notif_type, last_read_id in NotificationTypeReadCursor.objects.filter(
+            user_id__in=user_ids
+        ).values_list("user_id", "type", "last_read_id"):
+            type_cursors[user_id][notif_type] = last_read_id
+
+        counts = {}
+        for user_id in user_ids:
+            cursor = cursors.get(user_id, 0)
+            above = len(broadcast_ids) - bisect_right(broadcast_ids, cursor)
+            # Broadcasts of a type between the cursor and that type's cursor are read
+            for notif_type, last_read_id in type_cursors[user_id].items():
+                if last_read_id > cursor:
+                    ids = ids_by_type[notif_type]
+                    above -= bisect_right(ids, last_read_id) - bisect_right(ids, cursor)
+            counts[user_id] = personal.get(user_id, 0) + above
+
+        receipts = NotificationReceipt.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", "notification_id", "is_read"
+        )
+        for user_id, notification_id, is_read in receipts:
+            floor = max(cursors.get(user_id, 0), type_cursors[user_id].get(types.get(notification_id), 0))
+            above_cursor = notification_id > floor
+            if is_read and above_cursor:
+                counts[user_id] -= 1
+            elif not is_read and not above_cursor:
+                counts[user_id] += 1
+        return counts
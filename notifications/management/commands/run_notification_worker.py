@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from notifications.dispatch import process_jobs, purge_finished_jobs
+from notifications.push import get_transport
+
+
+class Command(BaseCommand):
+    help = "Store and push queued notifications (NotificationJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Jobs claimed per batch (default: 100)",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2.0,
+            help="Seconds to wait when the queue is empty (default: 2)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is due instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        try:
+            transport = get_transport()
+        except Exception as e:
+            raise CommandError(f"Push transport unavailable: {e}")
+
+        self.stdout.write(f"Notification worker started ({type(transport).__name__}).")
+        idle = True
+        while True:
+            started = time.monotonic()
+            counts = process_jobs(batch_size, transport)
+            if counts["claimed"]:
+                idle = False
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{counts['claimed']} jobs: {counts['done']} done, {counts['retried']} retried, "
+                    f"{counts['failed']} failed, {counts['split']} broadcasts split, "
+                    f"{counts['pushed']} pushes in {elapsed:.2f}s"
+                )
+                continue
+
+            if not idle:
+                idle = True
+                purged = purge_finished_jobs()
+                if purged:
+                    self.stdout.write(f"Purged {purged} finished jobs.")
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS("✅ Queue drained."))
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Max
+
+BATCH_SIZE = 1000
+
+
+def seed_read_cursors(apps, schema_editor):
+    """
+    Broadcasts were read through their shared is_read column before the
+    cursors existed: start every user without a cursor at the newest
+    broadcast, so old broadcasts do not all turn unread.
+    """
+    Notification = apps.get_model("notifications", "Notification")
+    NotificationReadCursor = apps.get_model("notifications", "NotificationReadCursor")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    latest = Notification.objects.filter(user__isnull=True).aggregate(last=Max("id"))["last"]
+    if latest is None:
+        return
+
+    last_id = 0
+    while True:
+        user_ids = list(User.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:BATCH_SIZE])
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+        NotificationReadCursor.objects.bulk_create(
+            [NotificationReadCursor(user_id=user_id, last_read_id=latest) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_broadcast_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_read_cursors, migrations.RunPython.noop),
+    ]
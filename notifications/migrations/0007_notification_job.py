@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 01:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_seed_read_cursors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('event', 'Event'), ('notice', 'Notice'), ('advertise', 'Advertise'), ('approve', 'Approve'), ('reject', 'Reject'), ('family_request', 'Family Request'), ('family_request_accepted', 'Family Request Accepted')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='NotificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('type', models.CharField(choices=[('event', 'Event'), ('notice', 'Notice'), ('advertise', 'Advertise'), ('approve', 'Approve'), ('reject', 'Reject'), ('family_request', 'Family Request'), ('family_request_accepted', 'Family Request Accepted')], max_length=30)),
+                ('reference_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('reference_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('action_date', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=32)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('retry_tokens', models.JSONField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='notifications.notification')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notification_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['available_at'], name='notif_job_pending_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from users.models import User
 
 class Notification(models.Model):
@@ -8,9 +9,13 @@ class Notification(models.Model):
         ("advertise", "Advertise"),
         ("approve", "Approve"),
         ("reject", "Reject"),
-     
+        ("family_request", "Family Request"),
+        ("family_request_accepted", "Family Request Accepted"),
     )
 
+    # Shown to everyone: stored once with user=None
+    PUBLIC_TYPES = ("event", "notice", "advertise")
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -20,7 +25,7 @@ class Notification(models.Model):
 
     title = models.CharField(max_length=255)
     message = models.TextField()
-    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    type = models.CharField(max_length=30, choices=TYPE_CHOICES)
     is_read = models.BooleanField(default=False)
 
     reference_id = models.PositiveIntegerField(null=True, blank=True)
@@ -30,11 +35,25 @@ class Notification(models.Model):
 
     # ⭐ OPTIONAL – actual event/notice date
     action_date = models.DateTimeField(null=True, blank=True)
-    
-    def save(self, *args, **kwargs):
-        PUBLIC_TYPES = ["event", "notice", "advertise"]
 
-        if self.type in PUBLIC_TYPES:
+    class Meta:
+        indexes = [
+            # Personal unread counts: filter(user=..., is_read=False). Partial,
+            # because the ORM renders is_read=False as "NOT is_read", which a
+            # plain (user, is_read) index cannot seek on.
+            models.Index(fields=["user"], condition=models.Q(is_read=False), name="notif_user_unread_idx"),
+            # Broadcast branch of the feed: user IS NULL, newest first
+            models.Index(
+                fields=["-created_at"],
+                condition=models.Q(user__isnull=True),
+                name="notif_broadcast_created_idx",
+            ),
+            # Unread broadcasts: user IS NULL AND id > read cursor
+            models.Index(fields=["id"], condition=models.Q(user__isnull=True), name="notif_broadcast_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.type in self.PUBLIC_TYPES:
             self.user = None  # force global
         else:
             if self.user is None:
@@ -43,3 +62,120 @@ class Notification(models.Model):
         super().save(*args, **kwargs)
 
 
+# -------------------------------------------------
+# PER-USER READ STATE OF BROADCASTS
+# -------------------------------------------------
+# Broadcast rows (user=None) are shared by every user, so their is_read
+# column means nothing. A user has read every broadcast up to their
+# cursor, and every broadcast of a type up to their cursor for that type;
+# receipts override that for single broadcasts on either side.
+class NotificationReadCursor(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_cursor"
+    )
+    last_read_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} read up to {self.last_read_id}"
+
+
+class NotificationTypeReadCursor(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_type_cursors")
+    type = models.CharField(max_length=30, choices=Notification.TYPE_CHOICES)
+    last_read_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "type"], name="unique_notification_type_cursor"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.type} up to {self.last_read_id}"
+
+
+class NotificationReceipt(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_receipts")
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name="receipts")
+    is_read = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "notification"], name="unique_notification_receipt"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.notification_id} ({'read' if self.is_read else 'unread'})"
+
+
+# -------------------------------------------------
+# DISPATCH QUEUE
+# -------------------------------------------------
+# One row per notification raised by a request. The worker
+# (run_notification_worker) creates the Notification and pushes it.
+class NotificationJob(models.Model):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    # Notification fields (user=None for broadcasts)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="notification_jobs"
+    )
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    type = models.CharField(max_length=30, choices=Notification.TYPE_CHOICES)
+    reference_id = models.PositiveIntegerField(null=True, blank=True)
+    reference_type = models.CharField(max_length=50, null=True, blank=True)
+    action_date = models.DateTimeField(null=True, blank=True)
+
+    # Set once the worker has stored the notification
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # Broadcast delivery to the users with after_user_id < id <= up_to_user_id;
+    # the worker splits each stored broadcast into such jobs
+    after_user_id = models.PositiveBigIntegerField(null=True, blank=True)
+    up_to_user_id = models.PositiveBigIntegerField(null=True, blank=True)
+    # Push tokens still to deliver to after a transient failure
+    retry_tokens = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Worker poll: status = pending AND available_at <= now
+            models.Index(fields=["available_at"], condition=models.Q(status="pending"), name="notif_job_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.type} → {self.user_id or 'all'} ({self.status})"
@@ -0,0 +1,104 @@
+"""
+Push transports for the notification worker.
+
+A transport sends a list of PushMessage (at most `batch_size` per call)
+and returns one PushResult per message. `retry=True` marks a transient
+failure; a failure without it means the token is dead and is cleared.
+The transport in use is settings.NOTIFICATION_PUSH_TRANSPORT.
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class PushMessage(NamedTuple):
+    token: str
+    title: str
+    body: str
+    data: dict
+
+
+class PushResult(NamedTuple):
+    token: str
+    ok: bool
+    retry: bool = False
+    error: str = ""
+
+
+def get_transport():
+    return import_string(settings.NOTIFICATION_PUSH_TRANSPORT)()
+
+
+class BaseTransport:
+    batch_size = 500
+
+    def send(self, messages) -> list[PushResult]:
+        raise NotImplementedError
+
+
+class FCMTransport(BaseTransport):
+    """Firebase Cloud Messaging through firebase-admin's send_each."""
+
+    batch_size = 500  # send_each limit
+
+    def __init__(self):
+        try:
+            import firebase_admin
+            from firebase_admin import messaging
+        except ImportError:
+            raise ImproperlyConfigured("FCMTransport needs firebase-admin (pip install firebase-admin)")
+
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            firebase_admin.initialize_app()  # GOOGLE_APPLICATION_CREDENTIALS
+        self.messaging = messaging
+
+    def send(self, messages) -> list[PushResult]:
+        messaging = self.messaging
+        response = messaging.send_each([
+            messaging.Message(
+                token=message.token,
+                notification=messaging.Notification(title=message.title, body=message.body),
+                data=message.data,
+            )
+            for message in messages
+        ])
+
+        results = []
+        for message, sent in zip(messages, response.responses):
+            if sent.success:
+                results.append(PushResult(message.token, True))
+                continue
+            dead = isinstance(sent.exception, (messaging.UnregisteredError, messaging.SenderIdMismatchError))
+            results.append(PushResult(message.token, False, retry=not dead, error=str(sent.exception)))
+        return results
+
+
+class FakeTransport(BaseTransport):
+    """
+    Keeps sent messages in memory, for tests and local runs. Tokens in
+    `failures` fail with "retry" (transient) or "invalid" (dead token).
+    """
+
+    batch_size = 2  # small, so chunked sends get exercised
+    outbox = []
+    failures = {}
+
+    def send(self, messages) -> list[PushResult]:
+        results = []
+        for message in messages:
+            failure = self.failures.get(message.token)
+            if failure is None:
+                self.outbox.append(message)
+                results.append(PushResult(message.token, True))
+            else:
+                results.append(PushResult(message.token, False, retry=failure == "retry", error=f"fake {failure}"))
+        return results
+
+    @classmethod
+    def reset(cls):
+        cls.outbox.clear()
+        cls.failures.clear()
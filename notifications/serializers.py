@@ -15,3 +15,11 @@ class NotificationSerializer(serializers.ModelSerializer):
             "action_date",   # 👈 added
             "created_at",
         ]
+
+
+class NotificationCompactSerializer(serializers.ModelSerializer):
+    """Feed rows for polling clients: no message body or references."""
+
+    class Meta:
+        model = Notification
+        fields = ["id", "title", "type", "is_read", "created_at"]
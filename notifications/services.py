@@ -0,0 +1,355 @@
+"""
+Per-user read state of notifications.
+
+Personal notifications (user set) carry their own is_read flag.
+Broadcasts (user=None) are one row shared by every user: a user has read
+every broadcast with an id up to their NotificationReadCursor, or up to
+their NotificationTypeReadCursor for the broadcast's type, and a
+NotificationReceipt overrides that for a single broadcast on either side
+of the cursors. Unread counts and feeds therefore touch only the rows
+above the cursors, the user's receipts and one page of each branch —
+never one row per user per broadcast.
+
+The badge count is additionally kept in the cache (see UNREAD COUNTER)
+and adjusted by every create and read below.
+"""
+import heapq
+import uuid
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, Max, Q, Value
+
+from .models import Notification, NotificationReadCursor, NotificationReceipt, NotificationTypeReadCursor
+
+DEFAULT_FEED_LIMIT = 50
+MAX_FEED_LIMIT = 100
+MAX_BULK_IDS = 500
+
+
+def read_cursors(user) -> tuple[int, dict]:
+    """
+    (cursor, {type: last read id}) of the user, in one query. Broadcasts
+    up to either are read unless a receipt says otherwise.
+    """
+    rows = (
+        NotificationTypeReadCursor.objects.filter(user=user).values_list("type", "last_read_id")
+        .union(
+            NotificationReadCursor.objects.filter(user=user)
+            .annotate(type=Value("", output_field=CharField())).values_list("type", "last_read_id"),
+            all=True,
+        )
+    )
+    type_cursors = dict(rows)
+    return type_cursors.pop("", 0), type_cursors
+
+
+def implied_read(cursor, type_cursors, prefix="") -> Q:
+    """
+    Broadcasts the cursors mark read (before receipts). `prefix` reaches
+    the notification through a relation, e.g. "notification__".
+    """
+    implied = Q(**{f"{prefix}id__lte": cursor})
+    for notif_type, last_read_id in type_cursors.items():
+        if last_read_id > cursor:
+            implied |= Q(**{f"{prefix}type": notif_type, f"{prefix}id__lte": last_read_id})
+    return implied
+
+
+def is_implied_read(notification, cursor, type_cursors) -> bool:
+    return notification.id <= max(cursor, type_cursors.get(notification.type, 0))
+
+
+def start_read_cursor(user_id) -> None:
+    """New users start with every existing broadcast read."""
+    NotificationReadCursor.objects.get_or_create(user_id=user_id, defaults={"last_read_id": latest_broadcast_id()})
+
+
+def unread_count(user) -> int:
+    return unread_state(user)[0]
+
+
+def unread_state(user) -> tuple[int, int]:
+    """
+    (unread count, newest broadcast id the count covers). Personal unread +
+    broadcasts above the cursors, corrected by receipts. The broadcast count
+    and the id it covers come from one statement, so a broadcast committed
+    meanwhile is either in both or in neither.
+    """
+    cursor, type_cursors = read_cursors(user)
+    implied = implied_read(cursor, type_cursors)
+    implied_receipt = implied_read(cursor, type_cursors, prefix="notification__")
+
+    personal = Notification.objects.filter(user=user, is_read=False).count()
+    broadcasts = Notification.objects.filter(user__isnull=True, id__gt=cursor).aggregate(
+        above=Count("id", filter=~implied), last=Max("id"),
+    )
+    receipts = NotificationReceipt.objects.filter(user=user).aggregate(
+        read_above=Count("id", filter=Q(is_read=True) & ~implied_receipt),
+        unread_below=Count("id", filter=Q(is_read=False) & implied_receipt),
+    )
+    count = personal + broadcasts["above"] - receipts["read_above"] + receipts["unread_below"]
+    return count, broadcasts["last"] or cursor
+
+
+def notification_feed(user, notif_type=None, limit=DEFAULT_FEED_LIMIT, before=None, since=None) -> list[Notification]:
+    """
+    Newest `limit` notifications of the user, personal and broadcast
+    merged. Each branch is read with its own index and limit, so the cost
+    is O(limit) however many broadcasts exist. Broadcast rows get the
+    user's is_read set in memory.
+
+    `before` is a (created_at, id) keyset position: only older rows are
+    returned. `since` is a notification id or a datetime: only newer rows
+    are returned.
+    """
+    filters = Q()
+    if notif_type:
+        filters &= Q(type=notif_type)
+    if before:
+        created_at, pk = before
+        filters &= Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    if isinstance(since, int):
+        filters &= Q(id__gt=since)
+    elif since:
+        filters &= Q(created_at__gt=since)
+
+    ordering = ("-created_at", "-id")
+    personal = list(Notification.objects.filter(filters, user=user).order_by(*ordering)[:limit])
+    broadcasts = list(Notification.objects.filter(filters, user__isnull=True).order_by(*ordering)[:limit])
+    apply_broadcast_read_state(user, broadcasts)
+
+    merged = heapq.merge(personal, broadcasts, key=lambda n: (n.created_at, n.id), reverse=True)
+    return list(merged)[:limit]
+
+
+def apply_broadcast_read_state(user, broadcasts):
+    """Sets is_read on broadcast rows as seen by `user`."""
+    if not broadcasts:
+        return
+    cursor, type_cursors = read_cursors(user)
+    receipts = dict(
+        NotificationReceipt.objects.filter(user=user, notification__in=broadcasts)
+        .values_list("notification_id", "is_read")
+    )
+    for notification in broadcasts:
+        notification.is_read = receipts.get(notification.id, is_implied_read(notification, cursor, type_cursors))
+
+
+def set_read(user, notification, is_read: bool):
+    """Marks one notification read or unread for `user`."""
+    if notification.user_id is not None:
+        if notification.is_read != is_read:
+            Notification.objects.filter(id=notification.id).update(is_read=is_read)
+            notification.is_read = is_read
+            adjust_unread_count(user.pk, -1 if is_read else 1)
+        return
+
+    # Broadcast: a receipt only when it differs from what the cursors imply
+    implied = is_implied_read(notification, *read_cursors(user))
+    receipt = NotificationReceipt.objects.filter(user=user, notification=notification).first()
+    was_read = receipt.is_read if receipt else implied
+    if is_read == implied:
+        if receipt:
+            receipt.delete()
+    elif receipt:
+        if receipt.is_read != is_read:
+            receipt.is_read = is_read
+            receipt.save(update_fields=["is_read", "updated_at"])
+    else:
+        NotificationReceipt.objects.create(user=user, notification=notification, is_read=is_read)
+
+    if was_read != is_read:
+        adjust_unread_count(user.pk, -1 if is_read else 1, broadcast_ids=[notification.id])
+
+
+# -------------------------------------------------
+# BULK READ
+# -------------------------------------------------
+# Each operation is one UPDATE on the personal rows plus set-based work
+# on the user's cursors and receipts; nothing loops over notifications.
+def mark_ids_read(user, ids):
+    ids = set(ids)
+    with transaction.atomic():
+        personal = Notification.objects.filter(user=user, id__in=ids, is_read=False).update(is_read=True)
+
+        cursor, type_cursors = read_cursors(user)
+        # Below the cursors a broadcast is read unless a receipt says otherwise
+        below = NotificationReceipt.objects.filter(
+            implied_read(cursor, type_cursors, prefix="notification__"), user=user, notification_id__in=ids
+        )
+        unread_below = list(below.filter(is_read=False).values_list("notification_id", flat=True))
+        below.delete()
+        above = (
+            Notification.objects.filter(user__isnull=True, id__in=ids)
+            .exclude(implied_read(cursor, type_cursors))
+            .values_list("id", flat=True)
+        )
+        newly_read = save_read_receipts(user, above)
+
+        adjust_unread_count(user.pk, -personal)
+        adjust_unread_count(user.pk, -1, broadcast_ids=unread_below + newly_read)
+
+
+def mark_read_up_to(user, up_to_id=None):
+    """Everything with an id up to `up_to_id` (default: all) becomes read."""
+    last_id = Notification.objects.aggregate(last=Max("id"))["last"] or 0
+    # Never past the newest row, so later broadcasts stay above the cursor
+    up_to_id = last_id if up_to_id is None else min(up_to_id, last_id)
+
+    with transaction.atomic():
+        Notification.objects.filter(user=user, id__lte=up_to_id, is_read=False).update(is_read=True)
+
+        # The cursor only moves forward
+        if not NotificationReadCursor.objects.filter(user=user, last_read_id__lt=up_to_id).update(last_read_id=up_to_id):
+            NotificationReadCursor.objects.get_or_create(user=user, defaults={"last_read_id": up_to_id})
+        # Receipts under the new cursor are either redundant or overruled
+        NotificationReceipt.objects.filter(user=user, notification_id__lte=up_to_id).delete()
+
+        if up_to_id == last_id:
+            transaction.on_commit(partial(store_unread_count, user.pk, 0, last_id, broadcast_epoch()))
+        else:
+            invalidate_unread_count(user.pk)
+
+
+def mark_type_read(user, notif_type):
+    """
+    Every notification of the type becomes read. Broadcasts move the
+    user's cursor for the type, however many of them there are.
+    """
+    if notif_type not in Notification.PUBLIC_TYPES:
+        personal = Notification.objects.filter(user=user, type=notif_type, is_read=False).update(is_read=True)
+        adjust_unread_count(user.pk, -personal)
+        return
+
+    # Never past the newest broadcast, so later ones stay above the cursor
+    up_to_id = latest_broadcast_id()
+    with transaction.atomic():
+        # The cursor only moves forward
+        if not NotificationTypeReadCursor.objects.filter(
+            user=user, type=notif_type, last_read_id__lt=up_to_id
+        ).update(last_read_id=up_to_id):
+            NotificationTypeReadCursor.objects.get_or_create(
+                user=user, type=notif_type, defaults={"last_read_id": up_to_id}
+            )
+        # Receipts under the new cursor are either redundant or overruled
+        NotificationReceipt.objects.filter(
+            user=user, notification__type=notif_type, notification_id__lte=up_to_id
+        ).delete()
+        invalidate_unread_count(user.pk)
+
+
+def save_read_receipts(user, notification_ids) -> list:
+    """Upserts read receipts in one statement; returns the ids that were unread."""
+    notification_ids = list(notification_ids)
+    already_read = set(
+        NotificationReceipt.objects.filter(user=user, is_read=True, notification_id__in=notification_ids)
+        .values_list("notification_id", flat=True)
+    )
+    newly_read = [pk for pk in notification_ids if pk not in already_read]
+    NotificationReceipt.objects.bulk_create(
+        [NotificationReceipt(user=user, notification_id=pk, is_read=True) for pk in newly_read],
+        batch_size=MAX_BULK_IDS,
+        update_conflicts=True,
+        unique_fields=["user", "notification"],
+        update_fields=["is_read", "updated_at"],
+    )
+    return newly_read
+
+
+# -------------------------------------------------
+# UNREAD COUNTER
+# -------------------------------------------------
+# One integer per user in the shared cache, adjusted with incr/decr on
+# every create and read. Next to it the cache keeps the newest broadcast
+# id the count covers and the broadcast epoch it was computed in.
+# Broadcasts newer than that id (one indexed Max over
+# notif_broadcast_id_idx per read) are added with one indexed count (a
+# broadcast is created once, not once per user), so reads of them do not
+# adjust the counter. Deleting a broadcast starts a new epoch, which drops
+# every counter at once. A missing or stale counter is recomputed from the
+# database; `reconcile_unread_counts` repairs drift.
+UNREAD_COUNT_CACHE_KEY = "notifications:unread:{user_id}"
+UNREAD_STATE_CACHE_KEY = "notifications:unread:{user_id}:state"
+BROADCAST_EPOCH_CACHE_KEY = "notifications:broadcast:epoch"
+UNREAD_COUNT_TIMEOUT = 24 * 60 * 60
+
+
+def cached_unread_count(user) -> int:
+    """unread_count() from the cache; the database only when it is missing or behind."""
+    count_key = UNREAD_COUNT_CACHE_KEY.format(user_id=user.pk)
+    state_key = UNREAD_STATE_CACHE_KEY.format(user_id=user.pk)
+    cached = cache.get_many([count_key, state_key, BROADCAST_EPOCH_CACHE_KEY])
+
+    epoch = cached.get(BROADCAST_EPOCH_CACHE_KEY) or broadcast_epoch()
+    count = cached.get(count_key)
+    state = cached.get(state_key)
+
+    if count is None or state is None or state[1] != epoch:
+        count, counted = unread_state(user)
+        store_unread_count(user.pk, count, counted, epoch)
+        return count
+
+    # Read after the cached count: anything newer is caught up below
+    counted = state[0]
+    latest = latest_broadcast_id()
+    if latest > counted:
+        # New broadcasts are all above the cursor: unread unless receipted
+        new = Notification.objects.filter(user__isnull=True, id__gt=counted, id__lte=latest).count()
+        read = NotificationReceipt.objects.filter(
+            user=user, is_read=True, notification_id__gt=counted, notification_id__lte=latest
+        ).count()
+        count += new - read
+        store_unread_count(user.pk, count, latest, epoch)
+    return max(count, 0)
+
+
+def store_unread_count(user_id, count, latest, epoch):
+    cache.set_many({
+        UNREAD_COUNT_CACHE_KEY.format(user_id=user_id): count,
+        UNREAD_STATE_CACHE_KEY.format(user_id=user_id): (latest, epoch),
+    }, UNREAD_COUNT_TIMEOUT)
+
+
+def adjust_unread_count(user_id, delta, broadcast_ids=None):
+    """
+    Adds `delta` to the cached counter once the transaction commits, per
+    broadcast in `broadcast_ids` when given (only those the counter
+    already includes). A missing counter is left to be recomputed.
+    """
+    transaction.on_commit(partial(_adjust_unread_count, user_id, delta, broadcast_ids))
+
+
+def _adjust_unread_count(user_id, delta, broadcast_ids):
+    if broadcast_ids is not None:
+        state = cache.get(UNREAD_STATE_CACHE_KEY.format(user_id=user_id))
+        if state is None:
+            return
+        delta *= sum(1 for pk in broadcast_ids if pk <= state[0])
+    if not delta:
+        return
+    try:
+        cache.incr(UNREAD_COUNT_CACHE_KEY.format(user_id=user_id), delta)
+    except ValueError:
+        pass  # not cached
+
+
+def invalidate_unread_count(user_id):
+    transaction.on_commit(partial(
+        cache.delete_many,
+        [UNREAD_COUNT_CACHE_KEY.format(user_id=user_id), UNREAD_STATE_CACHE_KEY.format(user_id=user_id)],
+    ))
+
+
+def latest_broadcast_id() -> int:
+    return Notification.objects.filter(user__isnull=True).aggregate(last=Max("id"))["last"] or 0
+
+
+def broadcast_epoch() -> str:
+    cache.add(BROADCAST_EPOCH_CACHE_KEY, uuid.uuid4().hex, None)
+    return cache.get(BROADCAST_EPOCH_CACHE_KEY)
+
+
+def start_broadcast_epoch():
+    cache.set(BROADCAST_EPOCH_CACHE_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,52 @@
+# notifications/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from notifications.models import Notification
+from notifications.services import (
+    adjust_unread_count,
+    invalidate_unread_count,
+    start_broadcast_epoch,
+    start_read_cursor,
+)
+from users.models import User
+
+
+# --------------------------------------------------
+# User → broadcast read cursor
+# --------------------------------------------------
+@receiver(post_save, sender=User)
+def create_read_cursor(sender, instance, created, raw=False, **kwargs):
+    """
+    Broadcasts sent before the account existed start out read
+    """
+    if created and not raw:
+        start_read_cursor(instance.pk)
+
+
+# --------------------------------------------------
+# Notification → cached unread counters
+# --------------------------------------------------
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    """
+    New personal rows add one to their user's counter; every counter
+    catches up with new broadcasts on its next read. Other saves may have
+    flipped is_read, so the counter is recomputed.
+    """
+    if instance.user_id is None:
+        return
+    if not created:
+        invalidate_unread_count(instance.user_id)
+    elif not instance.is_read:
+        adjust_unread_count(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if instance.user_id is None:
+        # Every user may have counted it: drop all counters at once
+        transaction.on_commit(start_broadcast_epoch)
+    elif not instance.is_read:
+        adjust_unread_count(instance.user_id, -1)
@@ -0,0 +1,405 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+from members.models import Member, MemberGender
+import io
+
+User = get_user_model()
+
+
+class BroadcastReadStateTests(TestCase):
+    def setUp(self):
+        from notifications.models import Notification
+
+        self.factory = APIRequestFactory()
+        self.alice = User.objects.create_user(phone="9600000001", country_code="+91", password="123")
+        self.bob = User.objects.create_user(phone="9600000002", country_code="+91", password="123")
+        self.broadcasts = [
+            Notification.objects.create(title=f"Event {i}", message="m", type="event") for i in range(3)
+        ]
+        self.personal = Notification.objects.create(user=self.alice, title="Approved", message="m", type="approve")
+
+    def mark(self, user, notification, is_read):
+        from notifications.views import MarkNotificationReadAPI
+
+        request = self.factory.patch(f"/api/notifications/mark-read/{notification.id}/", {"is_read": is_read}, format="json")
+        force_authenticate(request, user=user)
+        response = MarkNotificationReadAPI.as_view()(request, pk=notification.id)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_reading_a_broadcast_only_affects_that_user(self):
+        from notifications.services import unread_count
+
+        self.mark(self.alice, self.broadcasts[0], True)
+
+        self.assertEqual(unread_count(self.alice), 3)
+        self.assertEqual(unread_count(self.bob), 3)
+        self.broadcasts[0].refresh_from_db()
+        self.assertFalse(self.broadcasts[0].is_read)
+
+        self.mark(self.alice, self.broadcasts[0], False)
+        self.assertEqual(unread_count(self.alice), 4)
+
+    def test_receipts_override_the_read_cursor(self):
+        from notifications.models import NotificationReadCursor, NotificationReceipt
+        from notifications.services import notification_feed, unread_count
+
+        NotificationReadCursor.objects.update_or_create(user=self.alice, defaults={"last_read_id": self.broadcasts[-1].id})
+        self.assertEqual(unread_count(self.alice), 1)
+
+        self.mark(self.alice, self.broadcasts[1], False)
+        self.assertEqual(unread_count(self.alice), 2)
+        self.mark(self.alice, self.broadcasts[1], True)
+        self.assertFalse(NotificationReceipt.objects.exists())
+
+        feed = {n.id: n.is_read for n in notification_feed(self.alice)}
+        self.assertTrue(all(feed[b.id] for b in self.broadcasts))
+        self.assertFalse(feed[self.personal.id])
+
+    def test_accounts_start_with_earlier_broadcasts_read(self):
+        from importlib import import_module
+        from django.apps import apps
+        from notifications.models import NotificationReadCursor
+        from notifications.services import unread_count
+
+        carol = User.objects.create_user(phone="9600000003", country_code="+91", password="123")
+        self.assertEqual(unread_count(carol), 0)
+
+        # Users from before the cursors existed are seeded by the migration
+        NotificationReadCursor.objects.filter(user=self.bob).delete()
+        import_module("notifications.migrations.0006_seed_read_cursors").seed_read_cursors(apps, None)
+        self.assertEqual(NotificationReadCursor.objects.get(user=self.bob).last_read_id, self.broadcasts[-1].id)
+        self.assertEqual(unread_count(self.bob), 0)
+
+    def test_feed_is_newest_first_and_limited(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from notifications.views import NotificationListAPI
+
+        request = self.factory.get("/api/notifications/my/", {"limit": 2})
+        force_authenticate(request, user=self.alice)
+        with CaptureQueriesContext(connection) as ctx:
+            response = NotificationListAPI.as_view()(request)
+
+        ids = [n["id"] for n in response.data["notifications"]]
+        self.assertEqual(ids, [self.personal.id, self.broadcasts[-1].id])
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+
+class NotificationFeedPollingTests(TestCase):
+    def setUp(self):
+        from notifications.models import Notification
+
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(phone="9600000011", country_code="+91", password="123")
+        self.rows = [
+            Notification.objects.create(title=f"Event {i}", message="m", type="event") for i in range(5)
+        ]
+
+    def get(self, params=None, **headers):
+        from notifications.views import NotificationListAPI
+
+        request = self.factory.get("/api/notifications/my/", params or {}, **headers)
+        force_authenticate(request, user=self.user)
+        return NotificationListAPI.as_view()(request)
+
+    def test_cursor_pages_walk_the_feed_once(self):
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = self.get(params)
+            seen += [n["id"] for n in response.data["notifications"]]
+            if not response.data["next"]:
+                break
+            params["cursor"] = response.data["next"]
+        self.assertEqual(seen, [n.id for n in reversed(self.rows)])
+
+    def test_since_returns_only_newer_rows(self):
+        response = self.get({"since": self.rows[2].id, "compact": "1"})
+
+        self.assertEqual([n["id"] for n in response.data["notifications"]], [self.rows[4].id, self.rows[3].id])
+        self.assertNotIn("message", response.data["notifications"][0])
+        self.assertEqual(self.get({"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.get({"since": "2026-13-45T00:00:00"}).status_code, 400)
+
+    def test_unchanged_feed_returns_304(self):
+        from notifications.services import set_read
+
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.data)
+
+        set_read(self.user, self.rows[0], True)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BulkMarkReadTests(TestCase):
+    def setUp(self):
+        from notifications.models import Notification
+
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(phone="9600000021", country_code="+91", password="123")
+        self.events = [Notification.objects.create(title=f"E{i}", message="m", type="event") for i in range(3)]
+        self.notices = [Notification.objects.create(title=f"N{i}", message="m", type="notice") for i in range(2)]
+        self.personal = [
+            Notification.objects.create(user=self.user, title=f"A{i}", message="m", type="approve") for i in range(3)
+        ]
+
+    def post(self, view, path, data=None, expected=200, **kwargs):
+        request = self.factory.post(path, data or {}, format="json")
+        force_authenticate(request, user=self.user)
+        response = view.as_view()(request, **kwargs)
+        self.assertEqual(response.status_code, expected, response.data)
+
+    def test_bulk_ids_cost_a_fixed_number_of_queries(self):
+        from notifications.services import unread_count
+        from notifications.views import BulkMarkNotificationsReadAPI
+
+        ids = [n.id for n in self.events + self.personal]
+        with self.assertNumQueries(9):
+            self.post(BulkMarkNotificationsReadAPI, "/api/notifications/mark-read/bulk/", {"ids": ids})
+        self.assertEqual(unread_count(self.user), 2)
+
+    def test_invalid_ids_are_rejected(self):
+        from notifications.models import NotificationReceipt
+        from notifications.services import unread_count
+        from notifications.views import BulkMarkNotificationsReadAPI, MarkAllNotificationsReadAPI
+
+        for ids in ([True], [self.events[0].id, False], [0], [-3], ["1"], [1.5]):
+            self.post(BulkMarkNotificationsReadAPI, "/api/notifications/mark-read/bulk/", {"ids": ids}, expected=400)
+        for up_to_id in (-1, "-5", True, "abc"):
+            self.post(MarkAllNotificationsReadAPI, "/api/notifications/mark-read/all/", {"up_to_id": up_to_id}, expected=400)
+        self.assertFalse(NotificationReceipt.objects.exists())
+        self.assertEqual(unread_count(self.user), 8)
+
+    def test_read_all_up_to_advances_the_cursor(self):
+        from notifications.models import NotificationReadCursor, NotificationReceipt
+        from notifications.services import set_read, unread_count
+        from notifications.views import MarkAllNotificationsReadAPI
+
+        set_read(self.user, self.notices[1], True)
+        self.post(MarkAllNotificationsReadAPI, "/api/notifications/mark-read/all/", {"up_to_id": self.notices[1].id})
+
+        self.assertEqual(unread_count(self.user), 3)
+        self.assertFalse(NotificationReceipt.objects.exists())
+        self.post(MarkAllNotificationsReadAPI, "/api/notifications/mark-read/all/", {"up_to_id": self.events[0].id})
+        self.assertEqual(NotificationReadCursor.objects.get(user=self.user).last_read_id, self.notices[1].id)
+
+        self.post(MarkAllNotificationsReadAPI, "/api/notifications/mark-read/all/")
+        self.assertEqual(unread_count(self.user), 0)
+
+    def test_up_to_id_past_the_newest_row_is_clamped(self):
+        from notifications.models import Notification, NotificationReadCursor
+        from notifications.services import unread_count
+        from notifications.views import MarkAllNotificationsReadAPI
+
+        self.post(MarkAllNotificationsReadAPI, "/api/notifications/mark-read/all/", {"up_to_id": 10 ** 9})
+        self.assertEqual(NotificationReadCursor.objects.get(user=self.user).last_read_id, self.personal[-1].id)
+
+        # Broadcasts sent afterwards are still unread
+        Notification.objects.create(title="Later", message="m", type="event")
+        self.assertEqual(unread_count(self.user), 1)
+
+    def test_read_by_type(self):
+        from notifications.management.commands.reconcile_unread_counts import Command
+        from notifications.models import Notification, NotificationReceipt, NotificationTypeReadCursor
+        from notifications.services import notification_feed, set_read, unread_count
+        from notifications.views import MarkTypeNotificationsReadAPI
+
+        set_read(self.user, self.events[0], True)
+        self.post(MarkTypeNotificationsReadAPI, "/api/notifications/mark-read/type/event/", notif_type="event")
+
+        self.assertEqual(unread_count(self.user), 5)
+        # One cursor row, no receipt per broadcast
+        self.assertFalse(NotificationReceipt.objects.exists())
+        self.assertEqual(
+            NotificationTypeReadCursor.objects.get(user=self.user, type="event").last_read_id, self.notices[-1].id
+        )
+
+        later = Notification.objects.create(title="Later", message="m", type="event")
+        set_read(self.user, self.events[1], False)
+        self.assertEqual(unread_count(self.user), 7)
+        read_state = {n.id: n.is_read for n in notification_feed(self.user, "event")}
+        self.assertEqual(read_state, {later.id: False, self.events[2].id: True, self.events[1].id: False, self.events[0].id: True})
+
+        broadcasts = list(Notification.objects.filter(user__isnull=True).order_by("id").values_list("id", "type"))
+        self.assertEqual(Command.unread_counts([self.user.id], broadcasts), {self.user.id: 7})
+
+
+class UnreadCounterCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from notifications.models import Notification
+
+        cache.clear()
+        self.user = User.objects.create_user(phone="9600000031", country_code="+91", password="123")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = Notification.objects.create(title="E", message="m", type="event")
+            self.approve = Notification.objects.create(user=self.user, title="A", message="m", type="approve")
+
+    def assertCachedCount(self, expected):
+        from notifications.services import cached_unread_count, unread_count
+
+        self.assertEqual(unread_count(self.user), expected)
+        # Only the indexed Max of the broadcast ids: no COUNT
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_unread_count(self.user), expected)
+
+    def test_counter_follows_creates_and_reads(self):
+        from notifications.models import Notification
+        from notifications.services import cached_unread_count, mark_ids_read, mark_read_up_to, set_read
+
+        self.assertEqual(cached_unread_count(self.user), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title="B", message="m", type="reject")
+        self.assertCachedCount(3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            set_read(self.user, self.event, True)
+        self.assertCachedCount(2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_ids_read(self.user, [self.event.id, self.approve.id])
+        self.assertCachedCount(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_read_up_to(self.user)
+        self.assertCachedCount(0)
+
+    def test_new_broadcasts_are_caught_up_once(self):
+        from notifications.models import Notification
+        from notifications.services import cached_unread_count, set_read
+
+        cached_unread_count(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            notice = Notification.objects.create(title="N", message="m", type="notice")
+            Notification.objects.create(title="N2", message="m", type="notice")
+            set_read(self.user, notice, True)
+
+        self.assertEqual(cached_unread_count(self.user), 3)
+        self.assertCachedCount(3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notice.delete()
+        self.assertEqual(cached_unread_count(self.user), 3)
+
+    def test_reconcile_repairs_drift(self):
+        from django.core.cache import cache
+        from django.core.management import call_command
+        from notifications.services import UNREAD_COUNT_CACHE_KEY, cached_unread_count
+
+        cached_unread_count(self.user)
+        cache.set(UNREAD_COUNT_CACHE_KEY.format(user_id=self.user.id), 40)
+
+        out = io.StringIO()
+        call_command("reconcile_unread_counts", stdout=out)
+
+        self.assertIn("repaired 1", out.getvalue())
+        self.assertCachedCount(2)
+
+
+@override_settings(NOTIFICATION_PUSH_TRANSPORT="notifications.push.FakeTransport")
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from notifications.push import FakeTransport
+
+        cache.clear()
+        FakeTransport.reset()
+        self.outbox = FakeTransport.outbox
+        self.users = [
+            User.objects.create_user(phone=f"960000004{i}", country_code="+91", fcm_token=f"token-{i}")
+            for i in range(3)
+        ]
+
+    def run_worker(self):
+        from notifications.dispatch import process_jobs
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return process_jobs()
+
+    def test_approval_is_queued_then_stored_and_pushed(self):
+        from members.views import ApproveMemberView
+        from notifications.models import Notification, NotificationJob
+        from notifications.services import cached_unread_count
+
+        member = Member.objects.create(name="Asha", gender=MemberGender.FEMALE, mobile="9600000040", user=self.users[0])
+        admin = User.objects.create_superuser(email="admin@example.com", password="123")
+        cached_unread_count(self.users[0])
+
+        request = APIRequestFactory().post(f"/api/members/{member.id}/approve/", {"status": "active"}, format="json")
+        force_authenticate(request, user=admin)
+        self.assertEqual(ApproveMemberView.as_view()(request, pk=member.id).status_code, 200)
+        self.assertFalse(Notification.objects.exists())
+
+        counts = self.run_worker()
+
+        self.assertEqual(counts["done"], 1)
+        job = NotificationJob.objects.get()
+        self.assertEqual(job.notification.user, self.users[0])
+        self.assertEqual([(m.token, m.title) for m in self.outbox], [("token-0", "Membership Update")])
+        self.assertEqual(cached_unread_count(self.users[0]), 1)
+
+    def test_broadcasts_fold_into_one_message_per_token(self):
+        from notifications.dispatch import enqueue_notification
+
+        enqueue_notification(title="Holi", message="m", type="event")
+        enqueue_notification(title="Meeting", message="m", type="notice")
+        self.assertEqual(self.run_worker()["split"], 2)
+
+        # Independent of the number of recipients in a page
+        with self.assertNumQueries(6):
+            counts = self.run_worker()
+
+        self.assertEqual(counts["pushed"], 3)
+        self.assertEqual(sorted(m.token for m in self.outbox), ["token-0", "token-1", "token-2"])
+        self.assertEqual({m.title for m in self.outbox}, {"2 new notifications"})
+
+    def test_broadcast_is_delivered_in_user_pages(self):
+        from unittest import mock
+        from notifications import dispatch
+        from notifications.models import NotificationJob
+
+        dispatch.enqueue_notification(title="Holi", message="m", type="event")
+        with mock.patch.object(dispatch, "BROADCAST_PAGE", 2):
+            self.run_worker()
+
+        pages = NotificationJob.objects.filter(after_user_id__isnull=False).order_by("id")
+        self.assertEqual(
+            [(job.after_user_id, job.up_to_user_id) for job in pages],
+            [(0, self.users[1].id), (self.users[1].id, self.users[2].id)],
+        )
+        self.assertEqual(NotificationJob.objects.get(after_user_id__isnull=True).status, NotificationJob.DONE)
+
+        # A send that spans several transport chunks renews its claim
+        with mock.patch.object(dispatch, "renew_claim", wraps=dispatch.renew_claim) as renew:
+            counts = self.run_worker()
+        self.assertEqual((counts["done"], counts["pushed"]), (2, 3))
+        self.assertEqual(renew.call_count, 1)
+        self.assertEqual(sorted(m.token for m in self.outbox), ["token-0", "token-1", "token-2"])
+
+    def test_failed_tokens_are_retried_with_backoff(self):
+        from django.utils import timezone
+        from notifications import dispatch
+        from notifications.models import NotificationJob
+        from notifications.push import FakeTransport
+
+        FakeTransport.failures.update({"token-1": "retry", "token-2": "invalid"})
+        dispatch.enqueue_notification(title="Holi", message="m", type="event")
+        self.run_worker()  # splits the broadcast into delivery jobs
+        self.run_worker()
+
+        job = NotificationJob.objects.get(after_user_id__isnull=False)
+        self.assertEqual((job.status, job.attempts, job.retry_tokens), (NotificationJob.PENDING, 1, ["token-1"]))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertIsNone(User.objects.get(id=self.users[2].id).fcm_token)
+        self.assertEqual(self.run_worker()["claimed"], 0)
+
+        FakeTransport.failures.clear()
+        NotificationJob.objects.update(available_at=timezone.now())
+        self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, NotificationJob.DONE)
+        self.assertEqual([m.token for m in self.outbox], ["token-0", "token-1"])
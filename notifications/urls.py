@@ -2,7 +2,10 @@ from django.urls import path
 from .views import (
     NotificationListAPI,
     NotificationDetailAPI,
-    MarkNotificationReadAPI
+    MarkNotificationReadAPI,
+    BulkMarkNotificationsReadAPI,
+    MarkAllNotificationsReadAPI,
+    MarkTypeNotificationsReadAPI,
 )
 
 urlpatterns = [
@@ -14,4 +17,9 @@ urlpatterns = [
 
     # ✅ Mark notification as read/unread
     path('mark-read/<int:pk>/', MarkNotificationReadAPI.as_view()),
+
+    # ✅ Bulk read: list of ids, everything (up to an id), or one type
+    path('mark-read/bulk/', BulkMarkNotificationsReadAPI.as_view()),
+    path('mark-read/all/', MarkAllNotificationsReadAPI.as_view()),
+    path('mark-read/type/<str:notif_type>/', MarkTypeNotificationsReadAPI.as_view()),
 ]
@@ -1,11 +1,31 @@
+import hashlib
+import json
+
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework import status
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import get_object_or_404
+from django.utils.cache import parse_etags
+from django.utils.dateparse import parse_datetime
+
+from members.pagination import CreatedAtCursorPagination
 
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationCompactSerializer, NotificationSerializer
+from .services import (
+    DEFAULT_FEED_LIMIT,
+    MAX_FEED_LIMIT,
+    MAX_BULK_IDS,
+    apply_broadcast_read_state,
+    mark_ids_read,
+    mark_read_up_to,
+    mark_type_read,
+    notification_feed,
+    set_read,
+)
 
 
 # -----------------------------
@@ -14,28 +34,70 @@ from .serializers import NotificationSerializer
 from django.db.models import Q
 
 class NotificationListAPI(APIView):
+    """
+    Keyset-paginated feed, newest first.
+
+    ?cursor=   older page (the `next` value of the previous response)
+    ?since=    only notifications newer than this id or ISO timestamp
+    ?compact=1 id, title, type, is_read and created_at only
+    ?limit=    page size (default 50, max 100)
+
+    Responses carry an ETag; a matching If-None-Match returns 304.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         notif_type = request.query_params.get("type")
 
-        qs = Notification.objects.filter(
-            Q(user=request.user) | Q(user__isnull=True)
-        )
-
-        if notif_type:
-            qs = qs.filter(type=notif_type)
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_FEED_LIMIT))
+        except (TypeError, ValueError):
+            limit = DEFAULT_FEED_LIMIT
+        limit = max(1, min(limit, MAX_FEED_LIMIT))
 
-        serializer = NotificationSerializer(qs, many=True)
+        try:
+            before = CreatedAtCursorPagination().decode_cursor(request)
+        except ValidationError:
+            return Response({
+                "success": False,
+                "error": "Invalid cursor"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = int(since) if since.isdigit() else parse_datetime(since.replace(" ", "+"))
+            except ValueError:  # well formed but not a real date
+                since = None
+            if since is None:
+                return Response({
+                    "success": False,
+                    "error": "since must be a notification id or an ISO timestamp"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 🔔 Newest first; broadcasts carry this user's read state.
+        # One extra row tells us whether there is an older page.
+        notifications = notification_feed(request.user, notif_type, limit + 1, before=before, since=since)
+        page = notifications[:limit]
+        next_cursor = None
+        if len(notifications) > limit:
+            next_cursor = CreatedAtCursorPagination.encode_cursor(page[-1].created_at, page[-1].id)
+
+        compact = request.query_params.get("compact", "").lower() in ("1", "true", "yes")
+        serializer_class = NotificationCompactSerializer if compact else NotificationSerializer
+
+        data = {
             "success": True,
-            "notifications": serializer.data
-        })
-
-
+            "next": next_cursor,
+            "notifications": serializer_class(page, many=True).data
+        }
 
+        # 🏷️ The ETag covers rows and read state, so unchanged polls cost a 304
+        etag = '"%s"' % hashlib.md5(json.dumps(data, cls=DjangoJSONEncoder).encode()).hexdigest()
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
+        return Response(data, headers={"ETag": etag})
 
 
 # -----------------------------
@@ -46,8 +108,8 @@ class NotificationDetailAPI(APIView):
 
     def get(self, request, pk):
         notification = Notification.objects.filter(
-            id=pk,
-            user=request.user
+            Q(user=request.user) | Q(user__isnull=True),
+            id=pk
         ).first()
 
         if not notification:
@@ -56,6 +118,9 @@ class NotificationDetailAPI(APIView):
                 "notifications": []
             })
 
+        if notification.user_id is None:
+            apply_broadcast_read_state(request.user, [notification])
+
         serializer = NotificationSerializer(notification)
 
         return Response({
@@ -74,8 +139,8 @@ class MarkNotificationReadAPI(APIView):
     def patch(self, request, pk):
         notification = get_object_or_404(
             Notification,
-            id=pk,
-            user=request.user
+            Q(user=request.user) | Q(user__isnull=True),
+            id=pk
         )
 
         is_read = request.data.get("is_read")
@@ -86,10 +151,96 @@ class MarkNotificationReadAPI(APIView):
                 "error": "is_read field is required"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        notification.is_read = bool(is_read)
-        notification.save()
+        # 📌 Broadcasts are shared rows: read state is stored per user
+        set_read(request.user, notification, bool(is_read))
 
         return Response({
             "success": True,
             "message": "Notification updated successfully"
         }, status=status.HTTP_200_OK)
+
+
+# -----------------------------
+# 4. Bulk Mark as Read (list of ids)
+# -----------------------------
+class BulkMarkNotificationsReadAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get("ids")
+
+        if not isinstance(ids, list) or not ids:
+            return Response({
+                "success": False,
+                "error": "ids must be a non-empty list"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(ids) > MAX_BULK_IDS:
+            return Response({
+                "success": False,
+                "error": f"At most {MAX_BULK_IDS} ids per request"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # JSON true would pass int() as 1
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) and pk > 0 for pk in ids):
+            return Response({
+                "success": False,
+                "error": "ids must be notification ids"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        mark_ids_read(request.user, ids)
+
+        return Response({
+            "success": True,
+            "message": "Notifications marked as read"
+        }, status=status.HTTP_200_OK)
+
+
+# -----------------------------
+# 5. Mark All as Read (optionally up to an id)
+# -----------------------------
+class MarkAllNotificationsReadAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        up_to_id = request.data.get("up_to_id")
+
+        if up_to_id is not None:
+            try:
+                valid = not isinstance(up_to_id, bool) and int(up_to_id) >= 0
+            except (TypeError, ValueError):
+                valid = False
+            if not valid:
+                return Response({
+                    "success": False,
+                    "error": "up_to_id must be a notification id"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            up_to_id = int(up_to_id)
+
+        mark_read_up_to(request.user, up_to_id)
+
+        return Response({
+            "success": True,
+            "message": "Notifications marked as read"
+        }, status=status.HTTP_200_OK)
+
+
+# -----------------------------
+# 6. Mark All of a Type as Read
+# -----------------------------
+class MarkTypeNotificationsReadAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, notif_type):
+        if notif_type not in dict(Notification.TYPE_CHOICES):
+            return Response({
+                "success": False,
+                "error": "Unknown notification type"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        mark_type_read(request.user, notif_type)
+
+        return Response({
+            "success": True,
+            "message": "Notifications marked as read"
+        }, status=status.HTTP_200_OK)
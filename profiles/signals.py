@@ -1,103 +1,116 @@
 # profiles/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from profiles.models import PersonalDetail, JobDetail, EducationDetail
-from members.models import Member, MemberGender
+from members.models import Member
+from profiles.models import PersonalDetail, JobDetail, EducationDetail, UserProfile
+from profiles.utils import invalidate_profile_image, invalidate_profile_snapshot
+from members.services.profile_sync import EDUCATION, JOB, PERSONAL, queue_sync, sync_relevant
 
 
 # --------------------------------------------------
-# Helper: Update Member(s) from Profile
+# PersonalDetail → Member
 # --------------------------------------------------
-def update_member_from_profile(profile, data: dict):
+@receiver(post_save, sender=PersonalDetail)
+def sync_personal_to_member(sender, instance, update_fields=None, **kwargs):
     """
-    One-way sync: Profile → Member
-    Safe field-level sync
+    Sync PersonalDetail changes to Member
     """
-    user = getattr(profile, "user", None)
-    if not user:
-        return
+    queue_profile_sync(instance, PERSONAL, update_fields)
 
-    members = Member.objects.filter(user=user)
-    if not members.exists():
+
+# --------------------------------------------------
+# PersonalDetail → cached profile image
+# --------------------------------------------------
+@receiver(post_save, sender=PersonalDetail)
+@receiver(post_delete, sender=PersonalDetail)
+def invalidate_cached_profile_image(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop the cached image name whenever the image may have changed
+    """
+    if update_fields is not None and "profile_image" not in update_fields:
         return
 
-    for member in members:
-        updated_fields = []
+    user_id = profile_user_id(instance)
+    if user_id:
+        invalidate_profile_image(user_id)
 
-        for field, value in data.items():
-            if value is not None and hasattr(member, field):
-                if getattr(member, field) != value:
-                    setattr(member, field, value)
-                    updated_fields.append(field)
 
-        if updated_fields:
-            member.save(update_fields=updated_fields)
+# --------------------------------------------------
+# Profile records → cached login snapshot
+# --------------------------------------------------
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=PersonalDetail)
+@receiver(post_delete, sender=PersonalDetail)
+@receiver(post_save, sender=EducationDetail)
+@receiver(post_delete, sender=EducationDetail)
+@receiver(post_save, sender=JobDetail)
+@receiver(post_delete, sender=JobDetail)
+def invalidate_cached_profile_snapshot(sender, instance, **kwargs):
+    """
+    Drop the cached login snapshot whenever any profile record changes
+    """
+    user_id = instance.user_id if sender is UserProfile else profile_user_id(instance)
+    if user_id:
+        invalidate_profile_snapshot(user_id)
 
 
 # --------------------------------------------------
-# PersonalDetail → Member
+# Member → cached login snapshot
 # --------------------------------------------------
-@receiver(post_save, sender=PersonalDetail)
-def sync_personal_to_member(sender, instance, **kwargs):
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def invalidate_member_profile_snapshot(sender, instance, update_fields=None, **kwargs):
     """
-    Sync PersonalDetail changes to Member
+    Profile completeness depends on the linked member's relation: drop the
+    snapshot of the linked user (and of the user it was unlinked from)
     """
-    gender_map = {
-        "male": MemberGender.MALE,
-        "female": MemberGender.FEMALE,
-        "other": MemberGender.OTHER,
-    }
-
-    data = {
-        "name": instance.full_name,
-        "country_code": instance.country_code,
-        "mobile": instance.phone,
-        "email": instance.email,
-        "date_of_birth": instance.dob,
-        "native_place": instance.native_place,
-        "status": instance.status,
-    }
-
-    # Gender mapping (SAFE)
-    if instance.gender:
-        data["gender"] = gender_map.get(
-            instance.gender.lower(),
-            MemberGender.OTHER
-        )
-
-    # Profile image (FILE ONLY, NOT URL)
-    if instance.profile_image:
-        data["profile_image"] = instance.profile_image
-
-    update_member_from_profile(instance.profile, data)
+    if kwargs["signal"] is post_delete:
+        user_ids = {instance.user_id}
+    else:
+        changed = instance.tracked_changes(update_fields)
+        if not changed & {"relation", "user"}:
+            return
+        user_ids = {instance.user_id}
+        if "user" in changed:
+            user_ids.add(getattr(instance, "_tracked_values", {}).get("user"))
+
+    for user_id in user_ids - {None}:
+        invalidate_profile_snapshot(user_id)
 
 
 # --------------------------------------------------
 # JobDetail → Member
 # --------------------------------------------------
 @receiver(post_save, sender=JobDetail)
-def sync_job_to_member(sender, instance, **kwargs):
+def sync_job_to_member(sender, instance, update_fields=None, **kwargs):
     """
     Sync JobDetail changes to Member
     """
-    if instance.occupation_type:
-        update_member_from_profile(
-            instance.profile,
-            {"occupation": instance.occupation_type}
-        )
+    queue_profile_sync(instance, JOB, update_fields)
 
 
 # --------------------------------------------------
 # EducationDetail → Member
 # --------------------------------------------------
 @receiver(post_save, sender=EducationDetail)
-def sync_education_to_member(sender, instance, **kwargs):
+def sync_education_to_member(sender, instance, update_fields=None, **kwargs):
     """
     Sync EducationDetail changes to Member
     """
-    if instance.qualification:
-        update_member_from_profile(
-            instance.profile,
-            {"highest_qualification": instance.qualification}
-        )
+    queue_profile_sync(instance, EDUCATION, update_fields)
+
+
+def queue_profile_sync(instance, source, update_fields):
+    """Queues the Profile → Member sync; applied once on commit."""
+    if getattr(instance, "_skip_member_sync", False) or not sync_relevant(source, update_fields):
+        return
+    queue_sync(profile_user_id(instance), source, update_fields)
+
+
+def profile_user_id(instance):
+    """User id of a profile record, without a query when the profile is loaded."""
+    if type(instance).profile.is_cached(instance):
+        return instance.profile.user_id
+    return UserProfile.objects.filter(id=instance.profile_id).values_list("user_id", flat=True).first()
@@ -0,0 +1,119 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+from members.models import Member, MemberGender
+
+User = get_user_model()
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SaveUserProfileBenchmarkTests(TestCase):
+    """Regression benchmark: query and write counts of one profile save."""
+
+    PAYLOAD = {
+        "selectedRole": "member",
+        "personal": {
+            "fullName": "Kiran Suthar",
+            "gender": "female",
+            "dob": "1994-05-01",
+            "phone": "9400000001",
+            "nativePlace": "Pali",
+        },
+        "education": {"qualification": "M.Sc", "startYear": "2012"},
+        "job": {"occupationType": "Engineer"},
+    }
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create_user(phone="9400000001", country_code="+91", password="123")
+
+    def save(self, payload):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from members.services.profile_sync import QueuedSave
+        from profiles.views import SaveUserProfileAPI
+
+        request = self.factory.post("/api/profile/save/", {"data": payload}, format="json")
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks() as callbacks:
+            response = SaveUserProfileAPI.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        syncs = [callback for callback in callbacks if isinstance(callback, QueuedSave)]
+        self.assertEqual(syncs, [])  # no deferred sync round-trips
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        return response, ctx.captured_queries, writes
+
+    def test_first_save_creates_records_and_member(self):
+        from profiles.models import EducationDetail
+
+        response, _, writes = self.save(self.PAYLOAD)
+
+        self.assertTrue(response.data["profileCompleted"])
+        self.assertEqual(sum(sql.startswith("INSERT") for sql in writes), 5)
+        member = Member.objects.get(user=self.user)
+        self.assertEqual((member.name, member.gender, member.occupation), ("Kiran Suthar", MemberGender.FEMALE, "Engineer"))
+        self.assertEqual(EducationDetail.objects.get(profile__user=self.user).start_year, 2012)
+
+    def test_resave_without_changes_writes_nothing(self):
+        self.save(self.PAYLOAD)
+
+        _, queries, writes = self.save(self.PAYLOAD)
+        self.assertEqual(writes, [])
+        self.assertLessEqual(len(queries), 4)
+
+    def test_single_field_change_updates_personal_and_member_only(self):
+        self.save(self.PAYLOAD)
+
+        payload = {**self.PAYLOAD, "personal": {**self.PAYLOAD["personal"], "fullName": "Kiran S."}}
+        _, queries, writes = self.save(payload)
+
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(writes[0].startswith('UPDATE "profiles_personaldetail" SET "full_name"'))
+        self.assertTrue(writes[1].startswith('UPDATE "members_member" SET "name"'))
+        self.assertLessEqual(len(queries), 7)
+        self.assertEqual(Member.objects.get(user=self.user).name, "Kiran S.")
+
+    def test_invalid_value_is_rejected_without_writes(self):
+        from profiles.models import PersonalDetail
+        from profiles.views import SaveUserProfileAPI
+
+        payload = {**self.PAYLOAD, "personal": {**self.PAYLOAD["personal"], "dob": "not-a-date"}}
+        request = self.factory.post("/api/profile/save/", {"data": payload}, format="json")
+        force_authenticate(request, user=self.user)
+
+        response = SaveUserProfileAPI.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PersonalDetail.objects.filter(profile__user=self.user).exists())
+
+    def test_save_record_restores_the_sync_flag(self):
+        from profiles.models import PersonalDetail
+        from profiles.utils import save_record
+
+        self.save(self.PAYLOAD)
+        personal = PersonalDetail.objects.get(profile__user=self.user)
+
+        personal.full_name = "Unsynced"
+        save_record(personal, ["full_name"])
+        self.assertEqual(Member.objects.get(user=self.user).name, "Kiran Suthar")
+
+        # A later plain save of the same instance syncs again
+        with self.captureOnCommitCallbacks(execute=True):
+            personal.full_name = "Synced"
+            personal.save(update_fields=["full_name"])
+        self.assertEqual(Member.objects.get(user=self.user).name, "Synced")
+
+    def test_each_cache_key_is_invalidated_once_per_save(self):
+        from collections import Counter
+        from unittest import mock
+        from django.core.cache import cache
+        from profiles.views import SaveUserProfileAPI
+
+        request = self.factory.post("/api/profile/save/", {"data": self.PAYLOAD}, format="json")
+        force_authenticate(request, user=self.user)
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(SaveUserProfileAPI.as_view()(request).status_code, 200)
+
+        # Marked when first invalidated, and again on commit
+        marks = Counter(call.args[0] for call in cache_set.call_args_list)
+        self.assertIn(f"profiles:snapshot:{self.user.id}", marks)
+        self.assertEqual(set(marks.values()), {2})
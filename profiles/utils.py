@@ -1,6 +1,156 @@
-from typing import Dict, Optional
+import threading
+import weakref
+from typing import Dict, Iterable, Optional
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
 from django.http import HttpRequest
-from profiles.models import UserProfile
+from profiles.models import PersonalDetail, UserProfile
+
+PROFILE_IMAGE_CACHE_KEY = "profiles:image:{user_id}"
+PROFILE_IMAGE_CACHE_TIMEOUT = 60 * 60
+PROFILE_SNAPSHOT_CACHE_KEY = "profiles:snapshot:{user_id}"
+PROFILE_SNAPSHOT_CACHE_TIMEOUT = 60 * 60
+
+# Invalidation replaces an entry with a short-lived marker instead of
+# deleting it, and entries are only written with cache.add: a request that
+# loaded the rows before a concurrent change cannot write its stale copy
+# back while the marker is there. The marker is set again once the change
+# commits, for requests that read just before the commit. Each key is
+# marked once per transaction however many saves invalidate it.
+INVALIDATED = "!invalidated"
+INVALIDATION_HOLD = 60
+
+_local = threading.local()
+
+
+def profile_image_names(user_ids: Iterable[int]) -> Dict[int, str]:
+    """
+    Returns {user_id: stored image name} for the given users ("" when the
+    user has no image). Served from the cache; misses are resolved with a
+    single PersonalDetail query and written back.
+    """
+    keys = {PROFILE_IMAGE_CACHE_KEY.format(user_id=user_id): user_id for user_id in set(user_ids) if user_id}
+    if not keys:
+        return {}
+
+    cached = cache.get_many(list(keys))
+    names = {keys[key]: name for key, name in cached.items() if name != INVALIDATED}
+    missing = set(keys.values()) - names.keys()
+    if missing:
+        found = dict(
+            PersonalDetail.objects
+            .filter(profile__user_id__in=missing)
+            .values_list("profile__user_id", "profile_image")
+        )
+        fetched = {user_id: found.get(user_id) or "" for user_id in missing}
+        for user_id, name in fetched.items():
+            key = PROFILE_IMAGE_CACHE_KEY.format(user_id=user_id)
+            if key not in cached:  # invalidated ones stay uncached until the hold ends
+                cache.add(key, name, PROFILE_IMAGE_CACHE_TIMEOUT)
+        names.update(fetched)
+    return names
+
+
+def invalidate_profile_image(user_id: int) -> None:
+    invalidate_cache_key(PROFILE_IMAGE_CACHE_KEY.format(user_id=user_id))
+
+
+def invalidate_cache_key(key: str) -> None:
+    pending = _pending_invalidations()
+    if key in pending:
+        return
+
+    callback = pending[key] = InvalidateOnCommit(key)
+    # Runs right away outside a transaction
+    transaction.on_commit(callback)
+    if key in pending:
+        cache.set(key, INVALIDATED, INVALIDATION_HOLD)
+
+
+class InvalidateOnCommit:
+    """
+    on_commit callback re-marking one key. The pending set holds it
+    weakly, so a rolled-back savepoint (whose callbacks Django discards)
+    leaves the key free to be invalidated again.
+    """
+
+    __slots__ = ("key", "__weakref__")
+
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self):
+        _pending_invalidations().pop(self.key, None)
+        cache.set(self.key, INVALIDATED, INVALIDATION_HOLD)
+
+
+def _pending_invalidations() -> weakref.WeakValueDictionary:
+    """Keys invalidated in the running transaction, by cache key."""
+    if not hasattr(_local, "pending"):
+        _local.pending = weakref.WeakValueDictionary()
+    return _local.pending
+
+
+def cached_profile_snapshot(user_id: int) -> Optional[Dict]:
+    """{"completed": bool, "data": build_profile_response(...)} or None."""
+    snapshot = cache.get(PROFILE_SNAPSHOT_CACHE_KEY.format(user_id=user_id))
+    return None if snapshot == INVALIDATED else snapshot
+
+
+def cache_profile_snapshot(profile: UserProfile) -> Dict:
+    """
+    Builds the login snapshot from an already loaded profile and caches it
+    once the surrounding transaction commits (unless it was invalidated
+    meanwhile).
+    """
+    snapshot = {"completed": profile.is_profile_completed, "data": build_profile_response(profile)}
+    key = PROFILE_SNAPSHOT_CACHE_KEY.format(user_id=profile.user_id)
+    transaction.on_commit(lambda: cache.add(key, snapshot, PROFILE_SNAPSHOT_CACHE_TIMEOUT))
+    return snapshot
+
+
+def invalidate_profile_snapshot(user_id: int) -> None:
+    invalidate_cache_key(PROFILE_SNAPSHOT_CACHE_KEY.format(user_id=user_id))
+
+
+def profile_image_url(name: str, request: Optional[HttpRequest] = None) -> Optional[str]:
+    """Builds the public URL for a stored image name (absolute when a request is given)."""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def apply_changes(instance, values) -> list:
+    """
+    Sets the values that differ (after model-field conversion) and returns
+    the changed field names. Raises django ValidationError on bad input.
+    """
+    changed = []
+    for attr, value in values.items():
+        value = instance._meta.get_field(attr).to_python(value)
+        if getattr(instance, attr) != value:
+            setattr(instance, attr, value)
+            changed.append(attr)
+    return changed
+
+
+def save_record(instance, changed, always=False, sync=False):
+    """
+    Inserts a new record only when it gets data; updates only `changed`.
+    The Member ⇄ profile sync is skipped unless `sync` is set.
+    """
+    if not changed and not always:
+        return
+    instance._skip_member_sync = not sync
+    try:
+        if instance._state.adding:
+            instance.save()
+        else:
+            instance.save(update_fields=changed)
+    finally:
+        instance._skip_member_sync = False
 
 
 def build_profile_response(
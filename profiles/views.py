@@ -3,10 +3,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 
 from members.constants import Community
 from .models import UserProfile, PersonalDetail, EducationDetail, JobDetail
 from members.models import Member, MemberGender, MemberStatus, MemberRole
+from .utils import apply_changes, save_record
 from rest_framework.parsers import MultiPartParser
 from rest_framework.parsers import FormParser
 
@@ -97,67 +100,78 @@ class ProfileDetailView(APIView):
 class SaveUserProfileAPI(APIView):
     permission_classes = [IsAuthenticated]
 
+    PERSONAL_MAP = {
+        "fullName": "full_name",
+        "nickname": "nickname",
+        "gender": "gender",
+        "dob": "dob",
+        "email": "email",
+        "phone": "phone",
+        "country_code": "country_code",
+        "address": "address",
+        "nativePlace": "native_place",
+        "currentCity": "current_city",
+        "community": "community",
+        "status": "status",
+    }
+    EDUCATION_MAP = {
+        "qualification": "qualification",
+        "institution": "institution",
+        "field": "field",
+        "startYear": "start_year",
+        "endYear": "end_year",
+        "currentlyStudying": "currently_studying",
+    }
+    JOB_MAP = {
+        "occupationType": "occupation_type",
+        "companyName": "company_name",
+        "role": "role",
+        "industry": "industry",
+        "startDate": "start_date",
+        "incomeRange": "income_range",
+    }
+
     def post(self, request):
         data = request.data.get("data", request.data)
 
-        # ---------- PROFILE ----------
-        profile, _ = UserProfile.objects.get_or_create(user=request.user)
+        try:
+            with transaction.atomic():
+                profile_completed = self.save_profile(request.user, data)
+        except DjangoValidationError as exc:
+            return Response(
+                {"success": False, "message": " ".join(exc.messages)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "success": True,
+                "profileCompleted": profile_completed,
+                "message": "Profile saved successfully",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def save_profile(self, user, data):
+        # ---------- LOAD (one query for all four records) ----------
+        profile = (
+            UserProfile.objects
+            .select_related("personal", "education_detail", "job")
+            .filter(user=user)
+            .first()
+        ) or UserProfile(user=user)
+
+        personal = getattr(profile, "personal", None) or PersonalDetail(profile=profile)
+        education = getattr(profile, "education_detail", None) or EducationDetail(profile=profile)
+        job = getattr(profile, "job", None) or JobDetail(profile=profile)
 
+        # ---------- APPLY ----------
+        profile_changes = []
         if "selectedRole" in data:
-            profile.registration_role = data.get("selectedRole", "member")
-
-        # ---------- PERSONAL ----------
-        p_data = data.get("personal", {})
-        personal, _ = PersonalDetail.objects.get_or_create(profile=profile)
-
-        personal_map = {
-            "fullName": "full_name",
-            "nickname": "nickname",
-            "gender": "gender",
-            "dob": "dob",
-            "email": "email",
-            "phone": "phone",
-            "country_code": "country_code",
-            "address": "address",
-            "nativePlace": "native_place",
-            "currentCity": "current_city",
-            "community": "community",
-            "status": "status",
-        }
-
-        for key, attr in personal_map.items():
-            if key in p_data:
-                setattr(personal, attr, p_data[key])
-
-        # ---------- EDUCATION ----------
-        e_data = data.get("education", {})
-        education, _ = EducationDetail.objects.get_or_create(profile=profile)
-
-        for key, attr in {
-            "qualification": "qualification",
-            "institution": "institution",
-            "field": "field",
-            "startYear": "start_year",
-            "endYear": "end_year",
-            "currentlyStudying": "currently_studying",
-        }.items():
-            if key in e_data:
-                setattr(education, attr, e_data[key])
-
-        # ---------- JOB ----------
-        j_data = data.get("job", {})
-        job, _ = JobDetail.objects.get_or_create(profile=profile)
-
-        for key, attr in {
-            "occupationType": "occupation_type",
-            "companyName": "company_name",
-            "role": "role",
-            "industry": "industry",
-            "startDate": "start_date",
-            "incomeRange": "income_range",
-        }.items():
-            if key in j_data:
-                setattr(job, attr, j_data[key])
+            profile_changes += apply_changes(profile, {"registration_role": data.get("selectedRole", "member")})
+        personal_changes = apply_changes(personal, self.mapped(data.get("personal", {}), self.PERSONAL_MAP))
+        education_changes = apply_changes(education, self.mapped(data.get("education", {}), self.EDUCATION_MAP))
+        job_changes = apply_changes(job, self.mapped(data.get("job", {}), self.JOB_MAP))
 
         # ---------- PROFILE COMPLETION ----------
         mandatory_fields = [
@@ -168,66 +182,74 @@ class SaveUserProfileAPI(APIView):
             personal.phone,
             profile.registration_role,
         ]
+        profile_changes += apply_changes(profile, {
+            "is_profile_completed": all(field not in (None, "", []) for field in mandatory_fields)
+        })
 
-        profile.is_profile_completed = all(
-            field not in (None, "", [])
-            for field in mandatory_fields
-        )
-
-        # ---------- SAVE ----------
-        profile.save()
-        personal.save()
-        education.save()
-        job.save()
+        # ---------- SAVE (changed fields only) ----------
+        # The Member is synced once below, so the per-record sync is skipped
+        save_record(profile, profile_changes, always=profile._state.adding)
+        save_record(personal, personal_changes)
+        save_record(education, education_changes)
+        save_record(job, job_changes)
 
         # ---------- MEMBER SYNC ----------
-        gender_map = {
-            "male": MemberGender.MALE,
-            "female": MemberGender.FEMALE,
-            "other": MemberGender.OTHER,
-        }
-
-        Member.objects.update_or_create(
-            user=request.user,
-            defaults={
-                "community": personal.community or Community.SUTHAR,
-                "name": personal.full_name,
-                "mobile": personal.phone,
-                "country_code": personal.country_code,
-                "gender": gender_map.get(
-                    (personal.gender or "").lower(),
-                    MemberGender.OTHER,
-                ),
-                "date_of_birth": personal.dob,
-                "email": personal.email,
-                "address": personal.address,
-                "city": personal.current_city,
-                "native_place": personal.native_place,
-
-                # ✅ SYNC IMAGE HERE (ONLY)
-                "profile_image": personal.profile_image,
-
-                "occupation": job.occupation_type,
-                "highest_qualification": education.qualification,
-                "profile_completed": profile.is_profile_completed,
-                "role": (
-                    MemberRole.FAMILY_HEAD
-                    if profile.registration_role == "familyHead"
-                    else MemberRole.MEMBER
-                ),
-                "status": personal.status or MemberStatus.PENDING,
-            },
-        )
-
-        return Response(
-            {
-                "success": True,
-                "profileCompleted": profile.is_profile_completed,
-                "message": "Profile saved successfully",
-            },
-            status=status.HTTP_200_OK,
-        )
-
+        sync_member_from_profile(user, profile, personal, education, job)
+        return profile.is_profile_completed
+
+    @staticmethod
+    def mapped(section, field_map):
+        return {attr: section[key] for key, attr in field_map.items() if key in section}
+
+
+GENDER_MAP = {
+    "male": MemberGender.MALE,
+    "female": MemberGender.FEMALE,
+    "other": MemberGender.OTHER,
+}
+
+
+def sync_member_from_profile(user, profile, personal, education, job):
+    """Creates or updates the user's Member with only the differing fields."""
+    values = {
+        "community": personal.community or Community.SUTHAR,
+        "name": personal.full_name,
+        "mobile": personal.phone,
+        "country_code": personal.country_code,
+        "gender": GENDER_MAP.get((personal.gender or "").lower(), MemberGender.OTHER),
+        "date_of_birth": personal.dob,
+        "email": personal.email,
+        "address": personal.address,
+        "city": personal.current_city,
+        "native_place": personal.native_place,
+
+        # ✅ SYNC IMAGE HERE (ONLY)
+        "profile_image": personal.profile_image.name or None,
+
+        "occupation": job.occupation_type,
+        "highest_qualification": education.qualification,
+        "profile_completed": profile.is_profile_completed,
+        "role": (
+            MemberRole.FAMILY_HEAD
+            if profile.registration_role == "familyHead"
+            else MemberRole.MEMBER
+        ),
+        "status": personal.status or MemberStatus.PENDING,
+    }
+
+    member = Member.objects.filter(user=user).order_by("id").first()
+    if member is None:
+        member = Member(user=user, **values)
+        member._skip_member_sync = True
+        member.save()
+        return
+
+    current = {field: getattr(member, field) for field in values}
+    current["profile_image"] = member.profile_image.name or None
+    changed = [field for field, value in values.items() if current[field] != value]
+    for field in changed:
+        setattr(member, field, values[field])
+    save_record(member, changed)
 
 
 class UploadProfileImageView(APIView):
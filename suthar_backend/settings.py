@@ -2,6 +2,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -215,6 +217,26 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Shared by every gunicorn worker and the notification worker: unread
+# counters, login snapshots and profile image names are invalidated from
+# any process, so production needs REDIS_URL. The per-process LocMem
+# cache is only good enough for a single DEBUG process.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    raise ImproperlyConfigured("Set REDIS_URL: the cache must be shared by all processes.")
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -223,3 +245,9 @@ REST_FRAMEWORK = {
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Push delivery used by the notification worker (run_notification_worker).
+# FCMTransport needs firebase-admin and GOOGLE_APPLICATION_CREDENTIALS.
+NOTIFICATION_PUSH_TRANSPORT = os.environ.get(
+    "NOTIFICATION_PUSH_TRANSPORT", "notifications.push.FCMTransport"
+)
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_country_code_alter_user_phone_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='fcm_token',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -56,6 +56,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     country_code = models.CharField(max_length=5, default="+91")
 
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="member")
+
+    # Push token sent by the app at login
+    fcm_token = models.CharField(max_length=255, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 